@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""
+Times a fresh interpreter importing the package and printing the CLI help,
+and lists the heavy dependencies each step loads. Exits with an error if a
+step is slower than --max-ms, so it can guard startup time in CI.
+
+    PYTHONPATH=. python benchmarks/bench_import.py --repeat 10
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ['lxml', 'urllib3', 'dns', 'jinja2', 'fake_useragent', 'advertools', 'pandas', 'bs4', 'requests']
+
+# name: (interpreter arguments, the import that step performs)
+STEPS = {
+    'import seoanalyzer': (['-c', 'import seoanalyzer'], 'import seoanalyzer'),
+    'import analyzer': (['-c', 'import seoanalyzer.analyzer'], 'import seoanalyzer.analyzer'),
+    'cli --help': (['-m', 'seoanalyzer', '--help'], 'import seoanalyzer.__main__'),
+}
+
+
+def loaded_modules(statement):
+    code = f'{statement}; import sys, json; print(json.dumps(sorted(sys.modules)))'
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    modules = set(json.loads(output))
+
+    return [name for name in HEAVY_MODULES if name in modules]
+
+
+def time_step(args, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--max-ms', type=float, help='Fail if a step takes longer than this, median.')
+    args = arg_parser.parse_args()
+
+    baseline, _ = time_step(['-c', 'pass'], args.repeat)
+    slow = []
+
+    print(f'{"step":>20} {"median":>9} {"min":>9} {"over python":>12}  heavy modules')
+    print(f'{"python -c pass":>20} {baseline * 1000:>7.1f}ms')
+
+    for name, (step, statement) in STEPS.items():
+        median, fastest = time_step(step, args.repeat)
+        heavy = loaded_modules(statement)
+        print(f'{name:>20} {median * 1000:>7.1f}ms {fastest * 1000:>7.1f}ms {(median - baseline) * 1000:>10.1f}ms'
+              f'  {", ".join(heavy) or "-"}')
+
+        if args.max_ms is not None and median * 1000 > args.max_ms:
+            slow.append(name)
+
+    if slow:
+        sys.exit(f'slower than {args.max_ms}ms: {", ".join(slow)}')
+
+
+if __name__ == '__main__':
+    main()
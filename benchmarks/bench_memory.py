@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""
+Crawls a few thousand synthetic pages from a local server and reports how
+much memory the finished crawl holds on to, with compact PageResults versus
+keeping every Page object alive.
+
+    PYTHONPATH=. python benchmarks/bench_memory.py --pages 2000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from fixture_site import FixtureServer
+from fixture_site import FixtureSite
+from fixture_site import SiteShape
+
+from seoanalyzer.website import Website
+
+
+class FullPageWebsite(Website):
+    """
+    Keeps every analyzed Page object, like the crawl used to
+    """
+
+    def add_page(self, page):
+        super().add_page(page)
+
+        return page
+
+
+def measure(website_class, url, args):
+    site = website_class(url, None, False, False, True, workers=args.workers, max_pages=args.pages)
+    # the host probes are not what is being measured here
+    site.host_facts.host(url).loaded = True
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    site.crawl()
+
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return len(site.crawled_pages), elapsed, retained, peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--pages', type=int, default=2000)
+    arg_parser.add_argument('--words', type=int, default=1000, help='Words per page.')
+    arg_parser.add_argument('--workers', type=int, default=8)
+    args = arg_parser.parse_args()
+
+    server = FixtureServer(FixtureSite(SiteShape(pages=args.pages, words=args.words, images=0, json_ld=False)))
+    url = server.url
+
+    print(f'{"crawl":>12} {"pages":>6} {"time":>8} {"retained":>11} {"peak":>11}')
+
+    for name, website_class in (('page objects', FullPageWebsite), ('page results', Website)):
+        pages, elapsed, retained, peak = measure(website_class, url, args)
+        print(f'{name:>12} {pages:>6} {elapsed:>7.1f}s {retained / 2 ** 20:>8.1f}MiB {peak / 2 ** 20:>8.1f}MiB')
+
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
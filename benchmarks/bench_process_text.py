@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+Times Page.process_text on synthetic pages from 1k to 100k words and compares
+it to the old list.count() based word counting.
+
+    python benchmarks/bench_process_text.py
+"""
+
+import argparse
+import random
+import time
+
+from collections import Counter
+
+from seoanalyzer.page import ENGLISH_STOP_WORDS
+from seoanalyzer.page import Page
+from seoanalyzer.page import TOKEN_REGEX
+from seoanalyzer.stemmer import stem
+
+
+def synthetic_text(words, vocabulary=5000, seed=0):
+    """
+    Returns a list of text nodes totalling `words` words, with word
+    frequencies roughly following Zipf's law like real prose
+    """
+    rng = random.Random(seed)
+    vocab = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 10)))
+             for _ in range(vocabulary)]
+    vocab[:len(ENGLISH_STOP_WORDS) // 10] = sorted(ENGLISH_STOP_WORDS)[:len(ENGLISH_STOP_WORDS) // 10]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    tokens = rng.choices(vocab, weights=weights, k=words)
+
+    return [' '.join(tokens[i:i + 50]) for i in range(0, words, 50)]
+
+
+def legacy_process_text(vt):
+    """
+    The quadratic implementation process_text replaced, kept for comparison
+    """
+    page_text = ''
+
+    for element in vt:
+        if element.strip():
+            page_text += element.strip().lower() + u' '
+
+    tokens = [word for word in TOKEN_REGEX.findall(page_text.lower()) if word not in ENGLISH_STOP_WORDS]
+    raw_tokens = TOKEN_REGEX.findall(page_text.lower())
+
+    bigrams = Counter()
+    for ng in zip(*[raw_tokens[i:] for i in range(2)]):
+        bigrams[' '.join(ng)] += 1
+
+    trigrams = Counter()
+    for ng in zip(*[raw_tokens[i:] for i in range(3)]):
+        trigrams[' '.join(ng)] += 1
+
+    freq_dist = dict(zip(tokens, [tokens.count(w) for w in tokens]))
+
+    wordcount = Counter()
+    for word in freq_dist:
+        wordcount[stem(word)] += freq_dist[word]
+
+    return wordcount, bigrams, trigrams
+
+
+def best_of(repeat, func, *args):
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--legacy-max', type=int, default=20000,
+                            help='Skip the quadratic implementation above this many words.')
+    args = arg_parser.parse_args()
+
+    print(f'{"words":>8} {"process_text":>14} {"legacy":>10} {"speedup":>8}')
+
+    for size in args.sizes:
+        vt = synthetic_text(size)
+
+        page = Page()
+        page.process_text(vt)
+        expected = (page.wordcount, page.bigrams, page.trigrams)
+
+        current = best_of(args.repeat, lambda: Page().process_text(vt))
+
+        if size <= args.legacy_max:
+            assert legacy_process_text(vt) == expected
+            legacy = best_of(args.repeat, legacy_process_text, vt)
+            print(f'{size:>8} {current:>13.4f}s {legacy:>9.4f}s {legacy / current:>7.1f}x')
+        else:
+            print(f'{size:>8} {current:>13.4f}s {"-":>10} {"-":>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks the analyzer offline against a synthetic site served from
+localhost: Page.analyze stage by stage, Website.crawl serially, with threads
+and with processes, and analyze() end to end. Reports throughput, latency
+percentiles and peak memory, and writes everything as JSON so results can be
+compared across releases.
+
+    PYTHONPATH=. python benchmarks/bench_suite.py --pages 500 --output results.json
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from datetime import datetime
+from datetime import timezone
+
+from fixture_site import FixtureServer
+from fixture_site import FixtureSite
+from fixture_site import SiteShape
+
+from seoanalyzer import analyze
+from seoanalyzer.host import HostFacts
+from seoanalyzer.host import HostFactsCache
+from seoanalyzer.page import Page
+from seoanalyzer.website import Website
+
+# stages that are timed inside another stage, left out of per-page totals
+NESTED_STAGES = {'stemming'}
+
+
+def percentiles(values):
+    if not values:
+        return {}
+
+    values = sorted(values)
+
+    def rank(p):
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+    return {'p50': rank(50), 'p90': rank(90), 'p99': rank(99), 'max': values[-1], 'mean': statistics.fmean(values)}
+
+
+def page_latencies(reports):
+    """
+    The time each page spent in the analyzer, from the profile timings of
+    its printable report
+    """
+    return [sum(seconds for stage, seconds in report['timings'].items() if stage not in NESTED_STAGES)
+            for report in reports if report.get('timings')]
+
+
+def stage_percentiles(reports):
+    stages = {}
+
+    for report in reports:
+        for stage, seconds in report.get('timings', {}).items():
+            stages.setdefault(stage, []).append(seconds)
+
+    return {stage: percentiles(values) for stage, values in stages.items()}
+
+
+def offline_host_facts(url):
+    """
+    Host facts marked as already checked, the probes are not being measured
+    """
+    host_facts = HostFactsCache()
+    host_facts.host(url).loaded = True
+
+    return host_facts
+
+
+def peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def timed(func, repeat):
+    timings = []
+    result = None
+
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings), result
+
+
+def bench_page_analyze(site, url, args):
+    raw_pages = [site.page(number) for number in range(min(args.sample, site.shape.pages))]
+    host_facts = offline_host_facts(url)
+    latencies = []
+    pages = []
+
+    for number, raw_html in enumerate(raw_pages):
+        page = Page(url=f'{url}page/{number}', base_domain=url, host_facts=host_facts, profile=True)
+        start = time.perf_counter()
+        page.analyze(raw_html)
+        latencies.append(time.perf_counter() - start)
+        pages.append(page)
+
+    return {
+        'pages': len(pages),
+        'pages_per_second': len(pages) / sum(latencies),
+        'latency': percentiles(latencies),
+        'stages': stage_percentiles([page.talk() for page in pages]),
+    }
+
+
+def bench_crawl(url, args, workers=1, processes=None):
+    def crawl(profile=True):
+        site = Website(url, None, False, False, True, workers=workers, processes=processes,
+                       max_pages=args.pages, profile=profile)
+        site.host_facts = offline_host_facts(url)
+        site.crawl()
+
+        return site
+
+    elapsed, site = timed(crawl, args.repeat)
+    reports = [page.talk() for page in site.crawled_pages]
+    result = {
+        'workers': workers,
+        'processes': processes,
+        'pages': len(site.crawled_pages),
+        'seconds': elapsed,
+        'pages_per_second': len(site.crawled_pages) / elapsed,
+        'latency': percentiles(page_latencies(reports)),
+        'stages': stage_percentiles(reports),
+        'hosts': site.metrics.talk()['hosts'],
+    }
+
+    if args.memory:
+        result['peak_memory'] = peak_memory(lambda: crawl(profile=False))
+
+    return result
+
+
+def bench_analyze(url, args):
+    # the DMARC lookup and the www/https variants need real DNS
+    lookup_dmarc, resolve_urls = HostFacts.lookup_dmarc, HostFacts.resolve_urls
+    HostFacts.lookup_dmarc = lambda self: None
+    HostFacts.resolve_urls = lambda self: [url]
+
+    try:
+        def run():
+            return analyze(url, f'{url}sitemap.xml', workers=args.workers, max_pages=args.pages, profile=True)
+
+        elapsed, output = timed(run, args.repeat)
+        result = {
+            'workers': args.workers,
+            'pages': len(output['pages']),
+            'seconds': elapsed,
+            'pages_per_second': len(output['pages']) / elapsed,
+            'latency': percentiles(page_latencies(output['pages'])),
+            'stages': stage_percentiles(output['pages']),
+            'totals': output['timings'],
+        }
+
+        if args.memory:
+            result['peak_memory'] = peak_memory(run)
+    finally:
+        HostFacts.lookup_dmarc, HostFacts.resolve_urls = lookup_dmarc, resolve_urls
+
+    return result
+
+
+def package_version():
+    try:
+        from importlib.metadata import version
+
+        return version('pyseoanalyzer')
+    except Exception:
+        return None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--pages', type=int, default=500)
+    arg_parser.add_argument('--words', type=int, default=1000, help='Words per page.')
+    arg_parser.add_argument('--links', type=int, default=10, help='Links per page.')
+    arg_parser.add_argument('--images', type=int, default=5, help='Images per page.')
+    arg_parser.add_argument('--no-json-ld', dest='json_ld', action='store_false')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--sample', type=int, default=200, help='Pages to time Page.analyze on.')
+    arg_parser.add_argument('--workers', type=int, default=8)
+    arg_parser.add_argument('--processes', type=int, default=0, help='Also crawl with this many processes.')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip the tracemalloc runs.')
+    arg_parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = arg_parser.parse_args()
+
+    shape = SiteShape(pages=args.pages, words=args.words, links=args.links, images=args.images,
+                      json_ld=args.json_ld, seed=args.seed)
+    site = FixtureSite(shape)
+    server = FixtureServer(site)
+
+    try:
+        results = {'page_analyze': bench_page_analyze(site, server.url, args)}
+        results['crawl_serial'] = bench_crawl(server.url, args)
+        results['crawl_threads'] = bench_crawl(server.url, args, workers=args.workers)
+        if args.processes:
+            results['crawl_processes'] = bench_crawl(server.url, args, workers=args.workers,
+                                                     processes=args.processes)
+        results['analyze'] = bench_analyze(server.url, args)
+    finally:
+        server.close()
+
+    report = {
+        'version': package_version(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'shape': shape.talk(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    print(f'{"benchmark":>16} {"pages":>6} {"pages/s":>9} {"p50":>9} {"p99":>9} {"peak":>10}')
+
+    for name, result in results.items():
+        latency = result.get('latency', {})
+        peak = f'{result["peak_memory"] / 2 ** 20:.1f}MiB' if 'peak_memory' in result else '-'
+        p50 = f'{latency["p50"] * 1000:.2f}ms' if latency else '-'
+        p99 = f'{latency["p99"] * 1000:.2f}ms' if latency else '-'
+        print(f'{name:>16} {result["pages"]:>6} {result["pages_per_second"]:>9.1f} {p50:>9} {p99:>9} {peak:>10}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+A synthetic site for the benchmarks: every page, the sitemap and robots.txt
+are generated from a seed, so the same shape always gives the same bytes,
+and are served from a local HTTP server without touching the network.
+"""
+
+import json
+import random
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+WORDS = ['search', 'engine', 'optimization', 'crawler', 'content', 'keyword', 'ranking', 'index', 'sitemap',
+         'canonical', 'redirect', 'heading', 'description', 'analysis', 'structure', 'performance', 'mobile',
+         'schema', 'markup', 'backlink', 'anchor', 'authority', 'traffic', 'organic', 'snippet', 'metadata']
+
+
+class SiteShape():
+    """
+    The size and content of a synthetic site
+    """
+
+    def __init__(self, pages=1000, words=1000, links=10, images=5, json_ld=True, sitemap=True, robots=True,
+                 vocabulary=300, seed=0):
+        self.pages = pages
+        self.words = words
+        self.links = links
+        self.images = images
+        self.json_ld = json_ld
+        self.sitemap = sitemap
+        self.robots = robots
+        self.vocabulary = vocabulary
+        self.seed = seed
+
+    def talk(self):
+        return dict(self.__dict__)
+
+
+class FixtureSite():
+    def __init__(self, shape):
+        self.shape = shape
+
+    def page_path(self, number):
+        return '/' if number == 0 else f'/page/{number}'
+
+    def page(self, number):
+        shape = self.shape
+        rng = random.Random(shape.seed * 1000003 + number)
+        text = ' '.join(rng.choice(WORDS) + str(rng.randrange(shape.vocabulary)) for _ in range(shape.words))
+        links = ''.join(f'<a href="{self.page_path(rng.randrange(shape.pages))}" title="page">Read more</a>'
+                        for _ in range(shape.links))
+        images = ''.join(f'<img src="/images/{number}-{i}.png" alt="image {i}">' if i % 4 else
+                         f'<img src="/images/{number}-{i}.png">' for i in range(shape.images))
+        json_ld = ''
+
+        if shape.json_ld:
+            schema = {'@context': 'https://schema.org', '@type': 'Article', 'headline': f'Synthetic page {number}'}
+            json_ld = f'<script type="application/ld+json">{json.dumps(schema)}</script>'
+
+        return (f'<!DOCTYPE html><html lang="en"><head><title>Synthetic page {number}</title>'
+                f'<meta name="description" content="Synthetic page number {number} of the benchmark site">'
+                f'<meta property="og:title" content="Synthetic page {number}">{json_ld}</head>'
+                f'<body><h1>Page {number}</h1><p>{text}</p>{images}{links}</body></html>')
+
+    def sitemap(self, base_url):
+        urls = ''.join(f'<url><loc>{base_url.rstrip("/")}{self.page_path(number)}</loc></url>'
+                       for number in range(self.shape.pages))
+
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+
+    def robots(self, base_url):
+        return f'User-agent: *\nDisallow: /private/\nSitemap: {base_url}sitemap.xml\n'
+
+    def response(self, path, base_url):
+        """
+        Returns (status, content type, body) for a path
+        """
+        if path == '/sitemap.xml' and self.shape.sitemap:
+            return 200, 'application/xml', self.sitemap(base_url)
+        if path == '/robots.txt' and self.shape.robots:
+            return 200, 'text/plain', self.robots(base_url)
+        if path == '/favicon.ico':
+            return 200, 'image/x-icon', ''
+
+        try:
+            number = 0 if path == '/' else int(path[len('/page/'):]) if path.startswith('/page/') else -1
+        except ValueError:
+            number = -1
+
+        if not 0 <= number < self.shape.pages:
+            return 404, 'text/html; charset=utf-8', 'not found'
+
+        return 200, 'text/html; charset=utf-8', self.page(number)
+
+
+class FixtureServer():
+    """
+    Serves a FixtureSite on a free port of 127.0.0.1 from a background thread
+    """
+
+    def __init__(self, site):
+        self.site = site
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body go out in separate writes, don't let them wait on delayed acks
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.requests += 1
+                status, content_type, body = site.response(self.path.split('?', 1)[0], server.url)
+                body = body.encode('utf-8')
+
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.netloc = f'127.0.0.1:{self.server.server_port}'
+        self.url = f'http://{self.netloc}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
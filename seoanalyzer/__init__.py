@@ -1,4 +1,30 @@
 #!/usr/bin/env python3
 
-from .analyzer import analyze
-from .stemmer import stem
\ No newline at end of file
+import importlib
+
+# the crawler pulls in lxml, urllib3 and friends, so it is only imported the
+# first time one of these is used
+_EXPORTS = {
+    'analyze': 'analyzer',
+    'analyze_async': 'analyzer',
+    'analyze_many': 'analyzer',
+    'iter_analyze': 'analyzer',
+    'stem': 'stemmer',
+    'stem_many': 'stemmer',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,40 +1,219 @@
 #!/usr/bin/env python3
 
 import argparse
-import inspect
 import json
 import os
+import sys
+import time
 
-from jinja2 import Environment
-from jinja2 import FileSystemLoader
-from seoanalyzer import analyze
+from contextlib import closing
+
+
+def read_sites(lines):
+    """
+    (url, sitemap_url) for each line of a sites file, skipping blank lines
+    and lines starting with #
+    """
+    for line in lines:
+        fields = line.split()
+
+        if fields and not fields[0].startswith('#'):
+            yield fields[0], fields[1] if len(fields) > 1 else None
+
+
+def query(argv):
+    """
+    The query subcommand, reads the results a crawl wrote with --store
+    """
+    from seoanalyzer.store import STATUS_FIELDS
+
+    arg_parser = argparse.ArgumentParser(prog='seoanalyze query',
+                                         description='Read the results of crawls saved with --store.')
+
+    arg_parser.add_argument('database', help='Database written with --store.')
+    arg_parser.add_argument('table', nargs='?', help='What to list.',
+                            choices=['pages', 'crawls', 'keywords', 'links', 'duplicates', ], default='pages')
+    arg_parser.add_argument('--site', help='Only this site, given as its host name.')
+    arg_parser.add_argument('--crawl-id', help='Only this crawl. Keywords, links and duplicates default to the '
+                                               'latest crawl of --site.', type=int)
+    arg_parser.add_argument('--url', help='Only this page, or for links only links pointing to it.')
+    arg_parser.add_argument('--since-days', help='Only crawls started in the last this many days.', type=float)
+    arg_parser.add_argument('--where', help='Only pages where a status field has a value, as FIELD=VALUE, for '
+                                            'example alt_attribute_status=bad. Can be repeated.', action='append',
+                            default=[])
+    arg_parser.add_argument('--limit', help='Return at most this many rows.', type=int)
+    arg_parser.add_argument('-f', '--output-format', help='Output format.', choices=['json', 'ndjson', ],
+                            default='json')
+
+    args = arg_parser.parse_args(argv)
+
+    statuses = {}
+
+    for condition in args.where:
+        field, _, value = condition.partition('=')
+
+        if field not in STATUS_FIELDS or not value:
+            arg_parser.error(f'--where takes FIELD=VALUE with FIELD one of {", ".join(STATUS_FIELDS)}')
+
+        statuses[field] = value
+
+    if not os.path.exists(args.database):
+        arg_parser.error(f'no database at {args.database}')
+
+    from seoanalyzer.store import ResultStore
+
+    since = time.time() - args.since_days * 86400 if args.since_days is not None else None
+
+    with ResultStore(args.database) as store:
+        crawl_id = args.crawl_id
+
+        if crawl_id is None and args.site and args.table in ('keywords', 'links', 'duplicates'):
+            crawl_id = store.latest_crawl(args.site)
+
+        if args.table == 'pages':
+            rows = store.pages(args.site, crawl_id, args.url, since, args.limit, **statuses)
+        elif args.table == 'crawls':
+            rows = store.crawls(args.site, since, args.limit)
+        elif crawl_id is None:
+            arg_parser.error(f'{args.table} needs --crawl-id or --site')
+        elif args.table == 'keywords':
+            rows = store.keywords(crawl_id, args.limit)
+        elif args.table == 'links':
+            rows = store.links(crawl_id, target=args.url, limit=args.limit)
+        else:
+            rows = store.duplicates(crawl_id)
+
+    if args.output_format == 'ndjson':
+        for row in rows:
+            print(json.dumps(row))
+    else:
+        print(json.dumps(rows, indent=4, separators=(',', ': ')))
+
+
+def run(args, options, module_path):
+    """
+    Analyze the site or sites file from the command-line and print the output
+    """
+    # imported after parsing so --help and usage errors don't load the crawler
+    from seoanalyzer import analyze
+    from seoanalyzer import analyze_many
+    from seoanalyzer import iter_analyze
+
+    if args.sites_file:
+        # closed on the way out, so Ctrl-C stops the crawls in flight instead of waiting for them
+        with open(args.sites_file, encoding='utf-8') as f, \
+                closing(analyze_many(read_sites(f), args.max_sites, args.max_workers, **options)) as records:
+            if args.output_format == 'ndjson':
+                # one line per site as soon as it is done, then the throughput summary
+                for record in records:
+                    print(json.dumps(record), flush=True)
+                return
+
+            output = {'sites': []}
+
+            for record in records:
+                if record['type'] == 'summary':
+                    output['summary'] = record['data']
+                else:
+                    output['sites'].append(record)
+
+        print(json.dumps(output, indent=4, separators=(',', ': ')))
+        return
+
+    if args.output_format == 'ndjson':
+        # one line per page as soon as it is analyzed, then the site summary
+        for record in iter_analyze(args.site, args.sitemap, **options):
+            print(json.dumps(record), flush=True)
+        return
+
+    output = analyze(args.site, args.sitemap, **options)
+
+    if args.output_format == 'html':
+        from jinja2 import Environment
+        from jinja2 import FileSystemLoader
+
+        env = Environment(loader=FileSystemLoader(os.path.join(module_path, 'templates')))
+        template = env.get_template('index.html')
+        output_from_parsed_template = template.render(result=output)
+        print(output_from_parsed_template)
+    elif args.output_format == 'json':
+        print(json.dumps(output, indent=4, separators=(',', ': ')))
 
 
 def main(args=None):
-    if not args:
-        module_path = os.path.dirname(inspect.getfile(analyze))
+    if not args and sys.argv[1:2] == ['query']:
+        query(sys.argv[2:])
+    elif not args:
+        module_path = os.path.dirname(os.path.abspath(__file__))
 
         arg_parser = argparse.ArgumentParser()
 
-        arg_parser.add_argument('site', help='URL of the site you are wanting to analyze.')
+        arg_parser.add_argument('site', nargs='?', help='URL of the site you are wanting to analyze.')
+        arg_parser.add_argument('--sites-file', help='File with one site per line, optionally followed by its sitemap '
+                                                     'URL, to analyze instead of a single site.')
+        arg_parser.add_argument('--max-sites', help='Number of sites from --sites-file to crawl at once.', type=int,
+                                default=4)
+        arg_parser.add_argument('--max-workers', help='Number of pages to fetch at once across all sites of '
+                                                      '--sites-file.', type=int, default=16)
         arg_parser.add_argument('-s', '--sitemap', help='URL of the sitemap to seed the crawler with.')
-        arg_parser.add_argument('-f', '--output-format', help='Output format.', choices=['json', 'html', ],
+        arg_parser.add_argument('-f', '--output-format', help='Output format.', choices=['json', 'html', 'ndjson', ],
                                 default='json')
+        arg_parser.add_argument('-w', '--workers', help='Number of pages to fetch and analyze concurrently.', type=int,
+                                default=1)
+        arg_parser.add_argument('-p', '--processes', help='Number of processes to parse pages in.', type=int)
+        arg_parser.add_argument('--max-pages', help='Stop after crawling this many pages.', type=int)
+        arg_parser.add_argument('--max-depth', help='Do not follow links more than this many clicks from the start.',
+                                type=int)
+        arg_parser.add_argument('--frontier-order', help='Crawl breadth first ("bfs", the default) or pages high up '
+                                                         'the url hierarchy first ("priority").',
+                                choices=['bfs', 'priority', ], default='bfs')
+        arg_parser.add_argument('--bloom-capacity', help='Remember queued urls in a Bloom filter sized for this many '
+                                                         'urls instead of a set, for very large sites.', type=int)
+        arg_parser.add_argument('--cache-dir', help='Directory to keep analyzed pages in between crawls.')
+        arg_parser.add_argument('--profile', help='Report time spent in each stage of the crawl.',
+                                action='store_true')
+        arg_parser.add_argument('--respect-robots', help='Skip pages robots.txt disallows and obey its Crawl-delay.',
+                                action='store_true')
+        arg_parser.add_argument('--checks', help='Checks to run: "full" (the default), "fast" for content checks '
+                                                 'only, without extra requests, or a comma separated list of check '
+                                                 'names.', default='full')
+        arg_parser.add_argument('--robots-ttl', help='Seconds to keep a host\'s robots.txt before fetching it again.',
+                                type=float, default=3600)
+        arg_parser.add_argument('--crawl-delay', help='Seconds to wait between requests to the same host.',
+                                type=float)
+        arg_parser.add_argument('--store', help='SQLite database to save the results in, read it back with '
+                                                '"seoanalyze query".')
 
         args = arg_parser.parse_args()
 
-        output = analyze(args.site, args.sitemap)
+        from seoanalyzer.checks import PROFILES
+        from seoanalyzer.checks import select_checks
+
+        checks = args.checks if args.checks in PROFILES else [name.strip() for name in args.checks.split(',')]
+
+        try:
+            select_checks(checks, True, True)
+        except ValueError as e:
+            arg_parser.error(str(e))
+
+        if (args.site is None) == (args.sites_file is None):
+            arg_parser.error('give either a site or --sites-file')
+        if args.sites_file and args.output_format == 'html':
+            arg_parser.error('--sites-file supports the json and ndjson output formats')
+
+        options = dict(workers=args.workers, processes=args.processes, max_pages=args.max_pages,
+                       max_depth=args.max_depth, frontier_order=args.frontier_order,
+                       bloom_capacity=args.bloom_capacity, cache_dir=args.cache_dir, profile=args.profile,
+                       respect_robots=args.respect_robots, crawl_delay=args.crawl_delay, robots_ttl=args.robots_ttl,
+                       checks=checks)
 
-        if args.output_format == 'html':
-            from jinja2 import Environment
-            from jinja2 import FileSystemLoader
+        if args.store:
+            from seoanalyzer.store import ResultStore
 
-            env = Environment(loader=FileSystemLoader(os.path.join(module_path, 'templates')))
-            template = env.get_template('index.html')
-            output_from_parsed_template = template.render(result=output)
-            print(output_from_parsed_template)
-        elif args.output_format == 'json':
-            print(json.dumps(output, indent=4, separators=(',', ': ')))
+            with ResultStore(args.store) as store:
+                run(args, dict(options, store=store), module_path)
+        else:
+            run(args, options, module_path)
     else:
         exit(1)
 
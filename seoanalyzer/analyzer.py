@@ -1,55 +1,283 @@
+import asyncio
 import json
+import threading
 import time
 
-from operator import itemgetter
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from seoanalyzer.checks import select_checks
+from seoanalyzer.host import HostFactsCache
+from seoanalyzer.http import AsyncHttp
+from seoanalyzer.keywords import top_keywords
+from seoanalyzer.robots import RobotsCache
 from seoanalyzer.website import Website
 
-def analyze(url, sitemap_url=None, analyze_headings=False, analyze_extra_tags=False, follow_links=True):
+def analyze(url, sitemap_url=None, analyze_headings=False, analyze_extra_tags=False, follow_links=True, workers=1,
+            processes=None, max_pages=None, max_depth=None, cache_dir=None, keyword_limit=None, keyword_min_count=5,
+            prune_ngrams=False, near_duplicate_threshold=0.95, profile=False, metrics_hooks=None,
+            respect_robots=False, crawl_delay=None, checks='full', store=None, frontier_order='bfs', priority=None,
+            bloom_capacity=None, robots_ttl=3600):
+    return collect(iter_analyze(url, sitemap_url, analyze_headings, analyze_extra_tags, follow_links, workers,
+                                processes, max_pages, max_depth, cache_dir, keyword_limit, keyword_min_count,
+                                prune_ngrams, near_duplicate_threshold, profile, metrics_hooks, respect_robots,
+                                crawl_delay, checks, store, frontier_order, priority, bloom_capacity, robots_ttl))
+
+
+def collect(records):
+    """
+    Builds the analyze output from the records of iter_analyze
+    """
+    output = {'pages': []}
+
+    for record in records:
+        if record['type'] == 'page':
+            output['pages'].append(record['data'])
+        else:
+            output.update(record['data'])
+
+    return output
+
+
+def iter_analyze(url, sitemap_url=None, analyze_headings=False, analyze_extra_tags=False, follow_links=True,
+                 workers=1, processes=None, max_pages=None, max_depth=None, cache_dir=None, keyword_limit=None,
+                 keyword_min_count=5, prune_ngrams=False, near_duplicate_threshold=0.95, profile=False,
+                 metrics_hooks=None, respect_robots=False, crawl_delay=None, checks='full', store=None,
+                 frontier_order='bfs', priority=None, bloom_capacity=None, robots_ttl=3600):
+    """
+    Generator version of analyze. Yields {'type': 'page', 'data': ...} for
+    each page as soon as it has been analyzed, then one
+    {'type': 'summary', 'data': ...} record with everything else analyze
+    returns. Pages are not kept around, so memory stays flat on big sites.
+    With a ResultStore as `store` the records are written to it as they
+    pass.
+    """
+    start_time = time.time()
+
+    site = Website(url, sitemap_url, analyze_headings, analyze_extra_tags, follow_links, workers, processes,
+                   max_pages, max_depth, frontier_order=frontier_order, priority=priority,
+                   bloom_capacity=bloom_capacity, cache_dir=cache_dir, keyword_limit=keyword_limit,
+                   keyword_min_count=keyword_min_count, prune_ngrams=prune_ngrams,
+                   near_duplicate_threshold=near_duplicate_threshold, profile=profile,
+                   metrics_hooks=metrics_hooks, respect_robots=respect_robots, crawl_delay=crawl_delay,
+                   robots_ttl=robots_ttl, checks=checks)
+
+    records = iter_site(site, start_time)
+
+    if store is not None:
+        records = store.record(url, records)
+
+    yield from records
+
+
+def iter_site(site, start_time):
+    for page in site.iter_crawl():
+        yield {'type': 'page', 'data': page.talk()}
+
+    # a stopped crawl is incomplete, it has no summary
+    if site.stopping.is_set():
+        return
+
+    yield {'type': 'summary', 'data': site_summary(site, start_time)}
+
+
+def analyze_many(sites, max_sites=4, max_workers=16, analyze_headings=False, analyze_extra_tags=False,
+                 follow_links=True, workers=4, processes=None, max_pages=None, max_depth=None, cache_dir=None,
+                 keyword_limit=None, keyword_min_count=5, prune_ngrams=False, near_duplicate_threshold=0.95,
+                 profile=False, metrics_hooks=None, respect_robots=False, crawl_delay=None, checks='full', store=None,
+                 frontier_order='bfs', priority=None, bloom_capacity=None, robots_ttl=3600):
+    """
+    Analyze many sites in one go. `sites` holds urls or (url, sitemap_url)
+    pairs and is read lazily. Up to `max_sites` sites are crawled at once,
+    each with up to `workers` pages in flight, and no more than
+    `max_workers` pages are fetched across all of them. The sites share the
+    http pool, host checks, robots.txt and stemming caches, and a process
+    pool when `processes` is set.
+
+    Yields {'type': 'site', 'url': ..., 'data': ...} with the analyze output
+    of each site as it finishes, or {'type': 'error', 'url': ..., 'data': ...}
+    if its crawl failed, then one {'type': 'summary', 'data': ...} record
+    with the overall throughput. Each site is written to `store`, a
+    ResultStore, as it is crawled. Closing the generator early stops the
+    crawls in flight without waiting for them to finish.
+    """
+    start_time = time.time()
+    # a bad check name should fail once up front, not once per site
+    checks = select_checks(checks, analyze_headings, analyze_extra_tags)
+    host_facts = HostFactsCache()
+    robots = RobotsCache(ttl=robots_ttl)
+    sites = iter(sites)
+    summary = {'sites': 0, 'pages': 0, 'errors': 0}
+    stopping = threading.Event()
+
+    def crawl(url, sitemap_url, executor, parse_pool):
+        site = Website(url, sitemap_url, analyze_headings, analyze_extra_tags, follow_links, workers, processes,
+                       max_pages=max_pages, max_depth=max_depth, frontier_order=frontier_order, priority=priority,
+                       bloom_capacity=bloom_capacity, cache_dir=cache_dir, keyword_limit=keyword_limit,
+                       keyword_min_count=keyword_min_count, prune_ngrams=prune_ngrams,
+                       near_duplicate_threshold=near_duplicate_threshold, profile=profile,
+                       metrics_hooks=metrics_hooks, respect_robots=respect_robots, crawl_delay=crawl_delay,
+                       checks=checks, host_facts=host_facts, robots=robots, executor=executor,
+                       parse_pool=parse_pool, stopping=stopping)
+
+        records = iter_site(site, time.time())
+
+        if store is not None:
+            records = store.record(url, records)
+
+        return collect(records)
+
+    parse_pool = ProcessPoolExecutor(max_workers=processes) if processes else None
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    site_executor = ThreadPoolExecutor(max_workers=max_sites)
+    pending = {}
+
+    try:
+        while True:
+            while len(pending) < max_sites:
+                url, sitemap_url = next_site(sites)
+
+                if url is None:
+                    break
+
+                pending[site_executor.submit(crawl, url, sitemap_url, executor, parse_pool)] = url
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                url = pending.pop(future)
+
+                try:
+                    output = future.result()
+                except Exception as e:
+                    summary['errors'] += 1
+                    yield {'type': 'error', 'url': url, 'data': str(e)}
+                    continue
+
+                summary['sites'] += 1
+                summary['pages'] += len(output['pages'])
+                yield {'type': 'site', 'url': url, 'data': output}
+    finally:
+        # when the caller stops early, the crawls still running give up instead of being waited for
+        stopping.set()
+
+        for future in pending:
+            future.cancel()
+
+        for pool in (site_executor, executor, parse_pool):
+            if pool is not None:
+                shutdown(pool)
+
+    summary['total_time'] = time.time() - start_time
+    summary['sites_per_second'] = summary['sites'] / summary['total_time'] if summary['total_time'] else 0.0
+    summary['pages_per_second'] = summary['pages'] / summary['total_time'] if summary['total_time'] else 0.0
+
+    yield {'type': 'summary', 'data': summary}
+
+
+def shutdown(executor):
+    """
+    Shut an executor down without waiting for the work it is running, and
+    drop the work it hasn't started
+    """
+    try:
+        executor.shutdown(wait=False, cancel_futures=True)
+    except TypeError:
+        # cancel_futures is new in python 3.9
+        executor.shutdown(wait=False)
+
+
+def next_site(sites):
+    """
+    The next (url, sitemap_url) of analyze_many, or (None, None) when there
+    are none left
+    """
+    site = next(sites, None)
+
+    if site is None:
+        return None, None
+    if isinstance(site, str):
+        return site, None
+
+    url, sitemap_url = site
+
+    return url, sitemap_url
+
+
+async def analyze_async(url, sitemap_url=None, analyze_headings=False, analyze_extra_tags=False, follow_links=True,
+                        concurrency=10, max_pages=None, max_depth=None, cache_dir=None, keyword_limit=None,
+                        keyword_min_count=5, prune_ngrams=False, near_duplicate_threshold=0.95, profile=False,
+                        metrics_hooks=None, respect_robots=False, crawl_delay=None, checks='full', store=None,
+                        frontier_order='bfs', priority=None, bloom_capacity=None, robots_ttl=3600):
+    """
+    Coroutine version of analyze for use inside an event loop. Up to
+    `concurrency` pages, host checks and DNS lookups are in flight at once and
+    parsing runs in the loop's default executor. The output is written to
+    `store`, a ResultStore, once the crawl is done.
+    """
     start_time = time.time()
 
+    site = Website(url, sitemap_url, analyze_headings, analyze_extra_tags, follow_links, concurrency,
+                   max_pages=max_pages, max_depth=max_depth, frontier_order=frontier_order, priority=priority,
+                   bloom_capacity=bloom_capacity, cache_dir=cache_dir, keyword_limit=keyword_limit,
+                   keyword_min_count=keyword_min_count, prune_ngrams=prune_ngrams,
+                   near_duplicate_threshold=near_duplicate_threshold, profile=profile,
+                   metrics_hooks=metrics_hooks, respect_robots=respect_robots, crawl_delay=crawl_delay,
+                   robots_ttl=robots_ttl, checks=checks)
+    async_http = AsyncHttp(max_concurrency=concurrency)
+
+    try:
+        await site.crawl_async(async_http)
+    finally:
+        async_http.close()
+
+    output = summarize(site, start_time)
+
+    if store is not None:
+        await asyncio.get_running_loop().run_in_executor(None, store.save, url, output, start_time)
+
+    return output
+
+
+def summarize(site, start_time):
+    """
+    Builds the output dictionary from a crawled Website
+    """
+    output = {'pages': [p.talk() for p in site.crawled_pages]}
+    output.update(site_summary(site, start_time))
+
+    return output
+
+
+def site_summary(site, start_time):
+    """
+    Everything in the output apart from the pages
+    """
     def calc_total_time():
         return time.time() - start_time
 
-    output = {'pages': [], 'keywords': [], 'errors': [], 'total_time': calc_total_time()}
-
-    site = Website(url, sitemap_url, analyze_headings, analyze_extra_tags, follow_links)
+    output = {'keywords': [], 'errors': [], 'total_time': calc_total_time()}
 
-    site.crawl()
+    output['hosts'] = site.host_facts.talk([site.base_netloc])
 
-    for p in site.crawled_pages:
-        output['pages'].append(p.talk())
+    output['frontier'] = site.frontier.metrics()
 
     output['duplicate_pages'] = [list(site.content_hashes[p]) for p in site.content_hashes if len(site.content_hashes[p]) > 1]
 
-    sorted_words = sorted(site.wordcount.items(), key=itemgetter(1), reverse=True)
-    sorted_bigrams = sorted(site.bigrams.items(), key=itemgetter(1), reverse=True)
-    sorted_trigrams = sorted(site.trigrams.items(), key=itemgetter(1), reverse=True)
-
-    output['keywords'] = []
-
-    for w in sorted_words:
-        if w[1] > 4:
-            output['keywords'].append({
-                'word': w[0],
-                'count': w[1],
-            })
-
-    for w, v in sorted_bigrams:
-        if v > 4:
-            output['keywords'].append({
-                'word': w,
-                'count': v,
-            })
-
-    for w, v in sorted_trigrams:
-        if v > 4:
-            output['keywords'].append({
-                'word': w,
-                'count': v,
-            })
-
-    # Sort one last time...
-    output['keywords'] = sorted(output['keywords'], key=itemgetter('count'), reverse=True)
+    output['near_duplicate_pages'] = site.near_duplicates.groups()
+
+    output['link_graph'] = site.link_graph.talk()
+
+    output['keywords'] = top_keywords((site.wordcount, site.bigrams, site.trigrams), site.keyword_limit,
+                                      site.keyword_min_count)
+
+    if site.metrics.enabled:
+        output['timings'] = site.metrics.talk()
 
     output['total_time'] = calc_total_time()
 
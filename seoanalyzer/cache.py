@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from collections import Counter
+
+from seoanalyzer.page import HOST_FIELDS
+from seoanalyzer.page import PageResult
+
+# bumped whenever the records change shape, older records are ignored
+VERSION = 2
+
+
+class CrawlCache():
+    """
+    Remembers every analyzed page on disk, one JSON file per url, so the
+    next crawl of the site can send conditional requests and reuse the
+    analysis of pages that did not change. Records are tagged with the
+    `options` that produced them, and records made with other options are
+    ignored, so a cached page reports the same as a fresh one. Only the
+    page's own analysis is kept: the host checks run again on every hit, as
+    the host may have changed since.
+    """
+
+    def __init__(self, path, options=None):
+        self.path = path
+        self.options = options
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(path, exist_ok=True)
+
+    def filename(self, url):
+        return os.path.join(self.path, f'{hashlib.sha1(url.encode("utf-8")).hexdigest()}.json')
+
+    def get(self, url):
+        try:
+            with open(self.filename(url), encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if record.get('version') != VERSION or record.get('options') != self.options:
+            return None
+
+        return record
+
+    def put(self, url, result, etag=None, last_modified=None):
+        # the timings are the current crawl's, and only there when it is profiled
+        context = {key: value for key, value in result.talk().items() if key not in HOST_FIELDS and key != 'timings'}
+        context['overall_score'] -= result.host_score
+
+        record = {
+            'version': VERSION,
+            'options': self.options,
+            'url': result.url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': result.content_hash,
+            'simhash': result.simhash,
+            'links': result.links,
+            'site_links': result.site_links,
+            'wordcount': result.wordcount,
+            'bigrams': result.bigrams,
+            'trigrams': result.trigrams,
+            'favicon_link': result.favicon_link,
+            'context': context,
+        }
+
+        # write to a temporary file first so a crash never leaves half a record behind
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(temp_path, self.filename(url))
+
+    def conditional_headers(self, record):
+        headers = {}
+
+        if record is None:
+            return headers
+
+        if record['etag']:
+            headers['If-None-Match'] = record['etag']
+        if record['last_modified']:
+            headers['If-Modified-Since'] = record['last_modified']
+
+        return headers
+
+    def result(self, record, page):
+        """
+        The cached analysis of `page`, with its host checks run against the
+        host's current facts
+        """
+        page.run_host_checks(record['favicon_link'])
+
+        context = page.talk()
+        context.update(record['context'])
+        context['overall_score'] += page.host_score
+
+        return PageResult(record['url'], page.depth, record['content_hash'], record['simhash'], record['links'],
+                          Counter(record['wordcount']), Counter(record['bigrams']), Counter(record['trigrams']),
+                          context, page.timings, record['site_links'], page.host_score, page.favicon_link)
@@ -0,0 +1,127 @@
+from functools import lru_cache
+
+# what a check reads: the parsed tree, the page's visible text, the facts
+# probed once per host, or requests of its own
+DOM = 'dom'
+TEXT = 'text'
+HOST = 'host'
+NETWORK = 'network'
+
+
+class Check():
+    """
+    One check of a page: the Page method that runs it, the inputs it needs,
+    the host probes it reads and the stage it is timed under. `host` checks
+    report on the page's host rather than the page itself.
+    """
+
+    __slots__ = ('name', 'method', 'inputs', 'probes', 'stage', 'host')
+
+    def __init__(self, name, method, inputs=(), probes=(), stage='checks'):
+        self.name = name
+        self.method = method
+        self.inputs = frozenset(inputs)
+        self.probes = tuple(probes)
+        self.stage = stage
+        self.host = bool(self.inputs & {HOST, NETWORK})
+
+
+# every check, in the order they run
+CHECKS = [
+    Check('keywords', 'check_keywords', [DOM, TEXT], stage='process_text'),
+    Check('url_length', 'check_url_length'),
+    Check('custom_404', 'check_custom_404', [HOST], ['custom_404']),
+    Check('favicon', 'check_favicon', [DOM, HOST], ['favicon']),
+    Check('language', 'check_language', [DOM]),
+    Check('dmarc', 'check_dmarc', [HOST], ['dmarc']),
+    Check('title', 'check_title', [DOM]),
+    Check('description', 'check_description', [DOM]),
+    Check('meta_keywords', 'check_meta_keywords', [DOM]),
+    Check('resolve_url', 'check_resolve_url', [HOST], ['resolve_url']),
+    Check('in_page_links', 'check_in_page_links', [DOM]),
+    Check('open_graph', 'check_open_graph', [DOM]),
+    Check('links', 'check_links', [DOM]),
+    Check('images', 'check_images', [DOM]),
+    Check('emails', 'check_emails', [DOM]),
+    Check('h1', 'check_h1', [DOM]),
+    # only run with analyze_headings
+    Check('schema', 'check_schema', [DOM], stage='headings'),
+    Check('twitter_cards', 'check_twitter_cards', [DOM], stage='headings'),
+    Check('headings', 'check_headings', [DOM], stage='headings'),
+    # only run with analyze_extra_tags
+    Check('sitemap', 'check_sitemap', [NETWORK], stage='additional_tags'),
+    Check('additional_tags', 'check_additional_tags', [DOM], stage='additional_tags'),
+]
+
+CHECKS_BY_NAME = {check.name: check for check in CHECKS}
+
+PROFILES = {
+    'full': [check.name for check in CHECKS],
+    # content only, no requests besides the pages themselves
+    'fast': [check.name for check in CHECKS if not check.host],
+}
+
+
+class CheckPlan():
+    """
+    The checks selected for a crawl, with the union of their inputs and
+    host probes so a page only computes what they need
+    """
+
+    __slots__ = ('names', 'checks', 'inputs', 'probes')
+
+    def __init__(self, names):
+        self.names = names
+        self.checks = [CHECKS_BY_NAME[name] for name in names]
+        self.inputs = frozenset().union(*[check.inputs for check in self.checks])
+        self.probes = tuple(dict.fromkeys(probe for check in self.checks for probe in check.probes))
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __reduce__(self):
+        # pages are sent to worker processes, send the names only
+        return plan, (self.names,)
+
+    def needs(self, name):
+        return name in self.inputs
+
+
+@lru_cache(maxsize=None)
+def plan(names):
+    return CheckPlan(names)
+
+
+def select_checks(checks='full', analyze_headings=False, analyze_extra_tags=False):
+    """
+    Returns the CheckPlan for a profile name or a list of check names. The
+    heading checks only run with analyze_headings and the extra tag checks
+    with analyze_extra_tags.
+    """
+    if isinstance(checks, CheckPlan):
+        return checks
+
+    if checks is None:
+        checks = 'full'
+
+    if isinstance(checks, str):
+        if checks not in PROFILES:
+            raise ValueError(f'Unknown check profile {checks!r}, use one of {", ".join(PROFILES)}')
+
+        checks = PROFILES[checks]
+
+    unknown = [name for name in checks if name not in CHECKS_BY_NAME]
+
+    if unknown:
+        raise ValueError(f'Unknown checks: {", ".join(unknown)}')
+
+    skipped = set()
+
+    if not analyze_headings:
+        skipped.add('headings')
+    if not analyze_extra_tags:
+        skipped.add('additional_tags')
+
+    selected = set(checks)
+
+    return plan(tuple(check.name for check in CHECKS if check.name in selected and check.stage not in skipped))
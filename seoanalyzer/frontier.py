@@ -0,0 +1,222 @@
+import hashlib
+import heapq
+import math
+
+from collections import deque
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    Returns the form of a url used to tell whether two links point to the
+    same page: lowercase scheme and host, no default port, no fragment and
+    at least a / for the path.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+
+    if parts.username or parts.password:
+        netloc = f'{parts.netloc.rsplit("@", 1)[0]}@{netloc}'
+
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f'{netloc}:{port}'
+
+    path = parts.path or ('/' if netloc else '')
+
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+
+
+def url_priority(url, depth):
+    """
+    The default crawl priority of order='priority': pages high up the url
+    hierarchy before the ones below them, then fewer clicks from the start
+    page first, and urls with a query string, often filtered or sorted
+    listings, after the rest
+    """
+    parts = urlsplit(url)
+
+    return bool(parts.query), parts.path.rstrip('/').count('/'), depth
+
+
+class BloomFilter():
+    """
+    A fixed size set that can answer "definitely not seen" or "probably
+    seen", for sites too big to keep every url in memory
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class Frontier():
+    """
+    The queue of urls waiting to be crawled. Urls are deduplicated when they
+    are added, so every page is queued at most once, and they come back out
+    breadth first or, with order='priority', lowest `priority(url, depth)`
+    first, url_priority by default. Iterators of urls, like a sitemap being downloaded, can be added
+    as sources; they are read lazily and drained before the queue. Urls for
+    which `allow(url)` is false, e.g. ones robots.txt disallows, are skipped
+    when they come out.
+    """
+
+    def __init__(self, max_pages=None, max_depth=None, order='bfs', priority=None, bloom_capacity=None,
+                 allow=None):
+        if order not in ('bfs', 'priority'):
+            raise ValueError(f'Unknown frontier order {order}')
+
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.order = order
+        self.priority = priority if priority is not None else url_priority
+        self.allow = allow
+        self.seen = BloomFilter(bloom_capacity) if bloom_capacity else set()
+        self.queue = deque() if order == 'bfs' else []
+        self.sources = deque()
+        self.counter = 0
+        self.enqueued = 0
+        self.duplicates = 0
+        self.too_deep = 0
+        self.disallowed = 0
+        self.popped = 0
+        self.max_size = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def admit(self, url, depth):
+        """
+        Returns True, and remembers the url, if it wasn't seen before and
+        isn't too deep
+        """
+        if self.max_depth is not None and depth > self.max_depth:
+            self.too_deep += 1
+            return False
+
+        key = normalize_url(url)
+
+        if key in self.seen:
+            self.duplicates += 1
+            return False
+
+        self.seen.add(key)
+        self.enqueued += 1
+
+        return True
+
+    def push(self, url, depth=0):
+        """
+        Queue a url unless it was queued before or is too deep. Returns True
+        if it was queued.
+        """
+        if not self.admit(url, depth):
+            return False
+
+        if self.order == 'bfs':
+            self.queue.append((url, depth))
+        else:
+            heapq.heappush(self.queue, (self.priority(url, depth), self.counter, url, depth))
+            self.counter += 1
+
+        self.max_size = max(self.max_size, len(self.queue))
+
+        return True
+
+    def extend(self, urls, depth=0):
+        for url in urls:
+            self.push(url, depth)
+
+    def add_source(self, urls, depth=0):
+        """
+        Crawl the urls of an iterator, reading it only as urls are needed
+        """
+        self.sources.append((iter(urls), depth))
+
+    def close(self):
+        """
+        Stop reading the sources that are left, closing their downloads
+        """
+        while self.sources:
+            urls, _ = self.sources.popleft()
+
+            if hasattr(urls, 'close'):
+                urls.close()
+
+    def pop_source(self):
+        while self.sources:
+            urls, depth = self.sources[0]
+
+            for url in urls:
+                if self.admit(url, depth):
+                    return url, depth
+
+            self.sources.popleft()
+
+        return None
+
+    def pop(self):
+        """
+        Returns the next (url, depth) to crawl, or None when the queue is
+        empty or max_pages urls have been handed out
+        """
+        while self.max_pages is None or self.popped < self.max_pages:
+            item = self.pop_source() or self.pop_queue()
+
+            if item is None:
+                return None
+
+            if self.allow is not None and not self.allow(item[0]):
+                self.disallowed += 1
+                continue
+
+            self.popped += 1
+
+            return item
+
+        return None
+
+    def pop_queue(self):
+        if not self.queue:
+            return None
+
+        if self.order == 'bfs':
+            return self.queue.popleft()
+
+        _, _, url, depth = heapq.heappop(self.queue)
+
+        return url, depth
+
+    def metrics(self):
+        return {
+            'queued': len(self.queue),
+            'max_queued': self.max_size,
+            'enqueued': self.enqueued,
+            'duplicates': self.duplicates,
+            'too_deep': self.too_deep,
+            'disallowed': self.disallowed,
+            'crawled': self.popped,
+        }
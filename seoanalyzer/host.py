@@ -0,0 +1,255 @@
+import asyncio
+import threading
+
+from urllib.parse import urlsplit
+
+from seoanalyzer.http import get_client
+from seoanalyzer.resolver import get_resolver
+
+# the probes a host can be checked with and the HostFacts method running each
+HOST_PROBES = {
+    'custom_404': 'check_custom_error',
+    'favicon': 'check_favicon',
+    'dmarc': 'check_dmarc',
+    'resolve_url': 'check_resolve_url',
+}
+
+
+class HostFacts():
+    """
+    Checks that only depend on the host a page lives on, not on the page
+    itself. Each probe runs once, the first time any page asks for it.
+    """
+
+    def __init__(self, scheme, netloc):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.custom_error = ''
+        self.favicon = None
+        self.dmarc_status = ''
+        self.resolve_url = {}
+        self.resolve_url_status = ''
+        self.loaded = False
+        self.probed = set()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks and pending tasks can't be sent to another process
+        state = self.__dict__.copy()
+        state['lock'] = None
+        state['loading'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def talk(self):
+        """
+        Returns a dictionary that can be printed
+        """
+
+        return {
+            'custom_404_status': self.custom_error,
+            'favicon': self.favicon,
+            'dmarc_status': self.dmarc_status,
+            'resolveurlarray': self.resolve_url,
+            'resolve_url_status': self.resolve_url_status,
+        }
+
+    def missing(self, probes):
+        if self.loaded:
+            return []
+
+        return [probe for probe in probes if probe not in self.probed]
+
+    def load(self, probes=HOST_PROBES):
+        """
+        Run the host probes that no other page has run yet
+        """
+
+        with self.lock:
+            for probe in self.missing(probes):
+                getattr(self, HOST_PROBES[probe])()
+                self.probed.add(probe)
+
+            self.loaded = self.loaded or len(self.probed) == len(HOST_PROBES)
+
+    async def load_async(self, async_http, probes=HOST_PROBES):
+        """
+        Run the host probes concurrently without blocking the event loop
+        """
+
+        tasks = []
+
+        for probe in self.missing(probes):
+            if probe not in self.loading:
+                self.loading[probe] = asyncio.ensure_future(self.probe_async(probe, async_http))
+
+            tasks.append(self.loading[probe])
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def probe_async(self, probe, async_http):
+        if probe == 'custom_404':
+            result = await async_http.status(self.custom_error_url())
+        elif probe == 'favicon':
+            result = await async_http.status(self.favicon_url())
+        elif probe == 'dmarc':
+            result = await async_http.run(self.lookup_dmarc)
+        else:
+            result = await asyncio.gather(*[async_http.status(url) for url in self.resolve_urls()])
+
+        with self.lock:
+            if probe in self.probed:
+                return
+
+            if probe == 'custom_404':
+                self.record_custom_error(*result)
+            elif probe == 'favicon':
+                self.record_favicon(*result)
+            elif probe == 'dmarc':
+                self.record_dmarc(result)
+            else:
+                self.record_resolve_url(result)
+
+            self.probed.add(probe)
+            self.loaded = self.loaded or len(self.probed) == len(HOST_PROBES)
+
+    def custom_error_url(self):
+        return f'{self.scheme}://{self.netloc}/nonexistent_path'
+
+    def check_custom_error(self):
+        self.record_custom_error(*get_client().status(self.custom_error_url()))
+
+    def record_custom_error(self, status_code, _):
+        if status_code == 404:
+            self.custom_error = 'good'
+        else:
+            self.custom_error = 'bad'
+
+    def favicon_url(self):
+        return f'{self.scheme}://{self.netloc}/favicon.ico'
+
+    def check_favicon(self):
+        self.record_favicon(*get_client().status(self.favicon_url()))
+
+    def record_favicon(self, status_code, _):
+        if status_code == 200:
+            self.favicon = self.favicon_url()
+
+    def lookup_dmarc(self):
+        """
+        Returns the TXT records of the domain's _dmarc entry, or None if the
+        lookup failed
+        """
+        analyse_domain = self.netloc.replace('www.', '')
+        try:
+            return get_resolver().resolve('_dmarc.' + analyse_domain, 'TXT') or None
+        except:
+            return None
+
+    def check_dmarc(self):
+        self.record_dmarc(self.lookup_dmarc())
+
+    def record_dmarc(self, records):
+        if records is None:
+            self.dmarc_status = 'bad'
+            return
+
+        for dns_data in records:
+            if 'DMARC1' in dns_data:
+                self.dmarc_status = 'good'
+
+    def resolve_urls(self):
+        """
+        The www and non-www, http and https variants of the domain
+        """
+        domain_parsed = self.netloc.replace('www.', '')
+
+        return [
+            f'https://www.{domain_parsed}',
+            f'http://www.{domain_parsed}',
+            f'https://{domain_parsed}',
+            f'http://{domain_parsed}',
+        ]
+
+    def check_resolve_url(self):
+        self.record_resolve_url([get_client().status(url) for url in self.resolve_urls()])
+
+    def record_resolve_url(self, statuses):
+        status_code_list = [status_code for status_code, _ in statuses]
+        self.resolve_url['url'] = self.resolve_urls()
+        self.resolve_url['status_code'] = status_code_list
+        self.resolve_url['redirected_url'] = [redirected_url for _, redirected_url in statuses]
+        if 403 not in status_code_list:
+            self.resolve_url_status = 'good'
+        else:
+            self.resolve_url_status = 'bad'
+
+
+class HostFactsCache():
+    """
+    Shares one HostFacts per host between every page of a crawl
+    """
+
+    def __init__(self):
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def host(self, url):
+        parsed_url = urlsplit(url)
+
+        with self.lock:
+            facts = self.hosts.get(parsed_url.netloc)
+
+            if facts is None:
+                facts = HostFacts(parsed_url.scheme or 'http', parsed_url.netloc)
+                self.hosts[parsed_url.netloc] = facts
+
+        return facts
+
+    def only(self, url):
+        """
+        A cache holding just the url's host, small enough to send along with
+        a page to a worker process
+        """
+        cache = HostFactsCache()
+        netloc = urlsplit(url).netloc
+
+        with self.lock:
+            if netloc in self.hosts:
+                cache.hosts[netloc] = self.hosts[netloc]
+
+        return cache
+
+    def get(self, url, probes=HOST_PROBES):
+        facts = self.host(url)
+        facts.load(probes)
+
+        return facts
+
+    async def get_async(self, url, async_http, probes=HOST_PROBES):
+        facts = self.host(url)
+        await facts.load_async(async_http, probes)
+
+        return facts
+
+    def talk(self, netlocs=None):
+        """
+        The facts of every loaded host, or only of `netlocs` when the cache is
+        shared between sites
+        """
+        return {netloc: facts.talk() for netloc, facts in self.hosts.items()
+                if (facts.loaded or facts.probed) and (netlocs is None or netloc in netlocs)}
@@ -1,25 +1,369 @@
+import asyncio
 import certifi
+import contextvars
+import functools
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from urllib3 import HTTPConnectionPool
+from urllib3 import HTTPSConnectionPool
 from urllib3 import PoolManager
+from urllib3 import Retry
 from urllib3 import Timeout
-import random
-from fake_useragent import UserAgent
+from urllib3.connection import HTTPConnection
+from urllib3.connection import HTTPSConnection
+from urllib3.exceptions import HTTPError
+from urllib3.exceptions import NewConnectionError
+
+from seoanalyzer.resolver import get_resolver
+
+# content types Http.fetch reads the body of, anything else is skipped
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+# skipped bodies up to this size are read anyway so the connection can be reused
+DRAIN_LIMIT = 65536
+
+# listeners of the requests made by the current thread or task only, see listening()
+context_listeners = contextvars.ContextVar('context_listeners', default=())
+
+
+@contextmanager
+def listening(listener):
+    """
+    Also pass the responses to requests made inside the block to
+    `listener.on_response`, but only those made by this thread or task, so
+    crawls running side by side each count their own traffic
+    """
+    token = context_listeners.set(context_listeners.get() + (listener,))
+
+    try:
+        yield listener
+    finally:
+        context_listeners.reset(token)
+
+
+class ResolvingConnection():
+    """
+    Looks the host of a new connection up through the shared Resolver, so
+    the crawl, the host checks and DMARC share one DNS cache. The host name
+    is still used for the Host header, SNI and certificate checks.
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+
+        try:
+            addresses = get_resolver().addresses(host)
+        except Exception:
+            addresses = []
+
+        if not addresses:
+            # let urllib3 resolve it and report the error
+            return super()._new_conn()
+
+        error = None
+
+        for address in addresses:
+            self._dns_host = address
+
+            try:
+                return super()._new_conn()
+            except NewConnectionError as e:
+                error = e
+            finally:
+                self._dns_host = host
+
+        raise error
+
+
+class ResolvingHTTPConnection(ResolvingConnection, HTTPConnection):
+    pass
+
+
+class ResolvingHTTPSConnection(ResolvingConnection, HTTPSConnection):
+    pass
+
+
+class ResolvingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = ResolvingHTTPConnection
+
+
+class ResolvingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = ResolvingHTTPSConnection
+
+
+class Fetched():
+    """
+    A response read by Http.fetch: the raw body and its sha1, or no body if
+    its content type was skipped, and whether it was cut at the size limit
+    """
+
+    __slots__ = ('url', 'status', 'headers', 'data', 'sha1', 'skipped', 'truncated')
+
+    def __init__(self, url, status, headers):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.data = None
+        self.sha1 = None
+        self.skipped = False
+        self.truncated = False
+
+
+def accepts(content_type, content_types):
+    if content_type is None:
+        return True
+
+    return content_type.split(';', 1)[0].strip().lower() in content_types
 
 
 class Http():
-    def __init__(self):
-        user_agent = UserAgent()
-        user_agent = user_agent.random
+    """
+    The one HTTP client every request the analyzer makes goes through, so
+    page fetches, host probes, robots.txt and sitemaps all share keep-alive
+    connection pools, timeouts, retries and a user agent.
+    """
+
+    def __init__(self, **kwargs):
+        self.listeners = ()
+        self.listeners_lock = threading.Lock()
+        self.configure(**kwargs)
+
+    def add_listener(self, listener):
+        """
+        `listener.on_response(url, response, size)` is called for every
+        response, once its body of `size` bytes has been read, whichever
+        thread made the request. Use listening() to hear only your own.
+        """
+        with self.listeners_lock:
+            self.listeners = self.listeners + (listener,)
+
+    def remove_listener(self, listener):
+        with self.listeners_lock:
+            listeners = list(self.listeners)
+            listeners.remove(listener)
+            self.listeners = tuple(listeners)
+
+    def notify(self, url, response, size):
+        # the listeners are swapped for a new tuple rather than changed, so this is safe from any thread
+        for listener in self.listeners + context_listeners.get():
+            listener.on_response(url, response, size)
+
+    def configure(self, user_agent=None, connect_timeout=5.0, read_timeout=15.0, retries=3, backoff_factor=0.3,
+                  num_pools=50, maxsize=10, max_body_size=10 * 2 ** 20):
+        """
+        (Re)build the connection pools. `num_pools` is the number of hosts
+        kept open at once and `maxsize` the connections kept per host, which
+        should be at least the number of crawl workers. Pages are only read
+        up to `max_body_size` bytes.
+        """
+        if user_agent is None:
+            # fake_useragent loads its whole data file, only pay for it when a client is built
+            from fake_useragent import UserAgent
+
+            user_agent = UserAgent().random
         # user_agent = ["Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)","Mozilla/5.0 (Linux; Android 6.0.1; Nexus 5X Build/MMB29P) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/W.X.Y.Z Mobile Safari/537.36 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)","Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/41.0.2272.118 Safari/537.36 (compatible; Google-Read-Aloud; +https://developers.google.com/search/docs/advanced/crawling/overview-google-crawlers)","Mozilla/5.0 (Linux; Android 7.0; SM-G930V Build/NRD90M) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/59.0.3071.125 Mobile Safari/537.36 (compatible; Google-Read-Aloud; +https://developers.google.com/search/docs/advanced/crawling/overview-google-crawlers)"]
-        user_agent = {"User-Agent": user_agent}
+        self.user_agent = user_agent
+        self.max_body_size = max_body_size
         self.http = PoolManager(
-            # timeout=Timeout(connect=1.0, read=2.0),
+            num_pools=num_pools,
+            maxsize=maxsize,
+            timeout=Timeout(connect=connect_timeout, read=read_timeout),
+            retries=Retry(total=retries, backoff_factor=backoff_factor,
+                          status_forcelist=(429, 502, 503, 504), raise_on_status=False),
             cert_reqs='CERT_REQUIRED',
             ca_certs=certifi.where(),
-            headers=user_agent
+            headers={'User-Agent': user_agent}
         )
+        self.http.pool_classes_by_scheme = {'http': ResolvingHTTPConnectionPool,
+                                            'https': ResolvingHTTPSConnectionPool}
+
+    def get(self, url, headers=None, redirect=True):
+        if headers:
+            # extra headers are added to the defaults, not used instead of them
+            headers = dict(self.http.headers, **headers)
+
+        response = self.http.request('GET', url, headers=headers, redirect=redirect)
+
+        self.notify(url, response, len(response.data))
+
+        return response
+
+    def open(self, url, headers=None, redirect=True):
+        """
+        Like get, but the body is left unread so it can be streamed with
+        iter_chunks
+        """
+        if headers:
+            headers = dict(self.http.headers, **headers)
+
+        return self.http.request('GET', url, headers=headers, redirect=redirect, preload_content=False)
+
+    def iter_chunks(self, url, response, chunk_size=65536):
+        """
+        Yields the body of a response from open() piece by piece and gives
+        the connection back to the pool at the end
+        """
+        size = 0
+        complete = False
+
+        try:
+            for chunk in response.stream(chunk_size):
+                size += len(chunk)
+                yield chunk
+
+            complete = True
+        finally:
+            if not complete:
+                # the rest of the body is still on the wire, the connection can't be reused
+                response.close()
+
+            response.release_conn()
+
+            self.notify(url, response, size)
+
+    def fetch(self, url, headers=None, max_size=None, content_types=HTML_CONTENT_TYPES):
+        """
+        Download a page as a Fetched. The body is streamed and hashed as it
+        arrives, reading stops after `max_size` bytes (max_body_size by
+        default), and bodies whose Content-Type is not in `content_types` are
+        not read at all.
+        """
+        if max_size is None:
+            max_size = self.max_body_size
+
+        response = self.open(url, headers)
+        page = Fetched(url, response.status, response.headers)
+
+        if not accepts(response.headers.get('content-type'), content_types):
+            page.skipped = True
+            self.discard(url, response)
+            return page
+
+        digest = hashlib.sha1()
+        chunks = []
+        size = 0
+        body = self.iter_chunks(url, response)
+
+        try:
+            for chunk in body:
+                if max_size is not None and size + len(chunk) > max_size:
+                    chunk = chunk[:max_size - size]
+                    page.truncated = True
+
+                digest.update(chunk)
+                chunks.append(chunk)
+                size += len(chunk)
+
+                if page.truncated:
+                    break
+        finally:
+            body.close()
+
+        page.data = b''.join(chunks)
+        page.sha1 = digest.hexdigest()
+
+        return page
+
+    def discard(self, url, response):
+        """
+        Give up on the body of a response from open(). Short bodies are
+        read so the connection goes back to the pool, long ones are dropped
+        with the connection.
+        """
+        length = response.headers.get('content-length', '')
+
+        if length.isdigit() and int(length) <= DRAIN_LIMIT:
+            for _ in self.iter_chunks(url, response):
+                pass
+            return
+
+        response.close()
+        response.release_conn()
+
+        self.notify(url, response, 0)
+
+    def status(self, url):
+        """
+        Returns the status code and the URL the request ended up at after
+        redirects, or (None, None) if the host could not be reached.
+        """
+        try:
+            response = self.get(url)
+        except HTTPError:
+            return None, None
+
+        final_url = url
+        if response.retries is not None:
+            for retry in response.retries.history:
+                if retry.redirect_location:
+                    final_url = urljoin(final_url, retry.redirect_location)
+
+        return response.status, final_url
+
+
+class AsyncHttp():
+    """
+    Awaitable front end to an Http client for use inside an event loop.
+    Requests run on a thread pool against the client's connection pools and
+    at most `max_concurrency` of them are in flight at once.
+    """
+
+    def __init__(self, client=None, max_concurrency=10):
+        self.client = client if client is not None else get_client()
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.semaphore = None
+
+    async def run(self, func, *args):
+        """
+        Run a blocking network call, like a DNS lookup, under the same limit
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            # run in a copy of the caller's context so listening() carries over to the thread
+            return await loop.run_in_executor(self.executor,
+                                              functools.partial(contextvars.copy_context().run, func, *args))
+
+    async def get(self, url, headers=None, redirect=True):
+        return await self.run(self.client.get, url, headers, redirect)
+
+    async def fetch(self, url, headers=None, max_size=None):
+        return await self.run(self.client.fetch, url, headers, max_size)
+
+    async def status(self, url):
+        return await self.run(self.client.status, url)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the shared Http client, building it the first time it is needed
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Http()
+
+    return _client
 
-    def get(self, url):
-        return self.http.request('GET', url)
 
+def __getattr__(name):
+    # `http` used to be built at import time, keep it working as a lazy alias
+    if name == 'http':
+        return get_client()
 
-http = Http()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
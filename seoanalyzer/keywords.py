@@ -0,0 +1,72 @@
+import heapq
+
+from array import array
+from operator import itemgetter
+
+
+def top_keywords(counters, limit=None, min_count=5):
+    """
+    Merges the word, bigram and trigram counters into one keyword list,
+    most frequent first. Entries below `min_count` are dropped before
+    anything is sorted, and with a `limit` only the top entries are selected
+    with a heap instead of sorting everything. Ties keep counter order.
+    """
+    candidates = [(word, count) for counter in counters for word, count in counter.items() if count >= min_count]
+
+    if limit is None:
+        candidates.sort(key=itemgetter(1), reverse=True)
+    else:
+        candidates = heapq.nlargest(limit, candidates, key=itemgetter(1))
+
+    return [{'word': word, 'count': count} for word, count in candidates]
+
+
+class CountMinSketch():
+    """
+    Approximate counts for a huge number of keys in fixed memory. Estimates
+    are never lower than the true count.
+    """
+
+    def __init__(self, width=2 ** 18, depth=4):
+        self.width = width
+        self.depth = depth
+        self.tables = [array('L', bytes(array('L').itemsize * width)) for _ in range(depth)]
+
+    def add(self, key, count=1):
+        """
+        Count `key` and return its new estimated total
+        """
+        estimate = None
+
+        for seed, table in enumerate(self.tables):
+            position = hash((seed, key)) % self.width
+            table[position] += count
+
+            if estimate is None or table[position] < estimate:
+                estimate = table[position]
+
+        return estimate
+
+
+class NgramPruner():
+    """
+    Keeps rare n-grams out of the site counters. New n-grams are counted in
+    a count-min sketch and only get an exact counter entry once their
+    estimated count reaches `min_count`, so counts of kept n-grams may be
+    slightly overestimated.
+    """
+
+    def __init__(self, min_count, width=2 ** 18, depth=4):
+        self.min_count = min_count
+        self.sketch = CountMinSketch(width, depth)
+
+    def update(self, counter, page_counter):
+        for gram, count in page_counter.items():
+            if gram in counter:
+                counter[gram] += count
+                continue
+
+            estimate = self.sketch.add(gram, count)
+
+            if estimate >= self.min_count:
+                counter[gram] = estimate
@@ -0,0 +1,236 @@
+import os
+
+from array import array
+from urllib.parse import urlsplit
+
+from seoanalyzer.frontier import normalize_url
+
+IMAGE_EXTENSIONS = frozenset(['.img', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.svg', '.webp', '.avif', ])
+
+SOCIAL_SITES = ['facebook', 'instagram', 'twitter', 'linkedin']
+
+# anchor texts that say nothing about the page they link to
+VAGUE_ANCHOR_TEXTS = frozenset(['click here', 'page', 'article'])
+
+NOT_LINKS = ('javascript:', 'mailto:', 'tel:')
+
+
+class PageLinks():
+    """
+    The <a href> tags of a page, sorted into the kinds the checks look at.
+    `internal` and `external` hold [text, url, follow] entries with the
+    normalized absolute url of each link, `crawl` the absolute urls of the
+    links worth following, the rest plain hrefs.
+    """
+
+    __slots__ = ('count', 'internal', 'external', 'crawl', 'nofollow', 'social', 'underscore', 'images')
+
+    def __init__(self):
+        self.count = 0
+        self.internal = []
+        self.external = []
+        self.crawl = []
+        self.nofollow = []
+        self.social = []
+        self.underscore = []
+        self.images = []
+
+
+def absolute_url(link, page_url, base_domain):
+    """
+    Resolves a link against the site's base url (a SplitResult), or the page
+    url for query-only links
+    """
+    if ':' in link:
+        return link
+
+    if link.startswith('//'):
+        return f'{base_domain.scheme}:{link}'
+
+    relative_path = link
+    domain = base_domain.netloc
+
+    if domain[-1] == '/':
+        domain = domain[:-1]
+
+    if len(relative_path) > 0 and relative_path[0] == '?':
+        if '?' in page_url:
+            return f'{page_url[:page_url.index("?")]}{relative_path}'
+
+        return f'{page_url}{relative_path}'
+
+    if len(relative_path) > 0 and relative_path[0] != '/':
+        relative_path = f'/{relative_path}'
+
+    return f'{base_domain.scheme}://{domain}{relative_path}'
+
+
+def classify_links(anchors, page_url, page_netloc, base_domain):
+    """
+    Sorts the anchors of a page into a PageLinks in a single pass, reading
+    each tag's href, text and rel only once
+    """
+    links = PageLinks()
+    page_host = urlsplit(normalize_url(page_url)).netloc or page_netloc.lower()
+
+    for a in anchors:
+        href = a.get('href')
+        stripped_href = href.strip().lower()
+        text = a.text_content().lower()
+        nofollow = 'nofollow' in a.get('rel', '').lower()
+        follow = 'nofollow' if nofollow else 'follow'
+
+        links.count += 1
+
+        if nofollow:
+            links.nofollow.append(href)
+        if '_' in href:
+            links.underscore.append(href)
+        if any(site in href for site in SOCIAL_SITES):
+            links.social.append(href)
+
+        extension = os.path.splitext(href.split('#', 1)[0].split('?', 1)[0])[1].lower()
+        image = extension in IMAGE_EXTENSIONS
+
+        if image:
+            links.images.append(href)
+
+        # internal and external links, as reported on the page
+        if stripped_href and stripped_href[0] != '#' and not stripped_href.startswith(NOT_LINKS):
+            url = normalize_url(absolute_url(href.strip(), page_url, base_domain))
+            parts = urlsplit(url)
+
+            if parts.netloc == page_host:
+                links.internal.append([text, url, follow])
+            elif parts.scheme in ('http', 'https'):
+                links.external.append([text, url, follow])
+
+        # links to follow: titled, with a telling text, on this site and not to an image
+        if not a.get('title') or text.strip() in VAGUE_ANCHOR_TEXTS or image:
+            continue
+
+        if base_domain.netloc not in href and ':' in href:
+            continue
+
+        url = absolute_url(href, page_url, base_domain)
+
+        # remove hash links to all urls
+        if '#' in url:
+            url = url[:url.rindex('#')]
+
+        links.crawl.append(url)
+
+    return links
+
+
+class LinkGraph():
+    """
+    The internal links of a site. Every url gets an integer id, and the
+    links of each crawled page are stored as one run of target ids in a
+    flat array, so a large site costs a few bytes per link rather than a
+    list of strings per page. Click depths are counted from `start_url`,
+    or else from the first page added.
+    """
+
+    def __init__(self, start_url=None):
+        self.ids = {}
+        self.urls = []
+        self.crawled = bytearray()
+        self.inlinks = array('l')
+        self.edge_start = array('l')
+        self.edge_count = array('l')
+        self.targets = array('l')
+        self.start = None if start_url is None else self.node(start_url)
+
+    def node(self, url):
+        key = normalize_url(url)
+        node = self.ids.get(key)
+
+        if node is None:
+            node = len(self.urls)
+            self.ids[key] = node
+            self.urls.append(url)
+            self.crawled.append(0)
+            self.inlinks.append(0)
+            self.edge_start.append(0)
+            self.edge_count.append(0)
+
+        return node
+
+    def add_page(self, url, links):
+        """
+        Record a crawled page and the site urls it links to
+        """
+        source = self.node(url)
+
+        if self.crawled[source]:
+            return
+
+        self.crawled[source] = 1
+        self.urls[source] = url
+
+        if self.start is None:
+            self.start = source
+
+        targets = set()
+
+        for link in links:
+            target = self.node(link)
+
+            if target != source and target not in targets:
+                targets.add(target)
+                self.targets.append(target)
+                self.inlinks[target] += 1
+
+        self.edge_start[source] = len(self.targets) - len(targets)
+        self.edge_count[source] = len(targets)
+
+    def links_from(self, node):
+        start = self.edge_start[node]
+
+        return self.targets[start:start + self.edge_count[node]]
+
+    def depths(self):
+        """
+        Clicks from the start page to each page, -1 where there is no path
+        """
+        depths = array('l', [-1]) * len(self.urls)
+
+        if self.start is None:
+            return depths
+
+        depths[self.start] = 0
+        level = [self.start]
+
+        while level:
+            next_level = []
+
+            for node in level:
+                for target in self.links_from(node):
+                    if depths[target] == -1:
+                        depths[target] = depths[node] + 1
+                        next_level.append(target)
+
+            level = next_level
+
+        return depths
+
+    def orphans(self):
+        """
+        Crawled pages no other crawled page links to, such as pages only
+        found in the sitemap
+        """
+        return [self.urls[node] for node in range(len(self.urls))
+                if self.crawled[node] and not self.inlinks[node] and node != self.start]
+
+    def talk(self):
+        depths = self.depths()
+        pages = [node for node in range(len(self.urls)) if self.crawled[node]]
+
+        return {
+            'pages': len(pages),
+            'links': len(self.targets),
+            'inlinks': {self.urls[node]: self.inlinks[node] for node in pages},
+            'depth': {self.urls[node]: depths[node] if depths[node] >= 0 else None for node in pages},
+            'orphan_pages': self.orphans(),
+        }
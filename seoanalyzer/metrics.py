@@ -0,0 +1,137 @@
+import threading
+import time
+
+from collections import Counter
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+class StageTimer():
+    """
+    Passes the time spent inside a `with` block to record(stage, seconds)
+    """
+
+    __slots__ = ('record', 'stage', 'start')
+
+    def __init__(self, record, stage):
+        self.record = record
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.record(self.stage, time.perf_counter() - self.start)
+
+
+class NullTimer():
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metrics():
+    """
+    Collects per-stage timings and counters for a crawl. Every measurement is
+    also passed to each hook as hook(kind, name, value, key), where kind is
+    'timing' or 'count' and key is the page url of a timing or the host of a
+    per-host counter, so they can be forwarded to a metrics system.
+    """
+
+    enabled = True
+
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks or [])
+        self.stages = defaultdict(lambda: {'calls': 0, 'seconds': 0.0})
+        self.counters = Counter()
+        self.hosts = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def timer(self, stage):
+        return StageTimer(self.record, stage)
+
+    def record(self, stage, seconds, url=None):
+        with self.lock:
+            totals = self.stages[stage]
+            totals['calls'] += 1
+            totals['seconds'] += seconds
+
+        for hook in self.hooks:
+            hook('timing', stage, seconds, url)
+
+    def record_page(self, url, timings):
+        """
+        Merge the stage timings a page collected while it was analyzed
+        """
+        for stage, seconds in timings.items():
+            self.record(stage, seconds, url)
+
+    def count(self, name, value=1, host=None):
+        with self.lock:
+            if host is None:
+                self.counters[name] += value
+            else:
+                self.hosts[host][name] += value
+
+        for hook in self.hooks:
+            hook('count', name, value, host)
+
+    def on_response(self, url, response, size):
+        """
+        Called by the http client for every response while the crawl runs
+        """
+        host = urlsplit(url).netloc
+        self.count('http_requests', host=host)
+        self.count('bytes_fetched', size, host=host)
+
+    def talk(self):
+        with self.lock:
+            return {
+                'stages': {stage: dict(totals) for stage, totals in self.stages.items()},
+                'counters': dict(self.counters),
+                'hosts': {host: dict(counters) for host, counters in self.hosts.items()},
+            }
+
+
+class NullMetrics():
+    """
+    Stands in for Metrics when profiling is off, every call does nothing
+    """
+
+    enabled = False
+
+    def add_hook(self, hook):
+        pass
+
+    def timer(self, stage):
+        return NULL_TIMER
+
+    def record(self, stage, seconds, url=None):
+        pass
+
+    def record_page(self, url, timings):
+        pass
+
+    def count(self, name, value=1, host=None):
+        pass
+
+    def on_response(self, url, response, size):
+        pass
+
+    def talk(self):
+        return {}
+
+
+NULL_METRICS = NullMetrics()
@@ -1,22 +1,28 @@
+import asyncio
+import codecs
 import hashlib
 import json
-import os
 import re
-import bs4
-import requests
-from bs4 import BeautifulSoup
 from collections import Counter
 import lxml.html as lh
+from lxml import etree
+from string import ascii_lowercase
+from string import ascii_uppercase
 from string import punctuation
 from urllib.parse import urlsplit
 from urllib3.exceptions import HTTPError
-import dns.resolver
-from seoanalyzer.http import http
-from seoanalyzer.stemmer import stem
-import urllib.robotparser
-import advertools as adv
-from fake_useragent import UserAgent
-from urllib.parse import urlparse
+from seoanalyzer.checks import DOM
+from seoanalyzer.checks import select_checks
+from seoanalyzer.host import HostFactsCache
+from seoanalyzer.http import get_client
+from seoanalyzer.links import absolute_url
+from seoanalyzer.links import classify_links
+from seoanalyzer.metrics import NULL_TIMER
+from seoanalyzer.metrics import StageTimer
+from seoanalyzer.similarity import simhash
+from seoanalyzer.robots import RobotsCache
+from seoanalyzer.stemmer import stem_many
+import urllib.parse
 
 # This list of English stop words is taken from the "Glasgow Information
 # Retrieval Group". The original list can be found at
@@ -85,7 +91,194 @@ ADDITIONAL_TAGS_XPATHS = {
     'alt_hreflang': '//link[@rel="alternate"]/@hreflang',
 }
 
-IMAGE_EXTENSIONS = set(['.img', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.svg', '.webp', '.avif', ])
+INVISIBLE_TAGS = frozenset(['style', 'script'])
+
+FAVICON_REL_REGEX = re.compile(r'^(shortcut icon|icon)$', re.I)
+
+# the fields of Page.talk() the host checks fill in, from the host's facts rather than the page
+HOST_FIELDS = frozenset(['dmarc_status', 'favicon', 'favicon_status', 'custom_404_status', 'xml_sitemaps',
+                         'xml_sitemaps_status', 'resolveurlarray', 'resolve_url_status'])
+
+DOCTYPE_REGEX = re.compile(r'<!doctype\s+([^>]*)>', re.I)
+
+CHARSET_REGEX = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET_REGEX = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+
+BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+def ixpath(expression, attribute, value):
+    """
+    Builds an XPath predicate that compares an attribute regardless of case,
+    e.g. ixpath('//meta[{}]', 'name', 'description')
+    """
+    lowered = f"translate(@{attribute}, '{ascii_uppercase}', '{ascii_lowercase}')"
+
+    return expression.format(f"{lowered}='{value}'")
+
+
+def ixpath_startswith(expression, attribute, value):
+    lowered = f"translate(@{attribute}, '{ascii_uppercase}', '{ascii_lowercase}')"
+
+    return expression.format(f"starts-with({lowered}, '{value}')")
+
+
+META_DESCRIPTION_XPATH = ixpath('//meta[{}]', 'name', 'description')
+META_KEYWORDS_XPATH = ixpath('//meta[{}]', 'name', 'keywords')
+JSON_LD_XPATH = ixpath('//script[{}]', 'type', 'application/ld+json')
+
+OG_TAGS_XPATHS = {
+    'og_title': ixpath('//meta[{}]/@content', 'property', 'og:title'),
+    'og_description': ixpath('//meta[{}]/@content', 'property', 'og:description'),
+    'og_image': ixpath('//meta[{}]/@content', 'property', 'og:image'),
+    'og_site_name': ixpath('//meta[{}]/@content', 'property', 'og:site_name'),
+    'og_url': ixpath('//meta[{}]/@content', 'property', 'og:url'),
+    'og_type': ixpath('//meta[{}]/@content', 'property', 'og:type'),
+}
+
+TWITTER_CARDS_XPATHS = {
+    'site': ixpath_startswith('//meta[{}]', 'name', 'twitter:site'),
+    'title': ixpath_startswith('//meta[{}]', 'name', 'twitter:title'),
+    'description': ixpath_startswith('//meta[{}]', 'name', 'twitter:description'),
+    'image': ixpath_startswith('//meta[{}]', 'name', 'twitter:image'),
+}
+
+
+def parse_html(raw_html):
+    """
+    Parses a document into a single lxml tree that every analysis pass shares
+    """
+    parser = lh.HTMLParser(remove_comments=True)
+
+    try:
+        return lh.document_fromstring(raw_html, parser=parser)
+    except ValueError:
+        # strings with an XML encoding declaration have to be parsed as bytes
+        return lh.document_fromstring(raw_html.encode('utf-8'), parser=parser)
+    except etree.ParserError:
+        return lh.document_fromstring('<html></html>', parser=parser)
+
+
+def lower(value):
+    if value is None:
+        return None
+
+    return value.lower()
+
+
+def first(elements):
+    if elements:
+        return elements[0]
+
+    return None
+
+
+def content_digest(raw_html):
+    return hashlib.sha1(raw_html.encode('utf-8')).hexdigest()
+
+
+def detect_charset(data, content_type=None):
+    """
+    The encoding of an html document: its byte order mark, else the charset
+    of the Content-Type header, else a <meta> charset, else utf-8
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+
+    if content_type:
+        match = CHARSET_REGEX.search(content_type)
+
+        if match:
+            return match.group(1)
+
+    match = META_CHARSET_REGEX.search(data, 0, 4096)
+
+    if match:
+        return match.group(1).decode('ascii')
+
+    return 'utf-8'
+
+
+def decode_html(data, content_type=None):
+    """
+    Decodes a downloaded document in one go, replacing undecodable bytes
+    """
+    encoding = detect_charset(data, content_type)
+
+    try:
+        return data.decode(encoding, 'replace')
+    except LookupError:
+        return data.decode('utf-8', 'replace')
+
+
+def analyze_html(page, raw_html):
+    """
+    Runs in a worker process: analyze already downloaded html and send back
+    only what the crawl needs
+    """
+    page.analyze(raw_html)
+
+    return PageResult.from_page(page)
+
+
+class PageResult():
+    """
+    The compact result of an analyzed page: its printable report plus the
+    links and counters that get merged into the site totals
+    """
+
+    __slots__ = ('url', 'depth', 'content_hash', 'simhash', 'links', 'wordcount', 'bigrams', 'trigrams', 'context',
+                 'timings', 'site_links', 'host_score', 'favicon_link')
+
+    def __init__(self, url, depth, content_hash, simhash, links, wordcount, bigrams, trigrams, context,
+                 timings=None, site_links=None, host_score=0, favicon_link=None):
+        self.url = url
+        self.depth = depth
+        self.content_hash = content_hash
+        self.simhash = simhash
+        self.links = links
+        self.site_links = site_links if site_links is not None else links
+        self.wordcount = wordcount
+        self.bigrams = bigrams
+        self.trigrams = trigrams
+        self.context = context
+        self.timings = timings
+        # the part of the overall score the host checks gave, and the favicon the page links to itself
+        self.host_score = host_score
+        self.favicon_link = favicon_link
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    @classmethod
+    def from_page(cls, page):
+        if isinstance(page, cls):
+            return page
+
+        return cls(page.url, page.depth, page.content_hash, page.simhash, page.links, page.wordcount, page.bigrams,
+                   page.trigrams, page.talk(), page.timings, page.site_links, page.host_score, page.favicon_link)
+
+    def release(self):
+        """
+        Drop the links and counters once they have been merged into the site
+        totals, only the report is needed after that
+        """
+        self.links = None
+        self.site_links = None
+        self.wordcount = None
+        self.bigrams = None
+        self.trigrams = None
+
+    def talk(self):
+        return self.context
 
 
 class Page():
@@ -93,7 +286,24 @@ class Page():
     Container for each page and the core analyzer.
     """
 
-    def __init__(self, url='', base_domain='', analyze_headings=False, analyze_extra_tags=False):
+    __slots__ = (
+        'base_domain', 'parsed_url', 'url', 'depth', 'url_length', 'url_status', 'url_parameter_status',
+        'analyze_headings', 'analyze_extra_tags', 'host_facts', 'robots', 'title', 'title_status', 'description',
+        'description_status', 'keywords', 'content_analysis_status', 'warnings', 'translation', 'links',
+        'total_word_count', 'wordcount', 'bigrams', 'trigrams', 'stem_to_word', 'content_hash', 'simhash', 'etag',
+        'last_modified', 'not_modified', 'image_tag_count', 'encoding', 'encoding_status', 'open_graph',
+        'og_tags_status', 'all_link', 'email_list', 'email_security_status', 'html_type', 'doctype_status',
+        'image_miss_tag', 'social_tags', 'meta_keywords', 'dmarc_status', 'html_lang', 'language_status',
+        'underscore_count', 'twitter_cards', 'twitter_cards_status', 'favicon', 'favicon_status',
+        'custom_error', 'sitemap_status', 'overall_score', 'heading_status', 'links_overall', 'schema_type',
+        'schema_status', 'resolve_url', 'resolve_url_status', 'alt_attribute_status', 'in_page_links_status',
+        'xml_sitemaps_status', 'discovered_pages_status', 'underscores_url_status', 'canonical_tags',
+        'canonical_tags_status', 'headings', 'additional_info', 'timings', 'page_links', 'checks', 'site_links',
+        'follow_links', 'host_score', 'favicon_link',
+    )
+
+    def __init__(self, url='', base_domain='', analyze_headings=False, analyze_extra_tags=False, host_facts=None,
+                 depth=0, profile=False, robots=None, checks=None, follow_links=True):
         """
         Variables go here, *not* outside of __init__
         """
@@ -101,11 +311,16 @@ class Page():
         self.base_domain = urlsplit(base_domain)
         self.parsed_url = urlsplit(url)
         self.url = url
+        self.depth = depth
         self.url_length = ''
         self.url_status= ""
         self.url_parameter_status=''
         self.analyze_headings = analyze_headings
         self.analyze_extra_tags = analyze_extra_tags
+        self.checks = select_checks(checks, analyze_headings, analyze_extra_tags)
+        self.follow_links = follow_links
+        self.host_facts = host_facts if host_facts is not None else HostFactsCache()
+        self.robots = robots if robots is not None else RobotsCache()
         self.title = ''
         self.title_status = ''
         self.description = ''
@@ -115,12 +330,18 @@ class Page():
         self.warnings = []
         self.translation = bytes.maketrans(punctuation.encode('utf-8'), str(' ' * len(punctuation)).encode('utf-8'))
         self.links = []
+        self.site_links = []
+        self.page_links = None
         self.total_word_count = 0
         self.wordcount = Counter()
         self.bigrams = Counter()
         self.trigrams = Counter()
         self.stem_to_word = {}
         self.content_hash = None
+        self.simhash = None
+        self.etag = None
+        self.last_modified = None
+        self.not_modified = False
         self.image_tag_count = ''
         self.encoding = ''
         self.encoding_status=''
@@ -142,9 +363,11 @@ class Page():
         self.twitter_cards_status = ''
         self.favicon = ''
         self.favicon_status = ''
+        self.favicon_link = None
         self.custom_error = ''
         self.sitemap_status = {}
         self.overall_score = 0
+        self.host_score = 0
         self.heading_status = ''
         self.links_overall = {}
         self.schema_type = []
@@ -159,11 +382,23 @@ class Page():
         self.canonical_tags=[]
         self.canonical_tags_status = ''
 
+        # seconds spent in each stage of fetching and analyzing, when profiling
+        self.timings = {} if profile else None
+
         if analyze_headings:
             self.headings = {}
         if analyze_extra_tags:
             self.additional_info = {}
 
+    def timer(self, stage):
+        if self.timings is None:
+            return NULL_TIMER
+
+        return StageTimer(self.add_timing, stage)
+
+    def add_timing(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
     def talk(self):
         """
         Returns a dictionary that can be printed
@@ -228,310 +463,205 @@ class Page():
             context['headings'] = self.headings
         if self.analyze_extra_tags:
             context['additional_info'] = self.additional_info
+        if self.timings is not None:
+            context['timings'] = self.timings
 
         return context
 
-    def populate(self, bs):
+    def find_favicon_link(self, dom):
+        for link in dom.iter('link'):
+            rel = link.get('rel', '').strip()
+
+            if FAVICON_REL_REGEX.match(rel) or any(FAVICON_REL_REGEX.match(r) for r in rel.split()):
+                return link
+
+        return None
 
+    def can_fetch(self):
         """
-        Populates the instance variables from BeautifulSoup
+        Make sure the url is something we should download, warn if it isn't
         """
+        valid_prefixes = []
 
-        # feeds = bs.findAll(type='application/rss+xml') + bs.findAll(type='application/atom+xml')
-        # for feed in feeds:
-        #     href=feed.get('href')
-        #     print(feed)
-        self.url_length = len(self.url)
-        url_error = f'{self.url}/nonexistent_path'
-        error_res = requests.get(url_error)
-        if error_res.status_code == 404:
-            self.custom_error = 'good'
-        else:
-            self.custom_error = "bad"
-        parsed_url = urllib.parse.urlparse(self.url)
-        parsed_url = parsed_url.netloc
-        try:
-            favicon_bs = bs.find('link', attrs={'rel': re.compile("^(shortcut icon|icon)$", re.I)})
-            self.favicon = favicon_bs['href']
-            if 'www' or 'http' or 'https' not in self.favicon:
-                self.favicon = f'{parsed_url}/{self.favicon}'
-            else:
-               pass
+        # only allow http:// https:// and //
+        for s in ['http://', 'https://', '//', ]:
+            valid_prefixes.append(self.url.startswith(s))
 
-        except:
-            favicon_url = f'{self.url}/favicon.ico'
-            b = requests.get(favicon_url)
-            if b.status_code == 200:
-                self.favicon = favicon_url
-            else:
-                self.favicon = None
-        if self.favicon != None:
-            self.overall_score = self.overall_score + 2
-            self.favicon_status = 'good'
-        else:
-            self.favicon_status = 'bad'
+        if True not in valid_prefixes:
+            self.warn(f'{self.url} does not appear to have a valid protocol.')
+            return False
 
-        try:
-            self.html_lang = bs.html['lang']
-        except:
-            self.html_lang = ''
-        if self.html_lang != '':
-            self.overall_score = self.overall_score + 2
-            self.language_status = 'good'
-        else:
-            self.language_status = 'bad'
-        temp_domain = self.base_domain.netloc
-        analyse_domain = temp_domain.replace('www.', '')
-        try:
-            test_dmarc = dns.resolver.resolve('_dmarc.' + analyse_domain, 'TXT')
-            for dns_data in test_dmarc:
-                if 'DMARC1' in str(dns_data):
-                    self.dmarc_status = 'good'
-        except:
-            self.dmarc_status = 'bad'
-        try:
-            self.title = bs.title.text
-        except AttributeError:
-            pass
-        if len(self.title) >= 40 and len(self.title) <= 40:
-            self.overall_score = self.overall_score + 6
-            self.title_status = 'good'
-        elif len(self.title) <= 40:
-            self.overall_score = self.overall_score + 4
-            self.title_status = 'improve'
-        elif len(self.title) >= 60:
-            self.title_status = 'bad'
-        try:
-            items = [item for item in bs.contents if isinstance(item, bs4.Doctype)]
-            self.html_type = items[0]
-        except:
-            self.html_type = 'default html'
+        if self.url.startswith('//'):
+            self.url = f'{self.base_domain.scheme}:{self.url}'
 
+        if self.parsed_url.netloc != self.base_domain.netloc:
+            self.warn(f'{self.url} is not part of {self.base_domain.netloc}.')
+            return False
+
+        return True
 
-        descr = bs.findAll('meta', attrs={'name': 'description'})
+    def fetch(self, headers=None):
+        """
+        Download the page and return its html, or None if it can't be analyzed
+        """
+        if not self.can_fetch():
+            return None
 
-        if len(descr) > 0:
-            self.description = descr[0].get('content')
         try:
-            if len(self.description) >= 140 and len(self.description) <= 156:
-                self.overall_score = self.overall_score + 6
-                self.description_status = 'good'
-            elif len(self.description) >= 50 and len(self.description) <= 140:
-                self.overall_score = self.overall_score + 4
-                self.description_status = 'Improve'
-            elif len(self.description) >= 156 or len(self.description) <= 50:
-                self.description_status = 'bad'
-        except:
-            pass
+            with self.timer('fetch'):
+                page = get_client().fetch(self.url, headers=headers)
+        except HTTPError as e:
+            self.warn(f'Returned {e}')
+            return None
+
+        return self.decode(page)
+
+    async def fetch_async(self, async_http, headers=None):
+        if not self.can_fetch():
+            return None
 
-        keywords = bs.find('meta', attrs={'name': 'keywords'})
         try:
-            self.meta_keywords = (keywords.get('content'))
-        except:
-            self.meta_keywords = None
-        if keywords == None:
-            pass
+            with self.timer('fetch'):
+                page = await async_http.fetch(self.url, headers=headers)
+        except HTTPError as e:
+            self.warn(f'Returned {e}')
+            return None
 
-    def analyze_heading_tags(self, bs):
+        return self.decode(page)
+
+    def decode(self, page):
         """
-        Analyze the heading tags and populate the headings
+        Turn a fetched page into html, or None if it isn't html or was not
+        modified since the last crawl
         """
-        json_schema = bs.find('script', attrs={'type': 'application/ld+json'})
-        if json_schema != None:
-            json_dat = json.loads(json_schema.contents[0])
+        self.etag = page.headers.get('etag')
+        self.last_modified = page.headers.get('last-modified')
 
-            try:
-                sch_type = json_dat['@type']
-                self.schema_type.append(sch_type)
-            except:
-                sch_type = (json_dat['@graph'][0]['@type'])
-                self.schema_type.extend(sch_type)
-        else:
-            pass
-        if self.schema_type != []:
-            self.overall_score = self.overall_score + 4
-            self.schema_status = 'good'
-        else:
-            self.schema_status = 'bad'
-        try:
-            site = bs.find('meta', attrs={'name': re.compile(r'^twitter:site')})
-            self.twitter_cards['site'] = site.get('content')
-        except:
-            self.twitter_cards['site'] = None
-        try:
-            title = bs.find('meta', attrs={'name': re.compile(r'^twitter:title')})
-            self.twitter_cards['title'] = title.get('content')
-        except:
-            self.twitter_cards['title'] = None
-        try:
-            description = bs.find('meta', attrs={'name': re.compile(r'^twitter:description')})
-            self.twitter_cards['description'] = description.get('content')
-        except:
-            self.twitter_cards['description'] = None
-        try:
-            image = bs.find('meta', attrs={'name': re.compile(r'^twitter:image')})
-            self.twitter_cards['image'] = image.get('content')
-        except:
-            self.twitter_cards['image'] = None
-        if self.twitter_cards['site'] and self.twitter_cards['title'] and self.twitter_cards['description'] != None:
-            self.overall_score = self.overall_score + 2
-            self.twitter_cards_status = 'good'
+        if page.status == 304:
+            self.not_modified = True
+            return None
+
+        content_type = page.headers.get('content-type')
+        self.encoding = content_type is not None
+
+        if page.skipped:
+            self.encoding = False
+            return None
+
+        if self.encoding == True:
+            self.encoding_status = 'good'
         else:
-            self.twitter_cards_status = 'bad'
-        try:
-            dom = lh.fromstring(str(bs))
-        except ValueError as _:
-            dom = lh.fromstring(bs.encode('utf-8'))
-        for tag, xpath in HEADING_TAGS_XPATHS.items():
-            value = [heading.text_content() for heading in dom.xpath(xpath)]
-            if value:
-                self.headings.update({tag: value})
+            self.encoding_status = 'bad'
 
-    def analyze_additional_tags(self, bs):
+        if page.truncated:
+            self.warn(f'Page is larger than {len(page.data)} bytes, only the start of it was analyzed')
+
+        self.content_hash = page.sha1
+
+        return decode_html(page.data, content_type)
+
+    async def analyze_async(self, async_http, executor=None, raw_html=None):
         """
-        Analyze additional tags and populate the additional info
+        Same as analyze, but the page and the host checks are fetched without
+        blocking the event loop and the parsing runs in `executor`
         """
-        robots_url = f'{self.url}robots.txt'
-        rp = urllib.robotparser.RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        sitemap_var = rp.site_maps()
-        if sitemap_var == None:
-            sitemap_checker = ['wp-sitemap.xml', 'sitemap_index.xml', 'sitemap.xml']
-            sitemap_true = []
-            for i in sitemap_checker:
-                sitemap1 = f'{self.url}/{i}'
-                user_agent = UserAgent()
-                user_agent = user_agent.random
-                user_agent = {"User-Agent": user_agent}
-                a = requests.get(sitemap1, headers=user_agent)
-                if a.status_code == 200:
-                    sitemap_true.append(sitemap1)
-                    break
-                else:
-                    pass
-            if [] != sitemap_true:
-                url_list1 = adv.sitemap_to_df(sitemap_true[0])
-                try:
-                    url_sitemap1 = len(url_list1['loc'].tolist())
-                except:
-                    url_sitemap1 = 0
-                self.sitemap_status['sitemap'] = sitemap_true[0]
-                self.sitemap_status['url_found'] = url_sitemap1
-                self.sitemap_status['present_in_robots'] = False
-            else:
-                self.sitemap_status['sitemap'] = None
-                self.sitemap_status['url_found'] = 0
-                self.sitemap_status['present_in_robots'] = False
-        else:
-            url_list = adv.sitemap_to_df(sitemap_var[0])
-            try:
-                url_sitemap = len(url_list['loc'].tolist())
-            except:
-                url_sitemap = 0
-            self.sitemap_status['sitemap'] = sitemap_var[0]
-            self.sitemap_status['url_found'] = url_sitemap
-            self.sitemap_status['present_in_robots'] = True
-        if self.sitemap_status['sitemap'] != None:
-            self.overall_score = self.overall_score + 6
-            self.xml_sitemaps_status = 'good'
-        else:
-            self.xml_sitemaps_status = 'bad'
-        try:
-            dom = lh.fromstring(str(bs))
-        except ValueError as _:
-            dom = lh.fromstring(bs.encode('utf-8'))
-        for tag, xpath in ADDITIONAL_TAGS_XPATHS.items():
-            value = dom.xpath(xpath)
-            self.additional_info.update({tag: value})
-        if self.additional_info['canonical'] !=[]:
-            self.overall_score = self.overall_score + 6
-            self.canonical_tags_status = 'good'
-            self.canonical_tags=self.additional_info['canonical']
-        else:
-            self.canonical_tags_status = 'bad'
+        if raw_html is None:
+            raw_html = await self.fetch_async(async_http)
+
+            if raw_html is None:
+                return
+
+        if self.checks.probes:
+            await self.host_facts.get_async(self.url, async_http, self.checks.probes)
+
+        loop = asyncio.get_running_loop()
 
+        return await loop.run_in_executor(executor, self.analyze, raw_html)
 
     def analyze(self, raw_html=None):
         """
         Analyze the page and populate the warnings list
         """
 
-        if not raw_html:
-            valid_prefixes = []
+        if raw_html is None:
+            raw_html = self.fetch()
 
-            # only allow http:// https:// and //
-            for s in ['http://', 'https://', '//', ]:
-                valid_prefixes.append(self.url.startswith(s))
-
-            if True not in valid_prefixes:
-                self.warn(f'{self.url} does not appear to have a valid protocol.')
+            if raw_html is None:
                 return
 
-            if self.url.startswith('//'):
-                self.url = f'{self.base_domain.scheme}:{self.url}'
+        if self.content_hash is None:
+            # fetched pages are hashed over their raw bytes as they download
+            self.content_hash = content_digest(raw_html)
 
-            if self.parsed_url.netloc != self.base_domain.netloc:
-                self.warn(f'{self.url} is not part of {self.base_domain.netloc}.')
-                return
+        dom = None
 
-            try:
-                page = http.get(self.url)
-            except HTTPError as e:
-                self.warn(f'Returned {e}')
-                return
+        # the crawl needs the page's links whichever checks are selected
+        if self.checks.needs(DOM) or self.follow_links:
+            with self.timer('parse'):
+                dom = parse_html(raw_html)
 
-            encoding = 'ascii'
+        if self.follow_links:
+            self.collect_links(dom)
 
-            if 'content-type' in page.headers:
-                encoding = page.headers['content-type'].split('charset=')[-1]
-                self.encoding = True
+        # lxml makes up a doctype when the document has none, so look for it in the source
+        doctype = DOCTYPE_REGEX.search(raw_html, 0, 4096)
+        if doctype:
+            self.html_type = doctype.group(1).lower()
+        else:
+            self.html_type = 'default html'
 
-            if encoding.lower() not in ('text/html', 'text/plain', 'utf-8'):
-                # there is no unicode function in Python3
-                # try:
-                #     raw_html = unicode(page.read(), encoding)
-                # except:
-                self.encoding = False
-                return
-            else:
-                raw_html = page.data.decode('utf-8')
-            if self.encoding == True:
-                self.encoding_status = 'good'
-            else:
-                self.encoding_status = 'bad'
-        self.content_hash = hashlib.sha1(raw_html.encode('utf-8')).hexdigest()
+        if self.checks.probes:
+            with self.timer('host_checks'):
+                self.host_facts.get(self.url, self.checks.probes)
 
-        # remove comments, they screw with BeautifulSoup
-        clean_html = re.sub(r'<!--.*?-->', r'', raw_html, flags=re.DOTALL)
+        self.run_checks(dom)
 
-        soup_lower = BeautifulSoup(clean_html.lower(), 'html.parser')  # .encode('utf-8')
-        soup_unmodified = BeautifulSoup(clean_html, 'html.parser')  # .encode('utf-8')
+        return True
 
-        texts = soup_lower.findAll(text=True)
-        visible_text = [w for w in filter(self.visible_tags, texts)]
+    def run_checks(self, dom):
+        """
+        Run the selected checks in order, timing each run of checks that
+        share a stage together
+        """
+        checks = self.checks.checks
+        start = 0
 
-        self.process_text(visible_text)
+        while start < len(checks):
+            stage = checks[start].stage
+            end = start
 
-        self.populate(soup_lower)
+            while end < len(checks) and checks[end].stage == stage:
+                end += 1
 
-        self.analyze_title()
-        self.analyze_description()
-        self.analyze_og(soup_lower)
-        self.analyze_a_tags(soup_unmodified)
-        self.analyze_img_tags(soup_lower)
-        self.analyze_h1_tags(soup_lower)
+            with self.timer(stage):
+                for check in checks[start:end]:
+                    score = self.overall_score
+                    getattr(self, check.method)(dom)
 
-        if self.analyze_headings:
-            self.analyze_heading_tags(soup_unmodified)
-        if self.analyze_extra_tags:
-            self.analyze_additional_tags(soup_unmodified)
+                    if check.host:
+                        self.host_score += self.overall_score - score
 
-        return True
+            start = end
+
+        # only the checks need the sorted links, don't carry them around
+        self.page_links = None
+
+    def run_host_checks(self, favicon_link=None):
+        """
+        Runs only the checks that report on the host, against its current
+        facts, for a page whose own analysis comes from the crawl cache
+        """
+        self.favicon_link = favicon_link
+
+        with self.timer('host_checks'):
+            for check in self.checks.checks:
+                if check.host:
+                    getattr(self, check.method)(None)
+
+        self.host_score = self.overall_score
 
     def word_list_freq_dist(self, wordlist):
-        freq = [wordlist.count(w) for w in wordlist]
-        return dict(zip(wordlist, freq))
+        return Counter(wordlist)
 
     def sort_freq_dist(self, freqdist, limit=1):
         aux = [(freqdist[key], self.stem_to_word[key]) for key in freqdist if freqdist[key] >= limit]
@@ -549,32 +679,25 @@ class Page():
         return zip(*[D[i:] for i in range(n)])
 
     def process_text(self, vt):
-        page_text = ''
-
-        for element in vt:
-            if element.strip():
-                page_text += element.strip().lower() + u' '
+        page_text = ' '.join([element.strip() for element in vt if element.strip()])
 
-        tokens = self.tokenize(page_text)
+        # tokenize once, stop words are filtered out of the same token list
         raw_tokens = self.raw_tokenize(page_text)
+        tokens = [word for word in raw_tokens if word not in ENGLISH_STOP_WORDS]
         self.total_word_count = len(raw_tokens)
 
-        bigrams = self.getngrams(raw_tokens, 2)
+        self.bigrams.update(map(' '.join, self.getngrams(raw_tokens, 2)))
+        self.trigrams.update(map(' '.join, self.getngrams(raw_tokens, 3)))
 
-        for ng in bigrams:
-            vt = ' '.join(ng)
-            self.bigrams[vt] += 1
-
-        trigrams = self.getngrams(raw_tokens, 3)
-
-        for ng in trigrams:
-            vt = ' '.join(ng)
-            self.trigrams[vt] += 1
+        # fingerprint the text by its word shingles for near-duplicate detection
+        self.simhash = simhash(self.trigrams or Counter(raw_tokens))
 
         freq_dist = self.word_list_freq_dist(tokens)
 
-        for word in freq_dist:
-            root = stem(word)
+        with self.timer('stemming'):
+            roots = stem_many(freq_dist)
+
+        for word, root in zip(freq_dist, roots):
             cnt = freq_dist[word]
 
             if root not in self.stem_to_word:
@@ -590,88 +713,89 @@ class Page():
             else:
                 self.keywords[root] = cnt
 
-    def analyze_og(self, bs):
+    def visible_text(self, dom):
         """
-        Validate open graph tags
+        Returns every text node that is not inside a script or style tag
         """
+        texts = []
+
+        for element in dom.iter():
+            if element.text and element.tag not in INVISIBLE_TAGS and isinstance(element.tag, str):
+                texts.append(element.text)
+
+            parent = element.getparent()
+            if element.tail and parent is not None and parent.tag not in INVISIBLE_TAGS:
+                texts.append(element.tail)
+
+        return texts
+
+    def check_keywords(self, dom):
+        self.process_text(self.visible_text(dom))
+
+    def check_url_length(self, dom):
+        self.url_length = len(self.url)
+
+    def check_custom_404(self, dom):
+        self.custom_error = self.host_facts.host(self.url).custom_error
+
+    def check_favicon(self, dom):
+        if dom is not None:
+            self.favicon_link = self.page_favicon(dom)
 
+        self.favicon = self.favicon_link
+        if self.favicon is None:
+            self.favicon = self.host_facts.host(self.url).favicon
+        if self.favicon != None:
+            self.overall_score = self.overall_score + 2
+            self.favicon_status = 'good'
+        else:
+            self.favicon_status = 'bad'
+
+    def page_favicon(self, dom):
+        """
+        The favicon the page links to, None if it doesn't link one
+        """
         parsed_url = urllib.parse.urlparse(self.url)
         parsed_url = parsed_url.netloc
+        try:
+            favicon_link = self.find_favicon_link(dom)
+            favicon = favicon_link.attrib['href'].lower()
+            if 'www' or 'http' or 'https' not in favicon:
+                favicon = f'{parsed_url}/{favicon}'
+            else:
+               pass
 
-        internal_links = []
-        for a in bs.find_all('a', href=True):
-            if len(a['href'].strip()) > 1 and a['href'][0] != '#' and 'javascript:' \
-                    not in a['href'].strip() and 'mailto:' not in a['href'].strip() and 'tel:' not in a['href'].strip():
-                if parsed_url in a["href"] or a["href"].startswith("/") or a['href'].endswith('.html'):
-                    if urlparse(self.url).netloc.lower() not in a['href']:
-                        a["href"] = f'{urlparse(self.url).netloc.lower()}/{a["href"]}'
-
-
-                        internal_links.append(
-                            [a.get_text(), a["href"].replace('//','/'), "nofollow"] if "nofollow" in str(a) else [a.get_text(), a["href"],
-                                                                                               "follow"])
-                    else:
-                        internal_links.append(
-                            [a.get_text(), a["href"], "nofollow"] if "nofollow" in str(a) else [a.get_text(), a["href"],
-                                                                                                "follow"])
-        #
-        if len(internal_links) <= 200:
-            self.overall_score = self.overall_score + 4
-            self.in_page_links_status = 'good'
-        else:
-            self.in_page_links_status = 'bad'
+        except:
+            return None
 
-        external_links = []
-        for a in bs.find_all('a', href=True):
-            if parsed_url not in a["href"] and not a["href"].startswith("/") and not a["href"].startswith("./") and not \
-            a["href"].startswith("#") and not a['href'].endswith('.html'):
-                if 'http' in a['href'].strip() or 'https' in a['href'].strip():
-                    external_links.append(
-                        [a.get_text(), a["href"], "nofollow"] if "nofollow" in str(a) else [a.get_text(), a["href"],
-                                                                                            "follow"])
-        self.links_overall['Internal_link'] = internal_links
-        self.links_overall['External_link'] = external_links
-        og_title = bs.find('meta', attrs={'property': 'og:title'})
-        og_description = bs.find('meta', attrs={'property': 'og:description'})
-        og_image = bs.find('meta', attrs={'property': 'og:image'})
-        og_site_name = bs.find('meta', attrs={'property': 'og:site_name'})
-        og_url = bs.find('meta', attrs={'property': 'og:url'})
-        og_type = bs.find('meta', attrs={'property': 'og:type'})
-        if (og_title) == None:
-            self.open_graph['og_title'] = None
-        else:
-            self.open_graph['og_title'] = (og_title.get('content'))
-        if (og_description) == None:
-            self.open_graph['og_description'] = None
-        else:
-            self.open_graph['og_description'] = og_description.get('content')
-        if (og_image) == None:
-            self.open_graph['og_image'] = None
-        else:
-            self.open_graph['og_image'] = og_image.get('content')
-        if (og_site_name) == None:
-            self.open_graph['og_site_name'] = None
-        else:
-            self.open_graph['og_site_name'] = og_site_name.get('content')
-        if (og_url) == None:
-            self.open_graph['og_url'] = None
-        else:
-            self.open_graph['og_url'] = og_url.get('content')
-        if (og_type) == None:
-            self.open_graph['og_type'] = None
-        else:
-            self.open_graph['og_type'] = og_type.get('content')
-        if self.open_graph['og_site_name'] and self.open_graph['og_title'] and self.open_graph[
-            'og_description'] != None:
+        return favicon
+
+    def check_language(self, dom):
+        self.html_lang = dom.get('lang', '').lower()
+        if self.html_lang != '':
             self.overall_score = self.overall_score + 2
-            self.og_tags_status = 'good'
+            self.language_status = 'good'
         else:
-            self.og_tags_status = 'bad'
+            self.language_status = 'bad'
+
+    def check_dmarc(self, dom):
+        self.dmarc_status = self.host_facts.host(self.url).dmarc_status
 
-    def analyze_title(self):
+    def check_title(self, dom):
         """
         Validate the title
         """
+        title = dom.find('.//title')
+        if title is not None:
+            self.title = title.text_content().lower()
+        if len(self.title) >= 40 and len(self.title) <= 40:
+            self.overall_score = self.overall_score + 6
+            self.title_status = 'good'
+        elif len(self.title) <= 40:
+            self.overall_score = self.overall_score + 4
+            self.title_status = 'improve'
+        elif len(self.title) >= 60:
+            self.title_status = 'bad'
 
         # getting lazy, create a local variable so save having to
         # type self.x a billion times
@@ -680,33 +804,6 @@ class Page():
         # calculate the length of the title once
         length = len(t)
 
-        domain = urlparse(self.url).netloc
-        try:
-            domain_parsed = domain.replace('www.', '')
-        except:
-            domain_parsed = domain
-        url1 = f"https://www.{domain_parsed}"
-        url2 = f'http://www.{domain_parsed}'
-        url3 = f'https://{domain_parsed}'
-        url4 = f'http://{domain_parsed}'
-        list_url = [url1, url2, url3, url4]
-        urls_list = []
-        status_code_list = []
-        not_reslved = []
-        for i in list_url:
-            req = requests.get(i)
-            not_reslved.append(i)
-            status_code_list.append(req.status_code)
-            urls_list.append(req.url)
-        self.resolve_url['url'] = not_reslved
-        self.resolve_url['status_code'] = status_code_list
-        self.resolve_url['redirected_url'] = urls_list
-        if 403 not in status_code_list:
-            self.overall_score = self.overall_score + 6
-            self.resolve_url_status = 'good'
-        else:
-            self.resolve_url_status = 'bad'
-
         if length == 0:
             self.warn(u'Missing title tag')
             return
@@ -715,10 +812,25 @@ class Page():
         elif length > 70:
             self.warn(u'Title tag is too long (more than 70 characters): {0}'.format(t))
 
-    def analyze_description(self):
+    def check_description(self, dom):
         """
         Validate the description
         """
+        descr = first(dom.xpath(META_DESCRIPTION_XPATH))
+
+        if descr is not None:
+            self.description = lower(descr.get('content'))
+        try:
+            if len(self.description) >= 140 and len(self.description) <= 156:
+                self.overall_score = self.overall_score + 6
+                self.description_status = 'good'
+            elif len(self.description) >= 50 and len(self.description) <= 140:
+                self.overall_score = self.overall_score + 4
+                self.description_status = 'Improve'
+            elif len(self.description) >= 156 or len(self.description) <= 50:
+                self.description_status = 'bad'
+        except:
+            pass
 
         # getting lazy, create a local variable so save having to
         # type self.x a billion times
@@ -735,136 +847,184 @@ class Page():
         elif length > 255:
             self.warn(u'Description is too long (more than 255 characters): {0}'.format(d))
 
-    def visible_tags(self, element):
-        if element.parent.name in ['style', 'script', '[document]']:
-            return False
+    def check_meta_keywords(self, dom):
+        keywords = first(dom.xpath(META_KEYWORDS_XPATH))
+        try:
+            self.meta_keywords = lower(keywords.get('content'))
+        except:
+            self.meta_keywords = None
 
-        return True
+    def check_resolve_url(self, dom):
+        host_facts = self.host_facts.host(self.url)
+        self.resolve_url = host_facts.resolve_url
+        if host_facts.resolve_url_status == 'good':
+            self.overall_score = self.overall_score + 6
+            self.resolve_url_status = 'good'
+        else:
+            self.resolve_url_status = 'bad'
+
+    def check_in_page_links(self, dom):
+        page_links = self.classify_links(dom)
+        internal_links = page_links.internal
+        external_links = page_links.external
 
-    def analyze_img_tags(self, bs):
+        if len(internal_links) <= 200:
+            self.overall_score = self.overall_score + 4
+            self.in_page_links_status = 'good'
+        else:
+            self.in_page_links_status = 'bad'
+
+        self.links_overall['Internal_link'] = internal_links
+        self.links_overall['External_link'] = external_links
+
+    def check_open_graph(self, dom):
+        """
+        Validate open graph tags
+        """
+        for og_tag, xpath in OG_TAGS_XPATHS.items():
+            self.open_graph[og_tag] = lower(first(dom.xpath(xpath)))
+        if self.open_graph['og_site_name'] and self.open_graph['og_title'] and self.open_graph[
+            'og_description'] != None:
+            self.overall_score = self.overall_score + 2
+            self.og_tags_status = 'good'
+        else:
+            self.og_tags_status = 'bad'
+
+    def collect_links(self, dom):
+        """
+        Add any new links (that we didn't find in the sitemap) for the crawl
+        to follow, and every link to the site for the link graph
+        """
+        page_links = self.classify_links(dom)
+
+        self.links.extend(page_links.crawl)
+        self.site_links.extend(url for _, url, _ in page_links.internal)
+
+    def check_links(self, dom):
+        page_links = self.classify_links(dom)
+
+        self.underscore_count.extend(page_links.underscore)
+
+        if self.underscore_count == []:
+            self.overall_score = self.overall_score + 2
+            self.underscores_url_status = 'good'
+        else:
+            self.underscores_url_status = 'bad'
+        self.all_link = page_links.count
+        self.social_tags.extend(page_links.social)
+
+    def check_images(self, dom):
         """
         Verifies that each img has an alt and title
         """
 
-        images = bs.find_all('img')
-        try:
-            images_len = len(images)
-            self.image_tag_count = images_len
-        except:
-            self.image_tag_count = 0
+        images = dom.findall('.//img')
+        self.image_tag_count = len(images)
         for image in images:
-            src = ''
-            if 'src' in image:
-                src = image['src']
-            elif 'data-src' in image:
-                src = image['data-src']
-            else:
-                src = image
-
             if len(image.get('alt', '')) == 0:
-                try:
-                    self.image_miss_tag.append(src.get('src'))
-                except:
-                    self.image_miss_tag.append(src.get('data-src'))
+                self.image_miss_tag.append(lower(image.get('src')))
         if self.image_miss_tag == []:
             self.overall_score = self.overall_score + 4
             self.alt_attribute_status = 'good'
         else:
             self.alt_attribute_status = 'bad'
 
-    def analyze_h1_tags(self, bs):
-        """
-        Make sure each page has at least one H1 tag
-        """
+    def check_emails(self, dom):
         try:
             email_tags = re.compile(r'([a-zA-Z0-9._-]+@[a-zA-Z0-9._-]+\.[a-zA-Z0-9_-]+){0,}')
-            self.email_list.extend(set([x for x in bs.strings if email_tags.search(x).group()]))
+            self.email_list.extend(set([x.lower() for x in dom.itertext() if email_tags.search(x.lower()).group()]))
         except:
           pass
-        htags = bs.find_all('h1')
+
+    def check_h1(self, dom):
+        """
+        Make sure each page has at least one H1 tag
+        """
+        htags = dom.findall('.//h1')
 
         if len(htags) == 0:
             self.warn('Each page should have at least one h1 tag')
         h1_tag_val = []
         for i in htags:
-            h1_tag_val.append(i.text)
+            h1_tag_val.append(i.text_content())
         if len(htags) != 0 and len(h1_tag_val) == 1:
             self.overall_score = self.overall_score + 4
             self.heading_status = 'good'
         else:
             self.heading_status = 'bad'
 
-    def analyze_a_tags(self, bs):
-        """
-        Add any new links (that we didn't find in the sitemap)
-        """
-        anchors = bs.find_all('a', href=True)
-        url_list = []
-        url_title = []
-        for tag in anchors:
-            tag_href = tag['href']
-            tag_text = tag.text.lower().strip()
-            url_title.append(tag_text)
-            url_list.append(tag_href)
-
-            if len(tag.get('title', '')) == 0:
-                continue
-
-            if tag_text in ['click here', 'page', 'article']:
-                continue
-
-            if self.base_domain.netloc not in tag_href and ':' in tag_href:
-                continue
-
-            modified_url = self.rel_to_abs_url(tag_href)
-
-            url_filename, url_file_extension = os.path.splitext(modified_url)
-
-            # ignore links to images
-            if url_file_extension in IMAGE_EXTENSIONS:
-                continue
+    def check_schema(self, dom):
+        json_schema = first(dom.xpath(JSON_LD_XPATH))
+        if json_schema != None:
+            json_dat = json.loads(json_schema.text)
 
-            # remove hash links to all urls
-            if '#' in modified_url:
-                modified_url = modified_url[:modified_url.rindex('#')]
+            try:
+                sch_type = json_dat['@type']
+                self.schema_type.append(sch_type)
+            except:
+                sch_type = (json_dat['@graph'][0]['@type'])
+                self.schema_type.extend(sch_type)
+        else:
+            pass
+        if self.schema_type != []:
+            self.overall_score = self.overall_score + 4
+            self.schema_status = 'good'
+        else:
+            self.schema_status = 'bad'
 
-            self.links.append(modified_url)
-        for i in url_list:
-            if "_" in i:
-                self.underscore_count.append(i)
-            else:
-                pass
-        if self.underscore_count == []:
+    def check_twitter_cards(self, dom):
+        for card, xpath in TWITTER_CARDS_XPATHS.items():
+            meta = first(dom.xpath(xpath))
+            self.twitter_cards[card] = meta.get('content') if meta is not None else None
+        if self.twitter_cards['site'] and self.twitter_cards['title'] and self.twitter_cards['description'] != None:
             self.overall_score = self.overall_score + 2
-            self.underscores_url_status = 'good'
+            self.twitter_cards_status = 'good'
         else:
-            self.underscores_url_status = 'bad'
-        self.all_link = len(url_list)
-
-        subs = ['facebook', 'instagram', 'twitter', 'linkedin']
-        social_tag = [s for s in url_list if any(i in s for i in subs)]
-        self.social_tags.extend(social_tag)
-
-    def rel_to_abs_url(self, link):
-        if ':' in link:
-            return link
+            self.twitter_cards_status = 'bad'
 
-        relative_path = link
-        domain = self.base_domain.netloc
+    def check_headings(self, dom):
+        """
+        Analyze the heading tags and populate the headings
+        """
+        for tag, xpath in HEADING_TAGS_XPATHS.items():
+            value = [heading.text_content() for heading in dom.xpath(xpath)]
+            if value:
+                self.headings.update({tag: value})
 
-        if domain[-1] == '/':
-            domain = domain[:-1]
+    def check_sitemap(self, dom):
+        self.sitemap_status = dict(self.robots.sitemap_status(self.url))
+        if self.sitemap_status['sitemap'] != None:
+            self.overall_score = self.overall_score + 6
+            self.xml_sitemaps_status = 'good'
+        else:
+            self.xml_sitemaps_status = 'bad'
 
-        if len(relative_path) > 0 and relative_path[0] == '?':
-            if '?' in self.url:
-                return f'{self.url[:self.url.index("?")]}{relative_path}'
+    def check_additional_tags(self, dom):
+        """
+        Analyze additional tags and populate the additional info
+        """
+        for tag, xpath in ADDITIONAL_TAGS_XPATHS.items():
+            value = dom.xpath(xpath)
+            self.additional_info.update({tag: value})
+        if self.additional_info['canonical'] !=[]:
+            self.overall_score = self.overall_score + 6
+            self.canonical_tags_status = 'good'
+            self.canonical_tags=self.additional_info['canonical']
+        else:
+            self.canonical_tags_status = 'bad'
 
-            return f'{self.url}{relative_path}'
+    def classify_links(self, dom):
+        """
+        The page's links, sorted once and shared by the link checks
+        """
+        if self.page_links is None:
+            self.page_links = classify_links(dom.iterfind('.//a[@href]'), self.url, urlsplit(self.url).netloc,
+                                             self.base_domain)
 
-        if len(relative_path) > 0 and relative_path[0] != '/':
-            relative_path = f'/{relative_path}'
+        return self.page_links
 
-        return f'{self.base_domain.scheme}://{domain}{relative_path}'
+    def rel_to_abs_url(self, link):
+        return absolute_url(link, self.url, self.base_domain)
 
     def warn(self, warning):
         self.warnings.append(warning)
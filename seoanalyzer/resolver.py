@@ -0,0 +1,181 @@
+import asyncio
+import socket
+import threading
+import time
+
+from concurrent.futures import Future
+
+ADDRESS_FAMILIES = {'A': socket.AF_INET, 'AAAA': socket.AF_INET6}
+
+
+class SystemBackend():
+    """
+    Looks names up the way the rest of the system does: A and AAAA records
+    through getaddrinfo, so /etc/hosts is honoured, everything else through
+    dnspython. Returns (records, ttl), with a ttl of None when the answer
+    doesn't carry one.
+    """
+
+    def query(self, name, rdtype):
+        if rdtype in ADDRESS_FAMILIES:
+            try:
+                infos = socket.getaddrinfo(name, None, ADDRESS_FAMILIES[rdtype], socket.SOCK_STREAM)
+            except socket.gaierror:
+                return [], None
+
+            return list(dict.fromkeys(info[4][0] for info in infos)), None
+
+        import dns.resolver
+
+        try:
+            answer = dns.resolver.resolve(name, rdtype)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return [], None
+
+        return [str(record) for record in answer], answer.rrset.ttl
+
+
+class StubBackend():
+    """
+    Answers from a dict of {name: {rdtype: [records]}} instead of the
+    network, and remembers every query it was asked, for tests
+    """
+
+    def __init__(self, records=None, ttl=300):
+        self.records = records or {}
+        self.ttl = ttl
+        self.queries = []
+
+    def query(self, name, rdtype):
+        self.queries.append((name, rdtype))
+
+        records = list(self.records.get(name, {}).get(rdtype, []))
+
+        return records, self.ttl if records else None
+
+
+class Resolver():
+    """
+    Caches DNS answers per (name, record type) for their TTL, bounded by
+    `max_ttl`. Names that don't exist are remembered for `negative_ttl`.
+    Threads asking for a name that is already being looked up wait for that
+    lookup instead of starting their own.
+    """
+
+    def __init__(self, backend=None, **kwargs):
+        self.lock = threading.Lock()
+        self.configure(backend, **kwargs)
+
+    def configure(self, backend=None, default_ttl=300, negative_ttl=60, max_ttl=3600, max_entries=10000):
+        """
+        Swap the backend or the ttls, the cache is emptied
+        """
+        with self.lock:
+            self.backend = backend if backend is not None else SystemBackend()
+            self.default_ttl = default_ttl
+            self.negative_ttl = negative_ttl
+            self.max_ttl = max_ttl
+            self.max_entries = max_entries
+            self.cache = {}
+            self.pending = {}
+            self.hits = 0
+            self.misses = 0
+
+    def cached(self, key):
+        entry = self.cache.get(key)
+
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        return None
+
+    def resolve(self, name, rdtype='A'):
+        """
+        Returns the records of a name as strings, an empty list if there are
+        none. Lookup failures other than a missing name are raised and not
+        cached.
+        """
+        key = (name.lower().rstrip('.'), rdtype.upper())
+
+        with self.lock:
+            records = self.cached(key)
+
+            if records is not None:
+                return records
+
+            future = self.pending.get(key)
+            owner = future is None
+
+            if owner:
+                self.misses += 1
+                future = self.pending[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            records, ttl = self.backend.query(*key)
+        except Exception as e:
+            with self.lock:
+                del self.pending[key]
+            future.set_exception(e)
+            raise
+
+        if ttl is None:
+            ttl = self.default_ttl if records else self.negative_ttl
+
+        with self.lock:
+            if len(self.cache) >= self.max_entries:
+                # drop the oldest entry, dicts keep insertion order
+                del self.cache[next(iter(self.cache))]
+
+            self.cache[key] = (time.monotonic() + min(ttl, self.max_ttl), records)
+            del self.pending[key]
+
+        future.set_result(records)
+
+        return records
+
+    async def resolve_async(self, name, rdtype='A', executor=None):
+        """
+        Same as resolve, but a lookup that isn't cached runs in `executor`
+        so the event loop keeps going
+        """
+        with self.lock:
+            records = self.cached((name.lower().rstrip('.'), rdtype.upper()))
+
+        if records is not None:
+            return records
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(executor, self.resolve, name, rdtype)
+
+    def addresses(self, host):
+        """
+        The IPv4 addresses of a host, or its IPv6 ones if it has none
+        """
+        return self.resolve(host, 'A') or self.resolve(host, 'AAAA')
+
+    def info(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.cache)}
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """
+    Returns the shared Resolver, building it the first time it is needed
+    """
+    global _resolver
+
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = Resolver()
+
+    return _resolver
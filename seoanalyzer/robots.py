@@ -0,0 +1,221 @@
+import asyncio
+import threading
+import time
+import urllib.robotparser
+
+from urllib.parse import urlsplit
+from urllib3.exceptions import HTTPError
+
+from seoanalyzer.http import get_client
+from seoanalyzer.sitemap import count_sitemap_urls
+
+# where sitemaps are looked for when robots.txt doesn't name one
+SITEMAP_CANDIDATES = ['wp-sitemap.xml', 'sitemap_index.xml', 'sitemap.xml']
+
+
+class HostRobots():
+    """
+    The robots.txt of one host and the sitemap it points to, fetched once
+    and kept until `ttl` seconds have passed
+    """
+
+    def __init__(self, scheme, netloc, ttl=3600):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.ttl = ttl
+        self.parser = urllib.robotparser.RobotFileParser(self.url('robots.txt'))
+        self.fetched_at = None
+        self.sitemap = None
+        self.lock = threading.Lock()
+        self.sitemap_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['lock'] = None
+        state['sitemap_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.sitemap_lock = threading.Lock()
+
+    def url(self, path):
+        return f'{self.scheme}://{self.netloc}/{path}'
+
+    def expired(self):
+        return self.fetched_at is None or (self.ttl is not None and time.time() - self.fetched_at > self.ttl)
+
+    def load(self):
+        """
+        (Re)fetch robots.txt if it was never fetched or is older than the ttl
+        """
+        with self.lock:
+            if not self.expired():
+                return
+
+            self.parser = urllib.robotparser.RobotFileParser(self.url('robots.txt'))
+            self.sitemap = None
+
+            try:
+                response = get_client().get(self.url('robots.txt'))
+            except HTTPError:
+                response = None
+
+            # the same rules as RobotFileParser.read
+            if response is None or response.status >= 500:
+                self.parser.allow_all = True
+            elif response.status in (401, 403):
+                self.parser.disallow_all = True
+            elif response.status >= 400:
+                self.parser.allow_all = True
+            else:
+                self.parser.parse(response.data.decode('utf-8', 'ignore').splitlines())
+
+            self.fetched_at = time.time()
+
+    def can_fetch(self, url, user_agent='*'):
+        return self.parser.can_fetch(user_agent, url)
+
+    def crawl_delay(self, user_agent='*'):
+        """
+        Seconds to wait between requests, from Crawl-delay or Request-rate
+        """
+        delay = self.parser.crawl_delay(user_agent)
+
+        if delay is not None:
+            return float(delay)
+
+        rate = self.parser.request_rate(user_agent)
+
+        if rate is not None and rate.requests:
+            return rate.seconds / rate.requests
+
+        return 0.0
+
+    def sitemap_status(self):
+        """
+        The sitemap named in robots.txt, or else the first of the usual
+        locations that exists, and the number of urls in it
+        """
+        with self.sitemap_lock:
+            if self.sitemap is None:
+                self.sitemap = self.find_sitemap()
+
+            return self.sitemap
+
+    def find_sitemap(self):
+        site_maps = self.parser.site_maps()
+
+        if site_maps:
+            return {'sitemap': site_maps[0], 'url_found': count_sitemap_urls(site_maps[0]), 'present_in_robots': True}
+
+        for candidate in SITEMAP_CANDIDATES:
+            sitemap = self.url(candidate)
+            status_code, _ = get_client().status(sitemap)
+
+            if status_code == 200:
+                return {'sitemap': sitemap, 'url_found': count_sitemap_urls(sitemap), 'present_in_robots': False}
+
+        return {'sitemap': None, 'url_found': 0, 'present_in_robots': False}
+
+
+class RobotsCache():
+    """
+    One HostRobots per host, shared by every page of a crawl
+    """
+
+    def __init__(self, ttl=3600, user_agent='*'):
+        self.ttl = ttl
+        self.user_agent = user_agent
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def host(self, url):
+        parsed_url = urlsplit(url)
+
+        with self.lock:
+            robots = self.hosts.get(parsed_url.netloc)
+
+            if robots is None:
+                robots = HostRobots(parsed_url.scheme or 'http', parsed_url.netloc, self.ttl)
+                self.hosts[parsed_url.netloc] = robots
+
+        robots.load()
+
+        return robots
+
+    def only(self, url):
+        """
+        A cache holding just the url's host, if it was loaded, small enough
+        to send along with a page to a worker process
+        """
+        cache = RobotsCache(self.ttl, self.user_agent)
+        netloc = urlsplit(url).netloc
+
+        with self.lock:
+            if netloc in self.hosts:
+                cache.hosts[netloc] = self.hosts[netloc]
+
+        return cache
+
+    def can_fetch(self, url):
+        return self.host(url).can_fetch(url, self.user_agent)
+
+    def crawl_delay(self, url):
+        return self.host(url).crawl_delay(self.user_agent)
+
+    def sitemap_status(self, url):
+        return self.host(url).sitemap_status()
+
+
+class RateLimiter():
+    """
+    Spaces requests to the same host at least `delay(url)` seconds apart,
+    however many workers are crawling
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, url):
+        """
+        Book the next free slot for the url's host and return how long to
+        wait for it
+        """
+        delay = self.delay(url)
+
+        if not delay:
+            return 0.0
+
+        netloc = urlsplit(url).netloc
+
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(netloc, now))
+            self.next_slot[netloc] = slot + delay
+
+        return slot - now
+
+    def wait(self, url):
+        wait = self.reserve(url)
+
+        if wait > 0:
+            time.sleep(wait)
+
+    async def wait_async(self, url):
+        wait = self.reserve(url)
+
+        if wait > 0:
+            await asyncio.sleep(wait)
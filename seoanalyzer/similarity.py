@@ -0,0 +1,263 @@
+import hashlib
+
+from collections import Counter
+from collections import defaultdict
+
+SIMHASH_BITS = 64
+
+
+def feature_digest(feature):
+    # a stable hash, python's own hash() differs between worker processes
+    return hashlib.blake2b(feature.encode('utf-8'), digest_size=SIMHASH_BITS // 8).digest()
+
+
+def simhash(features):
+    """
+    Returns the 64 bit SimHash of a Counter of text features, such as a
+    page's word shingles. Similar texts get fingerprints that differ in only
+    a few bits.
+    """
+    if not features:
+        return None
+
+    # count how often each byte value appears at each byte position, then
+    # spread those counts over the bits, 8 steps per feature instead of 64
+    byte_counts = [Counter() for _ in range(SIMHASH_BITS // 8)]
+    total = 0
+
+    for feature, count in features.items():
+        digest = feature_digest(feature)
+        total += count
+
+        for position, value in enumerate(digest):
+            byte_counts[position][value] += count
+
+    weights = [-total] * SIMHASH_BITS
+
+    for position, counts in enumerate(byte_counts):
+        for value, count in counts.items():
+            for bit in range(8):
+                if value >> bit & 1:
+                    weights[position * 8 + bit] += 2 * count
+
+    fingerprint = 0
+
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class UnionFind():
+    def __init__(self):
+        self.parents = []
+
+    def add(self):
+        self.parents.append(len(self.parents))
+
+        return len(self.parents) - 1
+
+    def find(self, item):
+        root = item
+
+        while self.parents[root] != root:
+            root = self.parents[root]
+
+        while self.parents[item] != root:
+            self.parents[item], item = root, self.parents[item]
+
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+
+        if a != b:
+            self.parents[max(a, b)] = min(a, b)
+
+
+def split_bits(bits, bands):
+    """
+    Splits the set bits of the mask `bits` into `bands` masks of neighbouring
+    bits, as even in size as can be
+    """
+    positions = [position for position in range(SIMHASH_BITS) if bits >> position & 1]
+    masks = []
+
+    for band in range(bands):
+        mask = 0
+
+        for position in positions[band * len(positions) // bands:(band + 1) * len(positions) // bands]:
+            mask |= 1 << position
+
+        if mask:
+            masks.append(mask)
+
+    return masks
+
+
+class Bucket():
+    """
+    The fingerprints that share a band value, filed by the group they belong
+    to. A page is only compared with the groups it hasn't joined yet, until
+    it is close to one of their members. A bucket holding more than
+    `max_groups` groups hands them to a BandTable over the bits its band
+    leaves out, so it never has to compare a page with every group in it.
+    """
+
+    __slots__ = ('bits', 'groups', 'table')
+
+    def __init__(self, bits):
+        self.bits = bits
+        # group root: [items]
+        self.groups = {}
+        self.table = None
+
+    def refresh(self, index):
+        """
+        File the members of groups that were merged into another since under
+        the new root
+        """
+        for key in list(self.groups):
+            root = index.clusters.find(key)
+
+            if root != key:
+                members = self.groups.pop(key)
+                merged = self.groups.get(root)
+
+                if merged is not None:
+                    # copy the smaller list into the larger one
+                    if len(merged) < len(members):
+                        merged, members = members, merged
+                    merged.extend(members)
+                    members = merged
+
+                self.groups[root] = members
+
+    def match(self, index, item, fingerprint):
+        if self.table is not None:
+            self.table.match(index, item, fingerprint)
+            return
+
+        self.refresh(index)
+        own = index.clusters.find(item)
+
+        for root, members in self.groups.items():
+            if root == own:
+                continue
+
+            for other in members:
+                if hamming_distance(fingerprint, index.fingerprints[other]) <= index.max_distance:
+                    index.clusters.union(item, other)
+                    own = index.clusters.find(item)
+                    break
+
+    def add(self, index, item, fingerprint, root):
+        if self.table is not None:
+            self.table.add(index, item, fingerprint, root)
+            return
+
+        self.groups.setdefault(root, []).append(item)
+
+        if len(self.groups) > index.max_groups:
+            self.refresh(index)
+
+        # a finer table needs at least one bit per band
+        if len(self.groups) > index.max_groups and bin(self.bits).count('1') >= index.bands:
+            self.table = BandTable(index, self.bits)
+
+            for root, members in self.groups.items():
+                for member in members:
+                    self.table.add(index, member, index.fingerprints[member], root)
+
+            self.groups = None
+
+
+class BandTable():
+    """
+    Files fingerprints under their value in each band of the mask `bits`.
+    Two fingerprints that differ in at most max_distance of those bits agree
+    on at least one of the max_distance + 1 bands, so they meet in a bucket.
+    """
+
+    __slots__ = ('bands', 'buckets')
+
+    def __init__(self, index, bits):
+        # (band mask, the remaining bits) for each band
+        self.bands = [(mask, bits & ~mask) for mask in split_bits(bits, index.bands)]
+        # (band, value): Bucket
+        self.buckets = {}
+
+    def match(self, index, item, fingerprint):
+        """
+        Join the item to the groups it is close to
+        """
+        for band, (mask, _) in enumerate(self.bands):
+            bucket = self.buckets.get((band, fingerprint & mask))
+
+            if bucket is not None:
+                bucket.match(index, item, fingerprint)
+
+    def add(self, index, item, fingerprint, root):
+        for band, (mask, rest) in enumerate(self.bands):
+            key = (band, fingerprint & mask)
+            bucket = self.buckets.get(key)
+
+            if bucket is None:
+                bucket = self.buckets[key] = Bucket(rest)
+
+            bucket.add(index, item, fingerprint, root)
+
+
+class NearDuplicateIndex():
+    """
+    Groups pages whose SimHash fingerprints are at least `threshold` similar
+    (the share of equal bits). Fingerprints are split into bands, and only
+    pages that share a band value are compared, so the work grows with the
+    number of pages rather than with the number of pairs. With the default
+    max_distance + 1 bands every pair within the threshold shares a band.
+
+    Pages already in a group are not compared with it again, so a templated
+    site whose pages are all alike stays cheap. A bucket shared by more than
+    `max_groups` groups is split again on the bits its band leaves out, in
+    the same way, so every pair within the threshold is still compared.
+    """
+
+    def __init__(self, threshold=0.95, bands=None, max_groups=32):
+        if not 0 < threshold <= 1:
+            raise ValueError(f'Similarity threshold must be between 0 and 1, not {threshold}')
+
+        self.threshold = threshold
+        self.max_distance = int(round((1 - threshold) * SIMHASH_BITS, 6))
+        self.bands = min(bands or self.max_distance + 1, SIMHASH_BITS)
+        self.max_groups = max_groups
+        self.table = BandTable(self, (1 << SIMHASH_BITS) - 1)
+        self.urls = []
+        self.fingerprints = []
+        self.clusters = UnionFind()
+
+    def add(self, url, fingerprint):
+        if fingerprint is None:
+            return
+
+        item = self.clusters.add()
+        self.urls.append(url)
+        self.fingerprints.append(fingerprint)
+
+        self.table.match(self, item, fingerprint)
+        self.table.add(self, item, fingerprint, self.clusters.find(item))
+
+    def groups(self):
+        """
+        Returns the urls of every group of two or more near-duplicate pages
+        """
+        groups = defaultdict(list)
+
+        for item, url in enumerate(self.urls):
+            groups[self.clusters.find(item)].append(url)
+
+        return [urls for urls in groups.values() if len(urls) > 1]
@@ -0,0 +1,145 @@
+import zlib
+
+from urllib3.exceptions import HTTPError
+
+from seoanalyzer.http import get_client
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# how many levels of <sitemapindex> are followed
+MAX_INDEX_DEPTH = 2
+
+
+def decompressed(chunks):
+    """
+    Passes chunks through, gunzipping them on the fly if the body turns out
+    to be gzip compressed (.xml.gz sitemaps usually aren't sent with a
+    Content-Encoding, so the http client leaves them alone)
+    """
+    decompressor = None
+
+    for chunk in chunks:
+        if decompressor is None:
+            if not chunk:
+                continue
+
+            if not chunk.startswith(GZIP_MAGIC):
+                yield chunk
+                yield from chunks
+                return
+
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        yield decompressor.decompress(chunk)
+
+    if decompressor is not None:
+        yield decompressor.flush()
+
+
+def iter_text_sitemap(chunks):
+    """
+    Yields the urls of a plain text sitemap, one per line
+    """
+    rest = b''
+
+    for chunk in chunks:
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+
+        for line in lines:
+            yield line.decode('utf-8', 'ignore').strip()
+
+    yield rest.decode('utf-8', 'ignore').strip()
+
+
+def iter_xml_sitemap(chunks, sitemaps):
+    """
+    Yields the <url> locations of an XML sitemap as they are parsed, and adds
+    the locations of a <sitemapindex> to `sitemaps`. Elements are thrown away
+    once read, so memory use doesn't grow with the size of the file.
+    """
+    from lxml import etree
+
+    parser = etree.XMLPullParser(events=('end',), tag=('{*}url', '{*}sitemap', 'url', 'sitemap'),
+                                 resolve_entities=False, recover=True)
+
+    def read_events():
+        for _, element in parser.read_events():
+            loc = element.findtext('{*}loc')
+
+            if loc is None:
+                loc = element.findtext('loc')
+
+            if loc and loc.strip():
+                if etree.QName(element).localname == 'sitemap':
+                    sitemaps.append(loc.strip())
+                else:
+                    yield loc.strip()
+
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from read_events()
+
+        parser.close()
+        yield from read_events()
+    except etree.XMLSyntaxError:
+        return
+
+
+def iter_sitemap_urls(url, depth=0, seen=None):
+    """
+    Yields the page urls listed in a sitemap as it is downloaded. Handles
+    XML, plain text and gzipped sitemaps, and follows <sitemapindex> files
+    into the sitemaps they list.
+    """
+    if seen is None:
+        seen = set()
+
+    if url in seen:
+        return
+
+    seen.add(url)
+    client = get_client()
+
+    try:
+        response = client.open(url)
+    except HTTPError:
+        return
+
+    if response.status != 200:
+        for _ in client.iter_chunks(url, response):
+            pass
+        return
+
+    body = client.iter_chunks(url, response)
+    chunks = decompressed(body)
+    sitemaps = []
+
+    try:
+        if url.lower().split('?', 1)[0].endswith(('.txt', '.txt.gz')):
+            yield from (line for line in iter_text_sitemap(chunks) if line)
+        else:
+            yield from iter_xml_sitemap(chunks, sitemaps)
+    except (HTTPError, zlib.error):
+        return
+    finally:
+        body.close()
+
+    if depth > MAX_INDEX_DEPTH:
+        return
+
+    for sitemap in sitemaps:
+        yield from iter_sitemap_urls(sitemap, depth + 1, seen)
+
+
+def count_sitemap_urls(url):
+    """
+    Counts the <loc> entries of a sitemap, following <sitemapindex> files
+    into the sitemaps they list
+    """
+    return sum(1 for _ in iter_sitemap_urls(url))
@@ -11,6 +11,11 @@ seriously weird Python linked from the official page.
 
 import re
 
+from functools import lru_cache
+
+# Number of distinct words whose stems are remembered process-wide
+DEFAULT_CACHE_SIZE = 65536
+
 # Suffix replacement lists
 
 _step2list = {
@@ -77,11 +82,11 @@ _step5 = re.compile("^(.+?)e$")
 
 # Stemming function
 
-def stem(w):
+def porter_stem(w):
     """Uses the Porter stemming algorithm to remove suffixes from English
-    words.
+    words. This is the uncached version, most callers want `stem`.
     
-    >>> stem("fundamentally")
+    >>> porter_stem("fundamentally")
     "fundament"
     """
     
@@ -173,3 +178,50 @@ def stem(w):
         w = "y" + w[1:]
 
     return w
+
+
+_cached_stem = lru_cache(maxsize=DEFAULT_CACHE_SIZE)(porter_stem)
+
+
+def stem(w):
+    """Same as `porter_stem`, but results are kept in a bounded LRU cache
+    shared by the whole process, since a site's vocabulary repeats heavily
+    from page to page.
+
+    >>> stem("fundamentally")
+    "fundament"
+    """
+
+    return _cached_stem(w)
+
+
+def stem_many(words):
+    """Stems every word in `words` and returns the stems in the same order.
+
+    >>> stem_many(["fundamentally", "crawling"])
+    ["fundament", "crawl"]
+    """
+
+    cached_stem = _cached_stem
+
+    return [cached_stem(w) for w in words]
+
+
+def set_cache_size(maxsize):
+    """Replaces the stem cache with an empty one holding up to `maxsize`
+    words. `None` means unbounded and `0` disables caching.
+    """
+
+    global _cached_stem
+    _cached_stem = lru_cache(maxsize=maxsize)(porter_stem)
+
+
+def cache_info():
+    """Returns the hits, misses, maxsize and currsize of the stem cache.
+    """
+
+    return _cached_stem.cache_info()
+
+
+def cache_clear():
+    _cached_stem.cache_clear()
@@ -0,0 +1,312 @@
+import json
+import sqlite3
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+from seoanalyzer.frontier import normalize_url
+from seoanalyzer.links import absolute_url
+
+# the status fields of Page.talk() that get a column and an index of their own
+STATUS_FIELDS = [
+    'title_status', 'description_status', 'alt_attribute_status', 'encoding_status', 'schema_org_status',
+    'og_tags_status', 'twitter_card_status', 'in_page_links_status', 'language_status', 'dmarc_status',
+    'underscores_url_status', 'favicon_status', 'custom_404_status', 'xml_sitemaps_status', 'resolve_url_status',
+    'headings_status', 'canonical_tags_status',
+]
+
+PAGE_FIELDS = ['url', 'title', 'description', 'overall_score'] + STATUS_FIELDS
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS crawls (
+        id INTEGER PRIMARY KEY,
+        site TEXT NOT NULL,
+        url TEXT NOT NULL,
+        started_at REAL NOT NULL,
+        finished_at REAL,
+        pages INTEGER NOT NULL DEFAULT 0,
+        summary TEXT
+    )''',
+    f'''CREATE TABLE IF NOT EXISTS pages (
+        id INTEGER PRIMARY KEY,
+        crawl_id INTEGER NOT NULL REFERENCES crawls (id),
+        site TEXT NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT,
+        description TEXT,
+        overall_score INTEGER,
+        {", ".join(f"{field} TEXT" for field in STATUS_FIELDS)},
+        report TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS keywords (
+        crawl_id INTEGER NOT NULL REFERENCES crawls (id),
+        word TEXT NOT NULL,
+        count INTEGER NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS links (
+        crawl_id INTEGER NOT NULL REFERENCES crawls (id),
+        source TEXT NOT NULL,
+        target TEXT NOT NULL,
+        text TEXT,
+        kind TEXT NOT NULL,
+        follow TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS duplicates (
+        crawl_id INTEGER NOT NULL REFERENCES crawls (id),
+        cluster INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        url TEXT NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS crawls_site ON crawls (site, started_at)',
+    'CREATE INDEX IF NOT EXISTS pages_crawl ON pages (crawl_id)',
+    'CREATE INDEX IF NOT EXISTS pages_site ON pages (site)',
+    'CREATE INDEX IF NOT EXISTS pages_url ON pages (url)',
+    'CREATE INDEX IF NOT EXISTS keywords_crawl ON keywords (crawl_id)',
+    'CREATE INDEX IF NOT EXISTS links_crawl ON links (crawl_id)',
+    'CREATE INDEX IF NOT EXISTS links_target ON links (target)',
+    'CREATE INDEX IF NOT EXISTS duplicates_crawl ON duplicates (crawl_id)',
+] + [f'CREATE INDEX IF NOT EXISTS pages_{field} ON pages ({field}, crawl_id)' for field in STATUS_FIELDS]
+
+
+class ResultStore():
+    """
+    Keeps crawl results in a SQLite database: one row per crawl, its pages
+    with their status fields as indexed columns and the full report as JSON,
+    and the crawl's keywords, links and duplicate clusters. Pages are
+    written in transactions of `batch_size` while the crawl runs. One store
+    can be shared by the threads of analyze_many.
+    """
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+
+        with self.lock, self.connection:
+            # readers don't block the crawl writing and the other way round
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start_crawl(self, url, started_at=None):
+        """
+        Adds a crawl of the site at `url` and returns its id
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute('INSERT INTO crawls (site, url, started_at) VALUES (?, ?, ?)',
+                                             (urlsplit(url).netloc, url, started_at or time.time()))
+
+        return cursor.lastrowid
+
+    def add_pages(self, crawl_id, pages):
+        """
+        Writes the Page.talk() records of a crawl in one transaction
+        """
+        if not pages:
+            return
+
+        with self.lock:
+            site = self.connection.execute('SELECT site FROM crawls WHERE id = ?', (crawl_id,)).fetchone()[0]
+            page_rows = []
+            link_rows = []
+
+            for page in pages:
+                page_rows.append([crawl_id, site] + [page.get(field) for field in PAGE_FIELDS] + [json.dumps(page)])
+
+                source = normalize_url(page['url'])
+                base_domain = urlsplit(source)
+
+                for kind, key in (('internal', 'Internal_link'), ('external', 'External_link')):
+                    for text, target, follow in (page.get('over_all') or {}).get(key, []):
+                        # stored the way the crawl compares urls, so they can be looked up by url
+                        target = normalize_url(absolute_url(target, source, base_domain))
+                        link_rows.append((crawl_id, source, target, text, kind, follow))
+
+            with self.connection:
+                self.connection.executemany(
+                    f'INSERT INTO pages (crawl_id, site, {", ".join(PAGE_FIELDS)}, report) '
+                    f'VALUES ({", ".join("?" * (len(PAGE_FIELDS) + 3))})', page_rows)
+                self.connection.executemany('INSERT INTO links VALUES (?, ?, ?, ?, ?, ?)', link_rows)
+                self.connection.execute('UPDATE crawls SET pages = pages + ? WHERE id = ?', (len(page_rows), crawl_id))
+
+    def finish_crawl(self, crawl_id, summary):
+        """
+        Writes the keywords, duplicate clusters and summary of a crawl
+        """
+        clusters = [('exact', urls) for urls in summary.get('duplicate_pages', [])] + \
+                   [('near', urls) for urls in summary.get('near_duplicate_pages', [])]
+
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT INTO keywords VALUES (?, ?, ?)',
+                                        [(crawl_id, keyword['word'], keyword['count'])
+                                         for keyword in summary.get('keywords', [])])
+            self.connection.executemany('INSERT INTO duplicates VALUES (?, ?, ?, ?)',
+                                        [(crawl_id, cluster, kind, url)
+                                         for cluster, (kind, urls) in enumerate(clusters) for url in urls])
+            self.connection.execute('UPDATE crawls SET finished_at = ?, summary = ? WHERE id = ?',
+                                    (time.time(), json.dumps(summary), crawl_id))
+
+    def record(self, url, records):
+        """
+        Passes the records of iter_analyze through while writing them to the
+        store. Whatever was crawled is kept if the crawl stops half way.
+        """
+        crawl_id = self.start_crawl(url)
+        pages = []
+
+        try:
+            for record in records:
+                if record['type'] == 'page':
+                    pages.append(record['data'])
+
+                    if len(pages) >= self.batch_size:
+                        self.add_pages(crawl_id, pages)
+                        pages = []
+                else:
+                    self.add_pages(crawl_id, pages)
+                    pages = []
+                    self.finish_crawl(crawl_id, record['data'])
+
+                yield record
+        finally:
+            if pages:
+                self.add_pages(crawl_id, pages)
+
+    def save(self, url, output, started_at=None):
+        """
+        Writes a finished analyze output, returns the crawl id
+        """
+        crawl_id = self.start_crawl(url, started_at)
+
+        for start in range(0, len(output['pages']), self.batch_size):
+            self.add_pages(crawl_id, output['pages'][start:start + self.batch_size])
+
+        self.finish_crawl(crawl_id, {key: value for key, value in output.items() if key != 'pages'})
+
+        return crawl_id
+
+    def select(self, query, filters, order, limit=None):
+        conditions = [condition for condition, _ in filters]
+        params = [param for _, param in filters]
+
+        if conditions:
+            query = f'{query} WHERE {" AND ".join(conditions)}'
+
+        query = f'{query} ORDER BY {order}'
+
+        if limit is not None:
+            query = f'{query} LIMIT ?'
+            params.append(limit)
+
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(query, params)]
+
+    def crawls(self, site=None, since=None, limit=None):
+        """
+        The crawls in the store, newest first, optionally of one site or
+        started after the unix time `since`
+        """
+        filters = []
+
+        if site is not None:
+            filters.append(('site = ?', site))
+        if since is not None:
+            filters.append(('started_at >= ?', since))
+
+        rows = self.select('SELECT * FROM crawls', filters, 'started_at DESC, id DESC', limit)
+
+        for row in rows:
+            row['summary'] = json.loads(row['summary']) if row['summary'] else None
+
+        return rows
+
+    def latest_crawl(self, site):
+        """
+        The id of the newest crawl of a site, None if it was never crawled
+        """
+        crawls = self.crawls(site, limit=1)
+
+        return crawls[0]['id'] if crawls else None
+
+    def pages(self, site=None, crawl_id=None, url=None, since=None, limit=None, **statuses):
+        """
+        Stored pages, with their report decoded. Keyword arguments filter on
+        the status fields, so pages(alt_attribute_status='bad',
+        since=time.time() - 7 * 86400) finds the pages missing alt text in
+        the last week's crawls.
+        """
+        unknown = [field for field in statuses if field not in STATUS_FIELDS]
+
+        if unknown:
+            raise ValueError(f'Unknown status fields: {", ".join(unknown)}')
+
+        filters = []
+
+        if site is not None:
+            filters.append(('pages.site = ?', site))
+        if crawl_id is not None:
+            filters.append(('pages.crawl_id = ?', crawl_id))
+        if url is not None:
+            filters.append(('pages.url = ?', url))
+        if since is not None:
+            filters.append(('crawls.started_at >= ?', since))
+
+        filters.extend((f'pages.{field} = ?', value) for field, value in statuses.items())
+
+        rows = self.select('SELECT pages.*, crawls.started_at FROM pages JOIN crawls ON crawls.id = pages.crawl_id',
+                           filters, 'pages.id', limit)
+
+        for row in rows:
+            row['report'] = json.loads(row['report'])
+
+        return rows
+
+    def keywords(self, crawl_id, limit=None):
+        return self.select('SELECT word, count FROM keywords', [('crawl_id = ?', crawl_id)], 'count DESC, word',
+                           limit)
+
+    def links(self, crawl_id=None, source=None, target=None, kind=None, limit=None):
+        """
+        Stored links, filtered by crawl, the page they are on, the url they
+        point to or their kind, internal or external. Urls are matched in
+        their normalized form, so http://Example.com:80/a#top finds links
+        to http://example.com/a.
+        """
+        filters = []
+
+        if crawl_id is not None:
+            filters.append(('crawl_id = ?', crawl_id))
+        if source is not None:
+            filters.append(('source = ?', normalize_url(source)))
+        if target is not None:
+            filters.append(('target = ?', normalize_url(target)))
+        if kind is not None:
+            filters.append(('kind = ?', kind))
+
+        return self.select('SELECT * FROM links', filters, 'rowid', limit)
+
+    def duplicates(self, crawl_id):
+        """
+        The duplicate page clusters of a crawl as {'kind': ..., 'urls': [...]}
+        """
+        clusters = {}
+
+        for row in self.select('SELECT * FROM duplicates', [('crawl_id = ?', crawl_id)], 'cluster, rowid'):
+            clusters.setdefault(row['cluster'], {'kind': row['kind'], 'urls': []})['urls'].append(row['url'])
+
+        return list(clusters.values())
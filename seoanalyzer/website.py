@@ -1,93 +1,424 @@
+import asyncio
+import threading
+
 from collections import Counter
 from collections import defaultdict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from urllib.parse import urlsplit
-from xml.dom import minidom
-
-import socket
 
-from seoanalyzer.http import http
+from seoanalyzer.cache import CrawlCache
+from seoanalyzer.checks import select_checks
+from seoanalyzer.frontier import Frontier
+from seoanalyzer.host import HostFactsCache
+from seoanalyzer.http import listening
+from seoanalyzer.keywords import NgramPruner
+from seoanalyzer.links import LinkGraph
+from seoanalyzer.metrics import Metrics
+from seoanalyzer.metrics import NULL_METRICS
 from seoanalyzer.page import Page
+from seoanalyzer.page import PageResult
+from seoanalyzer.page import analyze_html
+from seoanalyzer.resolver import get_resolver
+from seoanalyzer.robots import RateLimiter
+from seoanalyzer.robots import RobotsCache
+from seoanalyzer.similarity import NearDuplicateIndex
+from seoanalyzer.sitemap import iter_sitemap_urls
 
 class Website():
-    def __init__(self, base_url, sitemap, analyze_headings, analyze_extra_tags, follow_links):
+    def __init__(self, base_url, sitemap, analyze_headings, analyze_extra_tags, follow_links, workers=1,
+                 processes=None, max_pages=None, max_depth=None, frontier_order='bfs', priority=None,
+                 bloom_capacity=None, cache_dir=None, keyword_limit=None, keyword_min_count=5, prune_ngrams=False,
+                 near_duplicate_threshold=0.95, profile=False, metrics_hooks=None, respect_robots=False,
+                 crawl_delay=None, robots_ttl=3600, host_facts=None, robots=None, executor=None,
+                 parse_pool=None, checks='full', stopping=None):
         self.base_url = base_url
         self.sitemap = sitemap
         self.analyze_headings = analyze_headings
         self.analyze_extra_tags = analyze_extra_tags
+        self.checks = select_checks(checks, analyze_headings, analyze_extra_tags)
         self.follow_links = follow_links
+        self.workers = max(1, workers)
+        self.processes = processes
+        # keep every parse process busy, each page in flight holds a thread waiting on its worker
+        self.window = max(self.workers, processes or 1)
         self.crawled_pages = []
         self.crawled_urls = set([])
-        self.page_queue = []
+        self.base_netloc = urlsplit(base_url).netloc
+        self.robots = robots if robots is not None else RobotsCache(ttl=robots_ttl)
+        self.respect_robots = respect_robots
+        self.crawl_delay = crawl_delay
+        self.rate_limiter = RateLimiter(self.request_delay) if respect_robots or crawl_delay else None
+        self.frontier = Frontier(max_pages=max_pages, max_depth=max_depth, order=frontier_order,
+                                 priority=priority, bloom_capacity=bloom_capacity,
+                                 allow=self.robots.can_fetch if respect_robots else None)
         self.wordcount = Counter()
         self.bigrams = Counter()
         self.trigrams = Counter()
         self.content_hashes = defaultdict(set)
+        self.near_duplicates = NearDuplicateIndex(near_duplicate_threshold)
+        self.link_graph = LinkGraph(base_url)
+        self.host_facts = host_facts if host_facts is not None else HostFactsCache()
+        # thread and process pools owned by the caller, e.g. shared between the sites of analyze_many
+        self.executor = executor
+        self.parse_pool = parse_pool
+        # a page analyzed with other options reports differently, so it can't be reused
+        self.cache = CrawlCache(cache_dir, [analyze_headings, analyze_extra_tags, list(self.checks.names)]) \
+            if cache_dir else None
+        self.keyword_limit = keyword_limit
+        self.keyword_min_count = keyword_min_count
+        self.ngram_pruner = NgramPruner(keyword_min_count) if prune_ngrams else None
+        self.metrics = Metrics(metrics_hooks) if profile or metrics_hooks else NULL_METRICS
+        # set to stop the crawl early, analyze_many shares one between its sites
+        self.stopping = stopping if stopping is not None else threading.Event()
 
     def check_dns(self, url_to_check):
         try:
             o = urlsplit(url_to_check)
-            socket.gethostbyname(o.hostname)
-            return True
+            return bool(get_resolver().addresses(o.hostname))
         except:
             pass
 
         return False
 
-    def get_text_from_xml(self, nodelist):
+    def request_delay(self, url):
+        """
+        Seconds to leave between requests to the url's host: the crawl_delay
+        option or the host's robots.txt Crawl-delay, whichever is longer
+        """
+        delay = self.crawl_delay or 0.0
+
+        if self.respect_robots:
+            delay = max(delay, self.robots.crawl_delay(url))
+
+        return delay
+
+    def same_site(self, url):
+        try:
+            return urlsplit(url).netloc == self.base_netloc
+        except ValueError:
+            return False
+
+    def sitemap_urls(self):
+        """
+        The urls of this site listed in the seed sitemap, read as the sitemap
+        downloads
+        """
+        return (url for url in iter_sitemap_urls(self.sitemap) if self.same_site(url))
+
+    def queue_sitemap(self, urls=None):
         """
-        Stolen from the minidom documentation
+        Crawl the sitemap urls first. They are pulled from the sitemap only
+        as the crawl needs them, so a huge sitemap is never held in memory.
         """
-        rc = []
+        self.frontier.add_source(self.sitemap_urls() if urls is None else urls)
+
+    def queue_url(self, url, depth=0):
+        """
+        Add a url to the frontier, unless it belongs to another site
+        """
+        if self.same_site(url):
+            self.frontier.push(url, depth)
+
+    def stop(self):
+        """
+        Stop the crawl: no new pages are started and the pages in flight are
+        dropped
+        """
+        self.stopping.set()
+
+    def take_pages(self, count):
+        """
+        Returns up to `count` new pages from the frontier, none once the
+        crawl is stopped
+        """
+        pages = []
+
+        while len(pages) < count and not self.stopping.is_set():
+            item = self.frontier.pop()
+
+            if item is None:
+                break
 
-        for node in nodelist:
-            if node.nodeType == node.TEXT_NODE:
-                rc.append(node.data)
+            url, depth = item
+            pages.append(self.new_page(url, depth))
 
-        return ''.join(rc)
+        return pages
 
     def crawl(self):
-        if self.sitemap:
-            page = http.get(self.sitemap)
-            if self.sitemap.endswith('xml'):
-                xmldoc = minidom.parseString(page.data.decode('utf-8'))
-                sitemap_urls = xmldoc.getElementsByTagName('loc')
-                for url in sitemap_urls:
-                    self.page_queue.append(self.get_text_from_xml(url.childNodes))
-            elif self.sitemap.endswith('txt'):
-                sitemap_urls = page.data.decode('utf-8').split('\n')
-                for url in sitemap_urls:
-                    self.page_queue.append(url)
+        for page in self.iter_crawl():
+            self.crawled_pages.append(page)
 
-        self.page_queue.append(self.base_url)
+    def iter_crawl(self):
+        """
+        Crawl the site, yielding each page as soon as it has been analyzed and
+        merged into the site totals. Pages are not kept in crawled_pages.
+        """
+        try:
+            if self.sitemap:
+                self.queue_sitemap()
 
-        for url in self.page_queue:
-            if url in self.crawled_urls:
-                continue
+            self.counted(self.queue_url, self.base_url)
 
-            page = Page(url=url, base_domain=self.base_url,
-                        analyze_headings=self.analyze_headings,
-                        analyze_extra_tags=self.analyze_extra_tags)
+            if self.parse_pool is not None:
+                yield from self.iter_crawl_concurrent(lambda page: self.analyze_page(page, self.parse_pool))
+                return
 
-            if page.parsed_url.netloc != page.base_domain.netloc:
-                continue
+            if self.processes:
+                with ProcessPoolExecutor(max_workers=self.processes) as parse_pool:
+                    yield from self.iter_crawl_concurrent(lambda page: self.analyze_page(page, parse_pool))
+                return
 
-            page.analyze()
+            if self.workers > 1 or self.executor is not None:
+                yield from self.iter_crawl_concurrent()
+                return
 
-            self.content_hashes[page.content_hash].add(page.url)
+            while True:
+                with self.counting():
+                    pages = self.take_pages(1)
 
-            for w in page.wordcount:
-                self.wordcount[w] += page.wordcount[w]
+                    if not pages:
+                        break
 
-            for b in page.bigrams:
-                self.bigrams[b] += page.bigrams[b]
+                    result = self.add_page(self.analyze_page(pages[0]))
 
-            for t in page.trigrams:
-                self.trigrams[t] += page.trigrams[t]
+                yield result
 
-            self.page_queue.extend(page.links)
+                if not self.follow_links:
+                    break
+        finally:
+            self.frontier.close()
 
-            self.crawled_pages.append(page)
-            self.crawled_urls.add(page.url)
+    def iter_crawl_concurrent(self, analyze_page=None):
+        """
+        Fetch and analyze up to `workers` pages at a time, or one per parse
+        process if there are more of those. Pages are handed out in queue
+        order and merged back in that same order, so the crawl visits and
+        reports exactly what the serial loop would.
+        """
+        if analyze_page is None:
+            analyze_page = self.analyze_page
 
-            if not self.follow_links:
-                break
+        if self.executor is not None:
+            yield from self.iter_window(self.executor, analyze_page)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.window) as executor:
+            yield from self.iter_window(executor, analyze_page)
+
+    def iter_window(self, executor, analyze_page):
+        window = self.window if self.follow_links else 1
+        pending = deque()
+
+        try:
+            while not self.stopping.is_set():
+                for page in self.counted(self.take_pages, window - len(pending)):
+                    pending.append(executor.submit(self.counted, analyze_page, page))
+
+                if not pending:
+                    break
+
+                yield self.counted(self.add_page, pending.popleft().result())
+
+                if not self.follow_links:
+                    break
+        finally:
+            # a shared executor outlives the crawl, don't leave work queued on it
+            for future in pending:
+                future.cancel()
+
+    async def crawl_async(self, async_http, executor=None):
+        """
+        The asyncio version of crawl, with the same ordering
+        """
+        pending = deque()
+
+        # the page tasks and AsyncHttp threads started in here inherit the listener
+        with self.counting():
+            try:
+                if self.sitemap:
+                    # reading the sitemap blocks, so it is read up front on a worker thread
+                    self.queue_sitemap(await async_http.run(list, self.sitemap_urls()))
+
+                self.queue_url(self.base_url)
+
+                if self.respect_robots:
+                    # fetch robots.txt off the event loop before the frontier needs it
+                    await async_http.run(self.robots.host, self.base_url)
+
+                window = self.workers if self.follow_links else 1
+
+                while not self.stopping.is_set():
+                    for page in self.take_pages(window - len(pending)):
+                        pending.append(asyncio.ensure_future(self.analyze_page_async(page, async_http, executor)))
+
+                    if not pending:
+                        break
+
+                    self.crawled_pages.append(self.add_page(await pending.popleft()))
+
+                    if not self.follow_links:
+                        break
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    def counting(self):
+        """
+        Counts the responses to requests made inside the block in this
+        crawl's metrics, but not those of other crawls running at the same
+        time
+        """
+        return listening(self.metrics) if self.metrics.enabled else nullcontext()
+
+    def counted(self, func, *args):
+        with self.counting():
+            return func(*args)
+
+    def cached_record(self, page):
+        """
+        Returns what the cache knows about a page and the headers for a
+        conditional request
+        """
+        if self.cache is None:
+            return None, None
+
+        record = self.cache.get(page.url)
+
+        return record, self.cache.conditional_headers(record)
+
+    def unchanged(self, page, record, raw_html):
+        """
+        Whether the cached analysis of a page can be reused: the server says
+        it was not modified or it is byte for byte the same as last time
+        """
+        if self.cache is None:
+            return False
+
+        if record is not None and (page.not_modified or
+                                   (raw_html is not None and page.content_hash == record['content_hash'])):
+            self.cache.hits += 1
+            self.metrics.count('cache_hits')
+            return True
+
+        self.cache.misses += 1
+        self.metrics.count('cache_misses')
+
+        return False
+
+    def save_page(self, page, result):
+        if self.cache and result.content_hash is not None:
+            self.cache.put(page.url, result, page.etag, page.last_modified)
+
+        return result
+
+    def analyze_page(self, page, parse_pool=None):
+        """
+        Download and analyze a page. With a parse pool the host checks run
+        here and the CPU heavy analysis is handed to a worker process.
+        """
+        record, headers = self.cached_record(page)
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(page.url)
+        if self.stopping.is_set():
+            return page
+
+        raw_html = page.fetch(headers)
+
+        if self.unchanged(page, record, raw_html):
+            # the page is the same, but its host checks report what the host looks like now
+            if page.checks.probes:
+                page.host_facts.get(page.url, page.checks.probes)
+            return self.cache.result(record, page)
+
+        if raw_html is None:
+            return page
+
+        if parse_pool is None:
+            page.analyze(raw_html)
+            return self.save_page(page, page)
+
+        if page.checks.probes:
+            page.host_facts.get(page.url, page.checks.probes)
+        if 'sitemap' in page.checks:
+            page.robots.sitemap_status(page.url)
+
+        # send the worker this page's host only, not every host the crawl has seen
+        page.host_facts = page.host_facts.only(page.url)
+        page.robots = page.robots.only(page.url)
+
+        return self.save_page(page, parse_pool.submit(analyze_html, page, raw_html).result())
+
+    async def analyze_page_async(self, page, async_http, executor=None):
+        record, headers = self.cached_record(page)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.wait_async(page.url)
+        if self.stopping.is_set():
+            return page
+
+        raw_html = await page.fetch_async(async_http, headers)
+
+        if self.unchanged(page, record, raw_html):
+            if page.checks.probes:
+                await page.host_facts.get_async(page.url, async_http, page.checks.probes)
+            # the sitemap check may still download the sitemap
+            return await asyncio.get_running_loop().run_in_executor(executor, self.cache.result, record, page)
+
+        if raw_html is None:
+            return page
+
+        await page.analyze_async(async_http, executor, raw_html)
+
+        return self.save_page(page, page)
+
+    def new_page(self, url, depth=0):
+        return Page(url=url, base_domain=self.base_url,
+                    analyze_headings=self.analyze_headings,
+                    analyze_extra_tags=self.analyze_extra_tags,
+                    host_facts=self.host_facts,
+                    robots=self.robots,
+                    checks=self.checks,
+                    follow_links=self.follow_links,
+                    depth=depth,
+                    profile=self.metrics.enabled)
+
+    def add_page(self, page):
+        """
+        Merge an analyzed page into the site totals and queue its links.
+        Returns the page as a compact PageResult, with the merged state
+        released.
+        """
+        result = PageResult.from_page(page)
+
+        if result.timings:
+            self.metrics.record_page(result.url, result.timings)
+        self.metrics.count('pages')
+
+        # pages that weren't downloaded, such as images or failed requests, have no hash to compare
+        if result.content_hash is not None:
+            self.content_hashes[result.content_hash].add(result.url)
+        self.near_duplicates.add(result.url, result.simhash)
+
+        self.wordcount.update(result.wordcount)
+
+        if self.ngram_pruner is None:
+            self.bigrams.update(result.bigrams)
+            self.trigrams.update(result.trigrams)
+        else:
+            self.ngram_pruner.update(self.bigrams, result.bigrams)
+            self.ngram_pruner.update(self.trigrams, result.trigrams)
+
+        # every link to the site counts in the graph, only the ones worth following are crawled
+        self.link_graph.add_page(result.url, [link for link in result.site_links if self.same_site(link)])
+
+        for link in result.links:
+            if self.same_site(link):
+                self.frontier.push(link, result.depth + 1)
+
+        self.crawled_urls.add(result.url)
+
+        result.release()
+
+        return result
@@ -20,7 +20,7 @@ setup(
     package_data={'seoanalyzer': ['templates/index.html',]},
     include_package_data=True,
     install_requires=[
-        'BeautifulSoup4', 'lxml', 'requests', 'jinja2', 'urllib3', 'certifi',
+        'lxml', 'jinja2', 'urllib3', 'certifi', 'fake-useragent', 'dnspython',
     ],
     entry_points={
         'console_scripts' : [
@@ -0,0 +1,63 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+
+class LocalSite():
+    """
+    A stand-in web server on localhost. `pages` maps a path to either a
+    body or a (status, headers, body) tuple, anything else is a 404.
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                site.requests.append((self.path, dict(self.headers)))
+                page = site.pages.get(self.path, (404, {}, 'not found'))
+
+                if not isinstance(page, tuple):
+                    page = (200, {}, page)
+
+                status, headers, body = page
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+
+                if 'ETag' in headers and self.headers.get('If-None-Match') == headers['ETag']:
+                    status, body = 304, b''
+
+                self.send_response(status)
+                headers = dict({'Content-Type': 'text/html; charset=utf-8'}, **headers)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.netloc = f'127.0.0.1:{self.server.server_port}'
+        self.url = f'http://{self.netloc}/'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def local_site():
+    site = LocalSite()
+    yield site
+    site.close()
@@ -1,4 +1,14 @@
+import asyncio
+import pytest
+import time
+
 from seoanalyzer import analyze
+from seoanalyzer import analyze_async
+from seoanalyzer import analyze_many
+from seoanalyzer import iter_analyze
+from seoanalyzer import host
+from seoanalyzer.store import ResultStore
+from tests.conftest import LocalSite
 
 def test_print_output():
     output = analyze('https://www.sethserver.com/tests/utf8.html')
@@ -10,3 +20,342 @@ def test_print_output():
     assert output['pages'][0]['word_count'] == 493
     assert output['errors'] == []
     assert output['duplicate_pages'] == []
+
+def serve_site(local_site, monkeypatch):
+    monkeypatch.setattr(host.HostFacts, 'lookup_dmarc', lambda self: None)
+    monkeypatch.setattr(host.HostFacts, 'resolve_urls', lambda self: [local_site.url])
+
+    local_site.pages['/'] = '''<html><head><title>Home page</title></head><body><h1>Home</h1>
+        <p>Welcome to the local test site about local testing.</p>
+        <a href="/one" title="One">One</a> <a href="/two" title="Two">Two</a></body></html>'''
+    local_site.pages['/one'] = '''<html><head><title>Page one</title></head><body><h1>One</h1>
+        <p>The first page about local testing.</p><a href="/two" title="Two">Two</a></body></html>'''
+    local_site.pages['/two'] = '''<html><head><title>Page two</title></head><body><h1>Two</h1>
+        <p>The second page about local testing.</p><a href="/" title="Home">Home</a></body></html>'''
+
+def without_timings(output):
+    output.pop('total_time')
+    return output
+
+def test_analyze_local(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+
+    output = analyze(local_site.url)
+
+    assert [p['url'] for p in output['pages']] == [local_site.url, f'{local_site.url}one', f'{local_site.url}two']
+    assert [p['title'] for p in output['pages']] == ['home page', 'page one', 'page two']
+    assert list(output['hosts']) == [local_site.netloc]
+    assert output['keywords'] == [{'word': 'page', 'count': 5}]
+
+def test_analyze_async_matches_analyze(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+
+    expected = without_timings(analyze(local_site.url))
+    output = without_timings(asyncio.run(analyze_async(local_site.url, concurrency=4)))
+
+    assert output == expected
+
+def test_analyze_processes_matches_analyze(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+
+    expected = without_timings(analyze(local_site.url))
+    output = without_timings(analyze(local_site.url, workers=2, processes=2))
+
+    assert output == expected
+
+def test_analyze_cache(local_site, monkeypatch, tmp_path):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/one'] = (200, {'ETag': '"one"'}, local_site.pages['/one'])
+
+    expected = without_timings(analyze(local_site.url, cache_dir=str(tmp_path)))
+    local_site.requests.clear()
+    output = without_timings(analyze(local_site.url, cache_dir=str(tmp_path)))
+
+    assert output == expected
+    assert ('/one', '"one"') in [(path, headers.get('If-None-Match')) for path, headers in local_site.requests]
+
+def test_analyze_cache_other_options(local_site, monkeypatch, tmp_path):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/one'] = (200, {'ETag': '"one"'}, local_site.pages['/one'])
+
+    analyze(local_site.url, cache_dir=str(tmp_path), checks='fast')
+    local_site.requests.clear()
+    output = without_timings(analyze(local_site.url, cache_dir=str(tmp_path), analyze_headings=True))
+
+    assert output == without_timings(analyze(local_site.url, analyze_headings=True))
+    assert all('headings' in p and p['custom_404_status'] for p in output['pages'])
+    assert ('/one', None) in [(path, headers.get('If-None-Match')) for path, headers in local_site.requests]
+
+def test_analyze_cache_host_changed(local_site, monkeypatch, tmp_path):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/one'] = (200, {'ETag': '"one"'}, local_site.pages['/one'])
+
+    first = analyze(local_site.url, cache_dir=str(tmp_path))
+
+    # the host gets a DMARC record and a favicon, and starts answering missing pages with a 200
+    monkeypatch.setattr(host.HostFacts, 'lookup_dmarc', lambda self: ['v=DMARC1; p=reject'])
+    local_site.pages['/favicon.ico'] = (200, {'Content-Type': 'image/x-icon'}, b'icon')
+    local_site.pages['/nonexistent_path'] = 'soft 404'
+
+    output = without_timings(analyze(local_site.url, cache_dir=str(tmp_path)))
+
+    assert [(p['dmarc_status'], p['custom_404_status'], p['favicon_status']) for p in first['pages']] == \
+        [('bad', 'good', 'bad')] * 3
+    assert [(p['dmarc_status'], p['custom_404_status'], p['favicon_status']) for p in output['pages']] == \
+        [('good', 'bad', 'good')] * 3
+    assert output == without_timings(analyze(local_site.url))
+    assert [p['overall_score'] for p in output['pages']] == [p['overall_score'] + 2 for p in first['pages']]
+
+def test_analyze_cache_timings(local_site, monkeypatch, tmp_path):
+    serve_site(local_site, monkeypatch)
+
+    analyze(local_site.url, cache_dir=str(tmp_path), profile=True)
+    output = analyze(local_site.url, cache_dir=str(tmp_path))
+    profiled = analyze(local_site.url, cache_dir=str(tmp_path), profile=True)
+
+    assert not any('timings' in p for p in output['pages'])
+    assert profiled['timings']['counters']['cache_hits'] == 3
+    assert all('fetch' in p['timings'] and 'parse' not in p['timings'] for p in profiled['pages'])
+
+def test_iter_analyze(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+
+    records = list(iter_analyze(local_site.url))
+    expected = analyze(local_site.url)
+
+    assert [r['type'] for r in records] == ['page', 'page', 'page', 'summary']
+    assert [r['data'] for r in records[:-1]] == expected['pages']
+    assert records[-1]['data']['keywords'] == expected['keywords']
+    assert records[-1]['data']['duplicate_pages'] == expected['duplicate_pages']
+
+def test_analyze_near_duplicates(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    article = ' '.join(f'Paragraph {i} explains the local test site in detail.' for i in range(40))
+    local_site.pages['/one'] = f'''<html><head><title>Page one</title></head><body><p>{article}</p>
+        <p>Updated 10:01</p></body></html>'''
+    local_site.pages['/two'] = f'''<html><head><title>Page two</title></head><body><p>{article}</p>
+        <p>Updated 10:02</p></body></html>'''
+
+    output = analyze(local_site.url)
+
+    assert output['duplicate_pages'] == []
+    assert output['near_duplicate_pages'] == [[f'{local_site.url}one', f'{local_site.url}two']]
+
+def test_analyze_skipped_pages_are_not_duplicates(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/'] = '''<html><head><title>Home page</title></head><body>
+        <a href="/img.bin" title="Image">Image</a> <a href="/report.pdf" title="Report">Report</a>
+        <a href="/missing" title="Missing">Missing</a></body></html>'''
+    local_site.pages['/img.bin'] = (200, {'Content-Type': 'application/octet-stream'}, b'image')
+    local_site.pages['/report.pdf'] = (200, {'Content-Type': 'application/pdf'}, b'%PDF-1.4')
+
+    output = analyze(local_site.url)
+
+    assert len(output['pages']) == 4
+    assert output['duplicate_pages'] == []
+
+def test_analyze_profile(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    events = []
+
+    output = analyze(local_site.url, profile=True, metrics_hooks=[lambda *event: events.append(event)])
+    timings = output['timings']
+
+    assert 'timings' not in analyze(local_site.url)
+    assert timings['counters']['pages'] == 3
+    assert timings['stages']['fetch']['calls'] == 3
+    assert set(timings['stages']) >= {'fetch', 'parse', 'process_text', 'stemming', 'host_checks', 'checks'}
+    assert timings['hosts'][local_site.netloc]['http_requests'] >= 3
+    assert timings['hosts'][local_site.netloc]['bytes_fetched'] > 0
+    assert all('parse' in page['timings'] for page in output['pages'])
+    assert ('count', 'pages', 1, None) in events
+
+def test_analyze_profile_counts_own_traffic(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    other_site = LocalSite()
+    other_site.pages['/'] = '<html><head><title>Other site</title></head><body><p>Another site.</p></body></html>'
+
+    try:
+        records = list(analyze_many([local_site.url, other_site.url], max_sites=2, workers=2, checks='fast',
+                                    profile=True))
+        output = asyncio.run(analyze_async(other_site.url, checks='fast', profile=True))
+    finally:
+        other_site.close()
+
+    hosts = {r['url']: list(r['data']['timings']['hosts']) for r in records[:-1]}
+
+    assert hosts == {local_site.url: [local_site.netloc], other_site.url: [other_site.netloc]}
+    assert output['timings']['hosts'][other_site.netloc]['http_requests'] == 1
+
+def test_analyze_frontier_order(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/'] = '''<html><head><title>Home page</title></head><body>
+        <a href="/docs/guide/setup" title="Setup">Setup</a> <a href="/two" title="Two">Two</a>
+        <a href="/one" title="One">One</a></body></html>'''
+    local_site.pages['/docs/guide/setup'] = '<html><head><title>Setup</title></head><body><p>Setup</p></body></html>'
+
+    def urls(output):
+        return [p['url'][len(local_site.url) - 1:] for p in output['pages']]
+
+    assert urls(analyze(local_site.url, checks='fast')) == ['/', '/docs/guide/setup', '/two', '/one']
+    assert urls(analyze(local_site.url, checks='fast', frontier_order='priority')) == \
+        ['/', '/two', '/one', '/docs/guide/setup']
+    assert urls(analyze(local_site.url, checks='fast', frontier_order='priority', bloom_capacity=1000,
+                        priority=lambda url, depth: url)) == ['/', '/docs/guide/setup', '/one', '/two']
+
+def test_analyze_sitemap_seed(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/sitemap.xml'] = f'''<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <url><loc>{local_site.url}two</loc></url><url><loc>http://other.com/</loc></url></urlset>'''
+
+    output = analyze(local_site.url, f'{local_site.url}sitemap.xml')
+
+    assert [p['url'] for p in output['pages']] == [f'{local_site.url}two', local_site.url, f'{local_site.url}one']
+
+def test_analyze_respect_robots(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/robots.txt'] = (200, {'Content-Type': 'text/plain'}, 'User-agent: *\nDisallow: /two\n')
+
+    output = analyze(local_site.url, respect_robots=True)
+
+    assert [p['url'] for p in output['pages']] == [local_site.url, f'{local_site.url}one']
+    assert output['frontier']['disallowed'] == 1
+    assert '/two' not in [path for path, _ in local_site.requests]
+
+def test_analyze_robots_ttl(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/robots.txt'] = (200, {'Content-Type': 'text/plain'}, 'User-agent: *\nDisallow: /two\n')
+
+    analyze(local_site.url, respect_robots=True, checks='fast')
+    cached = [path for path, _ in local_site.requests].count('/robots.txt')
+    local_site.requests.clear()
+    analyze(local_site.url, respect_robots=True, checks='fast', robots_ttl=0)
+
+    assert cached == 1
+    assert [path for path, _ in local_site.requests].count('/robots.txt') > 1
+
+def test_analyze_many(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    other_site = LocalSite()
+    other_site.pages['/'] = '<html><head><title>Other site</title></head><body><p>Another site.</p></body></html>'
+
+    try:
+        expected = {local_site.url: without_timings(analyze(local_site.url)),
+                    other_site.url: without_timings(analyze(other_site.url))}
+        records = list(analyze_many([local_site.url, (other_site.url, None)], max_sites=2, max_workers=3,
+                                    workers=2))
+    finally:
+        other_site.close()
+
+    summary = records.pop()
+
+    assert sorted(r['url'] for r in records) == sorted(expected)
+    assert all(without_timings(r['data']) == expected[r['url']] for r in records)
+    assert summary['type'] == 'summary'
+    assert summary['data']['sites'] == 2
+    assert summary['data']['pages'] == 4
+    assert summary['data']['errors'] == 0
+    assert summary['data']['pages_per_second'] > 0
+
+def test_analyze_many_close_stops_crawls(local_site, monkeypatch, tmp_path):
+    serve_site(local_site, monkeypatch)
+    slow_site = LocalSite()
+    slow_site.pages['/'] = ''.join(f'<a href="/{i}" title="Page {i}">Page {i}</a>' for i in range(50))
+
+    for i in range(50):
+        slow_site.pages[f'/{i}'] = f'<html><body><p>Page {i}</p></body></html>'
+
+    try:
+        with ResultStore(str(tmp_path / 'results.db')) as store:
+            # the slow site takes ten seconds at one page every 0.2 seconds
+            records = analyze_many([slow_site.url, local_site.url], max_sites=2, workers=2, checks='fast',
+                                   crawl_delay=0.2, store=store)
+
+            assert next(records)['url'] == local_site.url
+
+            start = time.monotonic()
+            records.close()
+            closed_in = time.monotonic() - start
+            requests = len(slow_site.requests)
+            time.sleep(0.5)
+
+            crawls = {crawl['url']: crawl for crawl in store.crawls()}
+    finally:
+        slow_site.close()
+
+    assert closed_in < 0.5
+    # at most the pages that were already being fetched
+    assert len(slow_site.requests) <= requests + 2
+    assert crawls[local_site.url]['finished_at'] is not None
+    assert crawls[slow_site.url]['finished_at'] is None
+
+def test_analyze_link_graph(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/orphan'] = '<html><head><title>Orphan</title></head><body><p>Nobody links here.</p></body></html>'
+    local_site.pages['/sitemap.txt'] = f'{local_site.url}orphan\n'
+
+    graph = analyze(local_site.url, f'{local_site.url}sitemap.txt')['link_graph']
+
+    assert graph['inlinks'] == {f'{local_site.url}orphan': 0, local_site.url: 1, f'{local_site.url}one': 1,
+                                f'{local_site.url}two': 2}
+    assert graph['depth'][f'{local_site.url}two'] == 1
+    assert graph['depth'][f'{local_site.url}orphan'] is None
+    assert graph['orphan_pages'] == [f'{local_site.url}orphan']
+
+def test_analyze_link_graph_counts_every_internal_link(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    local_site.pages['/'] = '''<html><head><title>Home</title></head><body>
+        <a href="/plain">Plain</a> <a href="/plain#top">Plain again</a></body></html>'''
+    local_site.pages['/plain'] = '<html><head><title>Plain</title></head><body><p>Linked untitled.</p></body></html>'
+    local_site.pages['/sitemap.txt'] = f'{local_site.url}plain\n'
+
+    output = analyze(local_site.url, f'{local_site.url}sitemap.txt')
+    graph = output['link_graph']
+
+    assert [p['url'] for p in output['pages']] == [f'{local_site.url}plain', local_site.url]
+    assert graph['inlinks'][f'{local_site.url}plain'] == 1
+    assert graph['depth'][f'{local_site.url}plain'] == 1
+    assert graph['orphan_pages'] == []
+    assert [link[1] for link in output['pages'][1]['over_all']['Internal_link']] == [f'{local_site.url}plain'] * 2
+
+def test_analyze_follows_links_without_link_checks(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+
+    output = analyze(local_site.url, checks=['title'])
+    expected = analyze(local_site.url)
+
+    assert [p['url'] for p in output['pages']] == [p['url'] for p in expected['pages']]
+    assert output['link_graph'] == expected['link_graph']
+    assert output['pages'][0]['title'] == 'home page'
+    assert output['pages'][0]['all_link'] == {}
+
+    single = analyze(local_site.url, checks=['url_length'], follow_links=False)
+
+    assert [p['url'] for p in single['pages']] == [local_site.url]
+
+def test_analyze_fast_checks(local_site, monkeypatch):
+    serve_site(local_site, monkeypatch)
+    monkeypatch.setattr(host.HostFacts, 'lookup_dmarc', lambda self: pytest.fail('looked up DMARC'))
+
+    output = analyze(local_site.url, analyze_extra_tags=True, checks='fast')
+
+    assert [p['title'] for p in output['pages']] == ['home page', 'page one', 'page two']
+    assert output['keywords'] == [{'word': 'page', 'count': 5}]
+    assert output['hosts'] == {}
+    assert sorted(path for path, _ in local_site.requests) == ['/', '/one', '/two']
+
+def test_analyze_store(local_site, monkeypatch, tmp_path):
+    serve_site(local_site, monkeypatch)
+
+    with ResultStore(str(tmp_path / 'results.db'), batch_size=2) as store:
+        output = analyze(local_site.url, store=store)
+        records = list(analyze_many([local_site.url], store=store))
+        crawls = store.crawls()
+
+        assert len(crawls) == 2
+        assert all(crawl['pages'] == len(output['pages']) for crawl in crawls)
+        assert [p['report'] for p in store.pages(crawl_id=crawls[1]['id'])] == output['pages']
+        assert store.keywords(crawls[1]['id']) == output['keywords']
+        assert [p['report'] for p in store.pages(crawl_id=crawls[0]['id'])] == records[0]['data']['pages']
+        assert sorted(link['source'] for link in store.links(crawls[1]['id'], target=f'{local_site.url}two')) == \
+            [local_site.url, f'{local_site.url}one']
@@ -0,0 +1,29 @@
+import pickle
+
+import pytest
+
+from seoanalyzer.checks import HOST
+from seoanalyzer.checks import NETWORK
+from seoanalyzer.checks import select_checks
+
+def test_select_checks_profiles():
+    full = select_checks('full', analyze_headings=True, analyze_extra_tags=True)
+    fast = select_checks('fast', analyze_headings=True, analyze_extra_tags=True)
+
+    assert 'resolve_url' in full and 'sitemap' in full
+    assert 'title' in fast and 'headings' in fast
+    assert not fast.inputs & {HOST, NETWORK}
+    assert fast.probes == ()
+    assert full.probes == ('custom_404', 'favicon', 'dmarc', 'resolve_url')
+
+def test_select_checks_flags_and_names():
+    checks = select_checks('full')
+
+    assert 'headings' not in checks and 'additional_tags' not in checks
+    assert select_checks(['h1', 'title']).names == ('title', 'h1')
+    assert pickle.loads(pickle.dumps(checks)) is checks
+
+    with pytest.raises(ValueError):
+        select_checks('slow')
+    with pytest.raises(ValueError):
+        select_checks(['title', 'spelling'])
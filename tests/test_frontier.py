@@ -0,0 +1,96 @@
+from seoanalyzer import frontier
+
+
+def test_normalize_url():
+    assert frontier.normalize_url('HTTP://Example.COM:80') == 'http://example.com/'
+    assert frontier.normalize_url('https://example.com:8443/a?b=1#top') == 'https://example.com:8443/a?b=1'
+    assert frontier.normalize_url('https://example.com:443/A') == 'https://example.com/A'
+
+
+def test_frontier_bfs():
+    f = frontier.Frontier()
+
+    assert f.push('http://example.com/')
+    assert f.push('http://example.com/a', 1)
+    assert not f.push('http://EXAMPLE.com/#top')
+    assert f.push('http://example.com/b', 1)
+
+    assert len(f) == 3
+    assert [f.pop(), f.pop(), f.pop(), f.pop()] == [
+        ('http://example.com/', 0), ('http://example.com/a', 1), ('http://example.com/b', 1), None,
+    ]
+    assert f.metrics() == {
+        'queued': 0, 'max_queued': 3, 'enqueued': 3, 'duplicates': 1, 'too_deep': 0, 'disallowed': 0,
+        'crawled': 3,
+    }
+
+
+def test_frontier_limits():
+    f = frontier.Frontier(max_pages=2, max_depth=1)
+    f.extend(['http://example.com/a', 'http://example.com/b'], depth=1)
+    f.push('http://example.com/c', 2)
+    f.push('http://example.com/d')
+
+    assert f.pop() == ('http://example.com/a', 1)
+    assert f.pop() == ('http://example.com/b', 1)
+    assert f.pop() is None
+    assert f.metrics()['too_deep'] == 1
+
+
+def test_frontier_priority():
+    f = frontier.Frontier(order='priority')
+    f.push('http://example.com/deep', 3)
+    f.push('http://example.com/', 0)
+    f.push('http://example.com/a', 1)
+    f.push('http://example.com/b', 1)
+
+    assert [f.pop()[0] for _ in range(4)] == [
+        'http://example.com/', 'http://example.com/a', 'http://example.com/b', 'http://example.com/deep',
+    ]
+
+
+def test_frontier_priority_differs_from_bfs():
+    urls = ['http://example.com/blog/2020/01/post', 'http://example.com/products?sort=price',
+            'http://example.com/about', 'http://example.com/blog/']
+    bfs = frontier.Frontier()
+    by_priority = frontier.Frontier(order='priority')
+
+    for f in (bfs, by_priority):
+        f.push('http://example.com/')
+        f.extend(urls, depth=1)
+
+    assert [bfs.pop()[0] for _ in range(5)] == ['http://example.com/'] + urls
+    assert [by_priority.pop()[0] for _ in range(5)] == [
+        'http://example.com/', 'http://example.com/about', 'http://example.com/blog/',
+        'http://example.com/blog/2020/01/post', 'http://example.com/products?sort=price',
+    ]
+
+
+def test_frontier_bloom_filter():
+    f = frontier.Frontier(bloom_capacity=1000)
+    urls = [f'http://example.com/{i}' for i in range(500)]
+
+    f.extend(urls)
+    f.extend(urls)
+
+    assert f.enqueued == 500
+    assert f.duplicates == 500
+
+
+def test_frontier_sources_are_read_lazily():
+    read = []
+
+    def sitemap():
+        for url in ['http://example.com/a', 'http://example.com/', 'http://example.com/b']:
+            read.append(url)
+            yield url
+
+    f = frontier.Frontier(max_pages=2)
+    f.push('http://example.com/')
+    f.add_source(sitemap())
+
+    assert f.pop() == ('http://example.com/a', 0)
+    assert read == ['http://example.com/a']
+    assert f.pop() == ('http://example.com/b', 0)
+    assert f.pop() is None
+    assert f.metrics()['duplicates'] == 1
@@ -1,4 +1,69 @@
+import hashlib
+
 from seoanalyzer import http
+from seoanalyzer import host
+from seoanalyzer import sitemap
 
 def test_http():
     assert http.http.get('https://www.sethserver.com/tests/utf8.html')
+
+def test_http_local(local_site):
+    local_site.pages['/'] = '<html></html>'
+
+    response = http.http.get(local_site.url)
+
+    assert response.status == 200
+    assert response.data == b'<html></html>'
+    assert local_site.requests[0][1]['User-Agent'] == http.http.user_agent
+
+def test_http_status(local_site):
+    local_site.pages['/old'] = (301, {'Location': '/new'}, '')
+    local_site.pages['/new'] = 'moved here'
+
+    assert http.http.status(f'{local_site.url}old') == (200, f'{local_site.url}new')
+    assert http.http.status(f'{local_site.url}missing') == (404, f'{local_site.url}missing')
+    assert http.http.status('http://127.0.0.1:1/') == (None, None)
+
+def test_host_facts(local_site):
+    local_site.pages['/favicon.ico'] = (200, {'Content-Type': 'image/x-icon'}, b'icon')
+    facts = host.HostFacts('http', local_site.netloc)
+
+    facts.check_custom_error()
+    facts.check_favicon()
+
+    assert facts.custom_error == 'good'
+    assert facts.favicon == f'{local_site.url}favicon.ico'
+
+def test_count_sitemap_urls(local_site):
+    local_site.pages['/sitemap_index.xml'] = f'''<?xml version="1.0" encoding="UTF-8"?>
+        <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <sitemap><loc>{local_site.url}sitemap1.xml</loc></sitemap>
+        <sitemap><loc>{local_site.url}sitemap2.xml</loc></sitemap>
+        </sitemapindex>'''
+    local_site.pages['/sitemap1.xml'] = '''<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <url><loc>http://example.com/a</loc></url><url><loc>http://example.com/b</loc></url></urlset>'''
+    local_site.pages['/sitemap2.xml'] = '''<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <url><loc>http://example.com/c</loc></url></urlset>'''
+
+    assert sitemap.count_sitemap_urls(f'{local_site.url}sitemap_index.xml') == 3
+    assert sitemap.count_sitemap_urls(f'{local_site.url}missing.xml') == 0
+
+def test_http_fetch(local_site):
+    body = '<html><body>' + 'x' * 100000 + '</body></html>'
+    local_site.pages['/'] = body
+    local_site.pages['/image.png'] = (200, {'Content-Type': 'image/png'}, b'\x89PNG' * 100000)
+    client = http.get_client()
+
+    page = client.fetch(local_site.url)
+    assert page.status == 200
+    assert page.data == body.encode('utf-8')
+    assert page.sha1 == hashlib.sha1(body.encode('utf-8')).hexdigest()
+    assert not page.truncated
+
+    page = client.fetch(local_site.url, max_size=1000)
+    assert page.data == body.encode('utf-8')[:1000]
+    assert page.truncated
+
+    page = client.fetch(f'{local_site.url}image.png')
+    assert page.skipped
+    assert page.data is None
@@ -0,0 +1,34 @@
+import json
+import subprocess
+import sys
+
+import seoanalyzer
+
+
+def loaded_modules(statement):
+    code = f'{statement}; import sys, json; print(json.dumps(sorted(sys.modules)))'
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+
+    return set(json.loads(output))
+
+
+def test_import_is_lazy():
+    modules = loaded_modules('import seoanalyzer')
+
+    for name in ('lxml', 'urllib3', 'dns', 'jinja2', 'fake_useragent', 'seoanalyzer.analyzer'):
+        assert name not in modules
+
+
+def test_analyzer_import_skips_optional_dependencies():
+    modules = loaded_modules('from seoanalyzer import analyze')
+
+    assert 'seoanalyzer.analyzer' in modules
+    for name in ('dns', 'jinja2', 'fake_useragent'):
+        assert name not in modules
+
+
+def test_lazy_exports():
+    from seoanalyzer.analyzer import analyze
+
+    assert seoanalyzer.analyze is analyze
+    assert 'stem' in dir(seoanalyzer)
@@ -0,0 +1,51 @@
+from collections import Counter
+from operator import itemgetter
+
+from seoanalyzer.keywords import CountMinSketch
+from seoanalyzer.keywords import NgramPruner
+from seoanalyzer.keywords import top_keywords
+
+
+def legacy_keywords(wordcount, bigrams, trigrams):
+    keywords = []
+
+    for counter in (wordcount, bigrams, trigrams):
+        for w in sorted(counter.items(), key=itemgetter(1), reverse=True):
+            if w[1] > 4:
+                keywords.append({'word': w[0], 'count': w[1]})
+
+    return sorted(keywords, key=itemgetter('count'), reverse=True)
+
+
+def test_top_keywords_matches_full_sort():
+    wordcount = Counter({'seo': 9, 'page': 5, 'rare': 1, 'site': 7, 'link': 5})
+    bigrams = Counter({'seo page': 5, 'rare pair': 2, 'site link': 9})
+    trigrams = Counter({'seo page site': 7, 'a b c': 4})
+
+    expected = legacy_keywords(wordcount, bigrams, trigrams)
+
+    assert top_keywords((wordcount, bigrams, trigrams)) == expected
+    assert top_keywords((wordcount, bigrams, trigrams), limit=3) == expected[:3]
+    assert [k['word'] for k in expected[:2]] == ['seo', 'site link']
+
+
+def test_count_min_sketch_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=3)
+    counts = Counter()
+
+    for i in range(500):
+        key = f'gram {i % 97}'
+        counts[key] += 1
+        assert sketch.add(key) >= counts[key]
+
+
+def test_pruner_drops_rare_ngrams():
+    pruner = NgramPruner(3)
+    counter = Counter()
+
+    for _ in range(4):
+        pruner.update(counter, Counter({'common pair': 1}))
+    pruner.update(counter, Counter({'rare pair': 1}))
+
+    assert 'rare pair' not in counter
+    assert counter['common pair'] >= 4
@@ -0,0 +1,50 @@
+from urllib.parse import urlsplit
+
+import lxml.html as lh
+
+from seoanalyzer.links import LinkGraph
+from seoanalyzer.links import classify_links
+
+def anchors(html):
+    return lh.fromstring(html).iterfind('.//a[@href]')
+
+def test_classify_links():
+    links = classify_links(anchors('''<div>
+        <a href="/about" title="About">About us</a>
+        <a href="http://example.com/team_page" title="Team" rel="nofollow">Team</a>
+        <a href="https://twitter.com/example">Twitter</a>
+        <a href="/photo.png?size=2" title="Photo">Photo</a>
+        <a href="/contact#form" title="Contact">click here</a>
+        <a href="/faq#top" title="FAQ">FAQ</a>
+        <a href="mailto:info@example.com">Mail</a>
+        <a href="//EXAMPLE.com/">Home</a></div>'''),
+        'http://example.com/', 'example.com', urlsplit('http://example.com/'))
+
+    assert links.count == 8
+    assert links.crawl == ['http://example.com/about', 'http://example.com/team_page', 'http://example.com/faq']
+    assert [link[1] for link in links.internal] == ['http://example.com/about', 'http://example.com/team_page',
+                                                     'http://example.com/photo.png?size=2', 'http://example.com/contact',
+                                                     'http://example.com/faq', 'http://example.com/']
+    assert links.external == [['twitter', 'https://twitter.com/example', 'follow']]
+    assert links.nofollow == ['http://example.com/team_page']
+    assert links.underscore == ['http://example.com/team_page']
+    assert links.social == ['https://twitter.com/example']
+    assert links.images == ['/photo.png?size=2']
+
+def test_link_graph():
+    graph = LinkGraph('http://example.com/')
+    graph.add_page('http://example.com/', ['http://example.com/one', 'http://example.com/one#top',
+                                           'http://example.com/'])
+    graph.add_page('http://example.com/one', ['http://example.com/two', 'http://EXAMPLE.com/'])
+    graph.add_page('http://example.com/two', [])
+    graph.add_page('http://example.com/sitemap-only', ['http://example.com/'])
+
+    assert graph.talk() == {
+        'pages': 4,
+        'links': 4,
+        'inlinks': {'http://example.com/': 2, 'http://example.com/one': 1, 'http://example.com/two': 1,
+                    'http://example.com/sitemap-only': 0},
+        'depth': {'http://example.com/': 0, 'http://example.com/one': 1, 'http://example.com/two': 2,
+                  'http://example.com/sitemap-only': None},
+        'orphan_pages': ['http://example.com/sitemap-only'],
+    }
@@ -0,0 +1,44 @@
+from seoanalyzer.metrics import Metrics
+from seoanalyzer.metrics import NULL_METRICS
+from seoanalyzer.page import Page
+
+
+def test_metrics_totals_and_hooks():
+    events = []
+    metrics = Metrics([lambda *event: events.append(event)])
+
+    with metrics.timer('parse'):
+        pass
+    metrics.record_page('/a', {'parse': 0.5, 'fetch': 0.25})
+    metrics.count('cache_hits')
+    metrics.count('http_requests', 2, host='example.com')
+
+    talk = metrics.talk()
+
+    assert talk['stages']['parse']['calls'] == 2
+    assert talk['stages']['parse']['seconds'] >= 0.5
+    assert talk['stages']['fetch'] == {'calls': 1, 'seconds': 0.25}
+    assert talk['counters'] == {'cache_hits': 1}
+    assert talk['hosts'] == {'example.com': {'http_requests': 2}}
+    assert ('timing', 'fetch', 0.25, '/a') in events
+    assert ('count', 'http_requests', 2, 'example.com') in events
+
+
+def test_null_metrics_does_nothing():
+    with NULL_METRICS.timer('parse'):
+        pass
+    NULL_METRICS.count('pages')
+
+    assert NULL_METRICS.talk() == {}
+
+
+def test_page_timings_only_when_profiling():
+    page = Page(url='https://example.com/', base_domain='https://example.com/')
+    profiled = Page(url='https://example.com/', base_domain='https://example.com/', profile=True)
+
+    with page.timer('parse'), profiled.timer('parse'):
+        pass
+
+    assert page.timings is None
+    assert 'timings' not in page.talk()
+    assert list(profiled.talk()['timings']) == ['parse']
@@ -18,3 +18,49 @@ def test_page_init():
 def test_analyze():
     p = page.Page(url='https://www.sethserver.com/', base_domain='https://www.sethserver.com/')
     assert p.analyze()
+
+class StubHostFacts():
+    custom_error = 'good'
+    favicon = None
+    dmarc_status = 'good'
+    resolve_url = {}
+    resolve_url_status = 'good'
+
+    def host(self, url):
+        return self
+
+    def get(self, url, probes=None):
+        return self
+
+def test_analyze_raw_html():
+    p = page.Page(url='http://example.com/', base_domain='http://example.com/', analyze_headings=True,
+                  host_facts=StubHostFacts())
+    p.analyze('''<!DOCTYPE html><html lang="en"><head><title>Example Title</title>
+        <meta name="Description" content="An example page">
+        <meta property="OG:Title" content="Example">
+        <script>var hidden = 'scripted words';</script></head>
+        <body><!-- commented words --><h1>Heading</h1><p>Visible words and more visible words.</p>
+        <a href="/about" title="About">About</a><img src="/logo.png"></body></html>''')
+
+    assert p.title == 'example title'
+    assert p.description == 'an example page'
+    assert p.html_type == 'html'
+    assert p.html_lang == 'en'
+    assert p.open_graph['og_title'] == 'example'
+    assert p.headings == {'h1': ['Heading']}
+    assert p.links == ['http://example.com/about']
+    assert p.image_miss_tag == ['/logo.png']
+    assert p.wordcount['visibl'] == 2
+    assert 'scripted' not in p.wordcount
+    assert 'commented' not in p.wordcount
+
+def test_decode_html():
+    latin = '<html><body>café</body></html>'.encode('latin-1')
+    meta = b'<html><head><meta http-equiv="Content-Type" content="text/html; charset=ISO-8859-1"></head>caf\xe9</html>'
+
+    assert page.detect_charset(latin, 'text/html; charset="ISO-8859-1"') == 'ISO-8859-1'
+    assert page.decode_html(latin, 'text/html; charset=ISO-8859-1') == '<html><body>café</body></html>'
+    assert page.detect_charset(meta, 'text/html') == 'ISO-8859-1'
+    assert page.detect_charset(b'<meta charset="windows-1252">', None) == 'windows-1252'
+    assert page.detect_charset('﻿café'.encode('utf-8'), 'text/html; charset=latin-1') == 'utf-8-sig'
+    assert page.decode_html(b'caf\xe9', 'text/html; charset=unknown') == 'caf�'
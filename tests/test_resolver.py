@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+from seoanalyzer import host
+from seoanalyzer import http
+from seoanalyzer import resolver
+
+class SlowBackend(resolver.StubBackend):
+    def query(self, name, rdtype):
+        time.sleep(0.1)
+        return super().query(name, rdtype)
+
+def test_resolver_cache():
+    backend = resolver.StubBackend({'example.com': {'A': ['93.184.216.34']}}, ttl=60)
+    dns = resolver.Resolver(backend, negative_ttl=0)
+
+    assert dns.resolve('example.com') == ['93.184.216.34']
+    assert dns.resolve('EXAMPLE.com.') == ['93.184.216.34']
+    assert dns.addresses('example.com') == ['93.184.216.34']
+    assert dns.resolve('missing.example.com') == []
+    assert dns.resolve('missing.example.com') == []
+    assert backend.queries == [('example.com', 'A'), ('missing.example.com', 'A'), ('missing.example.com', 'A')]
+    assert dns.info() == {'hits': 2, 'misses': 3, 'entries': 2}
+
+def test_resolver_dedupes_lookups():
+    backend = SlowBackend({'example.com': {'TXT': ['"v=spf1 -all"']}})
+    dns = resolver.Resolver(backend)
+    answers = []
+
+    threads = [threading.Thread(target=lambda: answers.append(dns.resolve('example.com', 'TXT'))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert answers == [['"v=spf1 -all"']] * 5
+    assert backend.queries == [('example.com', 'TXT')]
+
+def test_resolver_async():
+    backend = SlowBackend({'example.com': {'A': ['93.184.216.34']}})
+    dns = resolver.Resolver(backend)
+
+    async def lookups():
+        return await asyncio.gather(*[dns.resolve_async('example.com') for _ in range(3)])
+
+    assert asyncio.run(lookups()) == [['93.184.216.34']] * 3
+    assert backend.queries == [('example.com', 'A')]
+
+def test_resolver_shared_by_http_and_dmarc(local_site, monkeypatch):
+    backend = resolver.StubBackend({'seo.test': {'A': ['127.0.0.1']},
+                                    '_dmarc.seo.test': {'TXT': ['"v=DMARC1; p=reject"']}})
+    monkeypatch.setattr(resolver, '_resolver', resolver.Resolver(backend))
+    local_site.pages['/'] = '<html></html>'
+    client = http.Http()
+
+    assert client.get(f'http://seo.test:{local_site.server.server_port}/').data == b'<html></html>'
+
+    facts = host.HostFacts('http', 'www.seo.test')
+    facts.check_dmarc()
+
+    assert facts.dmarc_status == 'good'
+    assert backend.queries == [('seo.test', 'A'), ('_dmarc.seo.test', 'TXT')]
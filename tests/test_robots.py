@@ -0,0 +1,45 @@
+import time
+
+from seoanalyzer import robots
+
+
+def test_robots_cache_fetches_once(local_site):
+    local_site.pages['/robots.txt'] = (200, {'Content-Type': 'text/plain'},
+                                       'User-agent: *\nDisallow: /private/\nCrawl-delay: 2\n'
+                                       f'Sitemap: {local_site.url}sitemap.xml\n')
+    local_site.pages['/sitemap.xml'] = '''<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <url><loc>http://example.com/a</loc></url></urlset>'''
+    cache = robots.RobotsCache()
+
+    assert cache.can_fetch(f'{local_site.url}public')
+    assert not cache.can_fetch(f'{local_site.url}private/page')
+    assert cache.crawl_delay(local_site.url) == 2.0
+    assert cache.sitemap_status(f'{local_site.url}page') == {
+        'sitemap': f'{local_site.url}sitemap.xml', 'url_found': 1, 'present_in_robots': True,
+    }
+    assert cache.sitemap_status(local_site.url)['url_found'] == 1
+    assert [path for path, _ in local_site.requests] == ['/robots.txt', '/sitemap.xml']
+
+
+def test_robots_cache_ttl_and_sitemap_probe(local_site):
+    local_site.pages['/sitemap_index.xml'] = '<sitemapindex></sitemapindex>'
+    cache = robots.RobotsCache(ttl=0)
+
+    assert cache.can_fetch(local_site.url)
+    assert cache.sitemap_status(local_site.url) == {
+        'sitemap': f'{local_site.url}sitemap_index.xml', 'url_found': 0, 'present_in_robots': False,
+    }
+    time.sleep(0.01)
+    cache.can_fetch(local_site.url)
+
+    assert [path for path, _ in local_site.requests].count('/robots.txt') >= 3
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = robots.RateLimiter(lambda url: 0.5 if 'slow' in url else 0)
+
+    assert limiter.reserve('http://slow.com/a') == 0
+    assert 0.4 < limiter.reserve('http://slow.com/b') <= 0.5
+    assert 0.9 < limiter.reserve('http://slow.com/c') <= 1.0
+    assert limiter.reserve('http://fast.com/a') == 0
+    assert limiter.reserve('http://fast.com/b') == 0
@@ -0,0 +1,85 @@
+import random
+
+from collections import Counter
+
+from seoanalyzer import similarity
+from seoanalyzer.similarity import NearDuplicateIndex
+from seoanalyzer.similarity import hamming_distance
+from seoanalyzer.similarity import simhash
+
+
+def shingles(text):
+    words = text.split()
+    return Counter(' '.join(words[i:i + 3]) for i in range(len(words) - 2))
+
+
+ARTICLE = ' '.join(f'sentence {i} talks about topic {i % 7} in some detail' for i in range(60))
+
+
+def test_simhash_similar_texts_are_close():
+    original = simhash(shingles(ARTICLE))
+    edited = simhash(shingles(ARTICLE + ' updated on monday'))
+    unrelated = simhash(shingles(' '.join(f'other words number {i * 31}' for i in range(120))))
+
+    assert simhash(Counter()) is None
+    assert hamming_distance(original, edited) <= 3
+    assert hamming_distance(original, unrelated) > 10
+
+
+def test_near_duplicate_index_groups_close_fingerprints():
+    index = NearDuplicateIndex(threshold=0.95)
+    base = 0x0123456789abcdef
+
+    index.add('/a', base)
+    index.add('/b', base ^ 0b101)
+    index.add('/c', base ^ (0b101 << 40) ^ 1)
+    index.add('/d', ~base & (2 ** 64 - 1))
+    index.add('/e', None)
+
+    assert index.max_distance == 3
+    assert index.groups() == [['/a', '/b', '/c']]
+
+
+def test_near_duplicate_index_threshold():
+    with_strict = NearDuplicateIndex(threshold=1)
+    with_strict.add('/a', 5)
+    with_strict.add('/b', 4)
+
+    assert with_strict.groups() == []
+
+
+def test_near_duplicate_index_scales_on_templated_pages(monkeypatch):
+    comparisons = []
+
+    def counting_distance(a, b):
+        comparisons.append(1)
+        return hamming_distance(a, b)
+
+    monkeypatch.setattr(similarity, 'hamming_distance', counting_distance)
+
+    index = NearDuplicateIndex(threshold=0.95)
+    base = 0x0123456789abcdef
+    # every page is the same template with one or two bits changed, so they all share bands
+    fingerprints = [base] + [base ^ (1 << (i % 64)) ^ (1 << (i * 7 % 64)) for i in range(20000)]
+
+    for i, fingerprint in enumerate(fingerprints):
+        index.add(f'/{i}', fingerprint)
+
+    assert len(comparisons) < len(fingerprints) * index.bands
+    assert index.groups() == [[f'/{i}' for i in range(len(fingerprints))]]
+
+
+def test_near_duplicate_index_finds_pairs_in_crowded_buckets():
+    index = NearDuplicateIndex(threshold=0.95)
+    rng = random.Random(0)
+    # unrelated pages that all have the same low 16 bits, so they crowd one bucket
+    pages = [rng.getrandbits(48) << 16 | 0xbeef for _ in range(100)]
+
+    for i, fingerprint in enumerate(pages):
+        index.add(f'/{i}', fingerprint)
+
+    # each copy is 3 bits away, one in each of the other bands, so the crowded bucket is all they share
+    for i, fingerprint in enumerate(pages):
+        index.add(f'/{i}/copy', fingerprint ^ 1 << 20 ^ 1 << 36 ^ 1 << 52)
+
+    assert sorted(index.groups()) == sorted([f'/{i}', f'/{i}/copy'] for i in range(100))
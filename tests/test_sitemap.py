@@ -0,0 +1,38 @@
+import gzip
+
+from seoanalyzer import sitemap
+
+URLSET = '''<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{}</urlset>'''
+
+
+def urlset(urls):
+    return URLSET.format(''.join(f'<url><loc>{url}</loc><lastmod>2024-01-01</lastmod></url>' for url in urls))
+
+
+def test_iter_sitemap_urls_follows_gzipped_index(local_site):
+    local_site.pages['/sitemap_index.xml.gz'] = (200, {'Content-Type': 'application/gzip'}, gzip.compress(f'''
+        <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <sitemap><loc>{local_site.url}pages.xml.gz</loc></sitemap>
+        <sitemap><loc>{local_site.url}posts.txt</loc></sitemap>
+        <sitemap><loc>{local_site.url}sitemap_index.xml.gz</loc></sitemap>
+        </sitemapindex>'''.encode('utf-8')))
+    local_site.pages['/pages.xml.gz'] = (200, {'Content-Type': 'application/gzip'},
+                                         gzip.compress(urlset(['http://example.com/a', 'http://example.com/b'])
+                                                       .encode('utf-8')))
+    local_site.pages['/posts.txt'] = 'http://example.com/c\n\nhttp://example.com/d'
+
+    assert list(sitemap.iter_sitemap_urls(f'{local_site.url}sitemap_index.xml.gz')) == [
+        'http://example.com/a', 'http://example.com/b', 'http://example.com/c', 'http://example.com/d',
+    ]
+
+
+def test_iter_sitemap_urls_streams_large_sitemaps(local_site):
+    urls = [f'http://example.com/{i}' for i in range(50000)]
+    local_site.pages['/sitemap.xml'] = urlset(urls)
+
+    stream = sitemap.iter_sitemap_urls(f'{local_site.url}sitemap.xml')
+
+    assert [next(stream) for _ in range(3)] == urls[:3]
+    stream.close()
+    assert sitemap.count_sitemap_urls(f'{local_site.url}sitemap.xml') == 50000
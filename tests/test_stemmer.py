@@ -0,0 +1,27 @@
+from seoanalyzer import stemmer
+
+
+def test_stem():
+    assert stemmer.stem('fundamentally') == 'fundament'
+    assert stemmer.stem('crawling') == 'crawl'
+
+
+def test_stem_many():
+    words = ['fundamentally', 'crawling', 'crawled', 'fundamentally']
+
+    assert stemmer.stem_many(words) == [stemmer.porter_stem(w) for w in words]
+
+
+def test_stem_cache():
+    stemmer.set_cache_size(2)
+
+    try:
+        stemmer.stem_many(['crawling', 'crawling', 'crawled', 'fundamentally'])
+        info = stemmer.cache_info()
+
+        assert (info.hits, info.misses, info.maxsize, info.currsize) == (1, 3, 2, 2)
+
+        stemmer.cache_clear()
+        assert stemmer.cache_info().currsize == 0
+    finally:
+        stemmer.set_cache_size(stemmer.DEFAULT_CACHE_SIZE)
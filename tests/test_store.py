@@ -0,0 +1,92 @@
+import json
+import time
+
+import pytest
+
+from seoanalyzer import __main__
+from seoanalyzer.store import ResultStore
+
+def page(url, alt_attribute_status='good', links=()):
+    return {'url': url, 'title': url, 'description': '', 'overall_score': 50, 'title_status': 'good',
+            'alt_attribute_status': alt_attribute_status,
+            'over_all': {'Internal_link': [list(link) for link in links], 'External_link': []}}
+
+def records(url):
+    yield {'type': 'page', 'data': page(f'{url}a', 'bad', [('b page', f'{url}b', 'follow')])}
+    yield {'type': 'page', 'data': page(f'{url}b')}
+    yield {'type': 'page', 'data': page(f'{url}c', 'bad')}
+    yield {'type': 'summary', 'data': {'keywords': [{'word': 'hello', 'count': 7}, {'word': 'world', 'count': 9}],
+                                       'duplicate_pages': [[f'{url}a', f'{url}c']], 'near_duplicate_pages': []}}
+
+def test_store_record(tmp_path):
+    with ResultStore(str(tmp_path / 'results.db'), batch_size=2) as store:
+        passed = list(store.record('http://example.com/', records('http://example.com/')))
+
+        assert passed == list(records('http://example.com/'))
+
+        crawl_id = store.latest_crawl('example.com')
+        crawl, = store.crawls()
+
+        assert crawl['id'] == crawl_id
+        assert crawl['pages'] == 3
+        assert crawl['finished_at'] >= crawl['started_at']
+        assert crawl['summary']['keywords'][0] == {'word': 'hello', 'count': 7}
+        assert [p['url'] for p in store.pages(alt_attribute_status='bad')] == ['http://example.com/a',
+                                                                              'http://example.com/c']
+        assert store.pages(url='http://example.com/b')[0]['report'] == page('http://example.com/b')
+        assert store.keywords(crawl_id) == [{'word': 'world', 'count': 9}, {'word': 'hello', 'count': 7}]
+        assert [(l['source'], l['target'], l['kind']) for l in store.links(crawl_id)] == \
+            [('http://example.com/a', 'http://example.com/b', 'internal')]
+        assert store.duplicates(crawl_id) == [{'kind': 'exact', 'urls': ['http://example.com/a',
+                                                                        'http://example.com/c']}]
+
+        with pytest.raises(ValueError):
+            store.pages(alt_status='bad')
+
+def test_store_keeps_partial_crawl(tmp_path):
+    with ResultStore(str(tmp_path / 'results.db'), batch_size=10) as store:
+        crawl = store.record('http://example.com/', records('http://example.com/'))
+        next(crawl)
+        next(crawl)
+        crawl.close()
+
+        assert [p['url'] for p in store.pages(site='example.com')] == ['http://example.com/a', 'http://example.com/b']
+        assert store.crawls()[0]['finished_at'] is None
+
+def test_store_filters(tmp_path):
+    with ResultStore(str(tmp_path / 'results.db')) as store:
+        old = store.save('http://example.com/', {'pages': [page('http://example.com/a', 'bad')]},
+                         started_at=time.time() - 30 * 86400)
+        new = store.save('http://example.org/', {'pages': [page('http://example.org/a', 'bad')]})
+
+        assert [c['id'] for c in store.crawls()] == [new, old]
+        assert [p['url'] for p in store.pages(alt_attribute_status='bad', since=time.time() - 7 * 86400)] == \
+            ['http://example.org/a']
+        assert store.pages(site='example.com', crawl_id=new) == []
+
+def test_query_command(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / 'results.db')
+
+    with ResultStore(path) as store:
+        store.save('http://example.com/', {'pages': [page('http://example.com/a', 'bad',
+                                                          [('b', '//EXAMPLE.com/b#top', 'follow')]),
+                                                     page('http://example.com/b')],
+                                           'keywords': [{'word': 'hello', 'count': 7}]})
+
+    monkeypatch.setattr('sys.argv', ['seoanalyze', 'query', path, '--where', 'alt_attribute_status=bad'])
+    __main__.main()
+
+    assert [p['url'] for p in json.loads(capsys.readouterr().out)] == ['http://example.com/a']
+
+    monkeypatch.setattr('sys.argv', ['seoanalyze', 'query', path, 'keywords', '--site', 'example.com', '-f', 'ndjson'])
+    __main__.main()
+
+    assert capsys.readouterr().out == '{"word": "hello", "count": 7}\n'
+
+    monkeypatch.setattr('sys.argv', ['seoanalyze', 'query', path, 'links', '--site', 'example.com', '--url',
+                                     'http://example.com/b'])
+    __main__.main()
+
+    links = json.loads(capsys.readouterr().out)
+
+    assert [(link['source'], link['target']) for link in links] == [('http://example.com/a', 'http://example.com/b')]
@@ -0,0 +1,130 @@
+import pickle
+
+from collections import Counter
+from concurrent.futures import Future
+
+from seoanalyzer import page
+from seoanalyzer import host
+from seoanalyzer import website
+
+SITE = {
+    'http://example.com/': ['http://example.com/a', 'http://example.com/b', 'http://other.com/'],
+    'http://example.com/a': ['http://example.com/b', 'http://example.com/c'],
+    'http://example.com/b': ['http://example.com/', 'http://example.com/d'],
+    'http://example.com/c': ['http://example.com/a'],
+    'http://example.com/d': [],
+}
+
+
+def fake_analyze(self, raw_html=None):
+    self.content_hash = 'same' if self.url.endswith(('c', 'd')) else self.url
+    self.links = list(SITE[self.url])
+    self.wordcount = Counter({'word': 1, self.url: 2})
+    self.bigrams = Counter({'two words': 1})
+    self.trigrams = Counter({'three whole words': 1})
+    return True
+
+
+def fake_fetch(self, headers=None):
+    return ''
+
+
+def crawl(monkeypatch, workers, follow_links=True):
+    monkeypatch.setattr(page.Page, 'fetch', fake_fetch)
+    monkeypatch.setattr(page.Page, 'analyze', fake_analyze)
+    site = website.Website('http://example.com/', None, False, False, follow_links, workers=workers)
+    site.crawl()
+    return site
+
+
+def test_crawl_concurrent_matches_serial(monkeypatch):
+    serial = crawl(monkeypatch, 1)
+    concurrent = crawl(monkeypatch, 4)
+
+    assert [p.url for p in concurrent.crawled_pages] == [p.url for p in serial.crawled_pages]
+    assert [p.url for p in serial.crawled_pages] == [
+        'http://example.com/', 'http://example.com/a', 'http://example.com/b',
+        'http://example.com/c', 'http://example.com/d',
+    ]
+    assert concurrent.wordcount == serial.wordcount
+    assert concurrent.bigrams == serial.bigrams
+    assert concurrent.trigrams == serial.trigrams
+    assert concurrent.content_hashes == serial.content_hashes
+
+
+def test_crawl_concurrent_without_following_links(monkeypatch):
+    site = crawl(monkeypatch, 4, follow_links=False)
+
+    assert [p.url for p in site.crawled_pages] == ['http://example.com/']
+
+
+def test_host_facts_shared_between_pages(monkeypatch):
+    loads = []
+
+    monkeypatch.setattr(page.Page, 'fetch', fake_fetch)
+    monkeypatch.setattr(page.Page, 'analyze', lambda self, raw_html=None: self.host_facts.get(self.url))
+    monkeypatch.setattr(host.HostFacts, 'check_custom_error', lambda self: loads.append(self.netloc))
+    monkeypatch.setattr(host.HostFacts, 'check_favicon', lambda self: None)
+    monkeypatch.setattr(host.HostFacts, 'check_dmarc', lambda self: None)
+    monkeypatch.setattr(host.HostFacts, 'check_resolve_url', lambda self: None)
+
+    site = website.Website('http://example.com/', None, False, False, True, workers=4)
+    site.frontier.extend(['http://example.com/a', 'http://example.com/b', 'http://example.com/c'])
+    site.crawl()
+
+    assert len(site.crawled_pages) == 4
+    assert loads == ['example.com']
+    assert list(site.host_facts.talk()) == ['example.com']
+
+
+class InlinePool():
+    """
+    Runs parse jobs in this process, pickling them like a process pool would
+    """
+
+    def __init__(self):
+        self.pages = []
+
+    def submit(self, fn, *args):
+        args = pickle.loads(pickle.dumps(args))
+        self.pages.append(args[0])
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_parse_pool_gets_page_host_only(monkeypatch):
+    monkeypatch.setattr(page.Page, 'fetch', fake_fetch)
+    monkeypatch.setattr(page.Page, 'analyze', fake_analyze)
+    for probe in ('check_custom_error', 'check_favicon', 'check_dmarc', 'check_resolve_url'):
+        monkeypatch.setattr(host.HostFacts, probe, lambda self: None)
+
+    host_facts = host.HostFactsCache()
+    for i in range(50):
+        host_facts.get(f'http://other{i}.com/')
+
+    pool = InlinePool()
+    site = website.Website('http://example.com/', None, False, False, True, processes=4, host_facts=host_facts,
+                           parse_pool=pool)
+    site.crawl()
+
+    assert site.window == 4
+    assert len(pool.pages) == 5
+    assert all(list(p.host_facts.hosts) == ['example.com'] and not p.robots.hosts for p in pool.pages)
+    assert len(site.host_facts.hosts) == 51
+
+
+def test_crawl_limits(monkeypatch):
+    monkeypatch.setattr(page.Page, 'fetch', fake_fetch)
+    monkeypatch.setattr(page.Page, 'analyze', fake_analyze)
+
+    site = website.Website('http://example.com/', None, False, False, True, max_pages=2)
+    site.crawl()
+    assert [p.url for p in site.crawled_pages] == ['http://example.com/', 'http://example.com/a']
+
+    site = website.Website('http://example.com/', None, False, False, True, max_depth=1)
+    site.crawl()
+    assert [(p.url, p.depth) for p in site.crawled_pages] == [
+        ('http://example.com/', 0), ('http://example.com/a', 1), ('http://example.com/b', 1),
+    ]
+    assert site.frontier.metrics()['too_deep'] == 4